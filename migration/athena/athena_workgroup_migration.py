@@ -1,60 +1,50 @@
 import argparse
-import boto3
-import os
-import nbformat as nbf
 import uuid
 
-from migration.utils.datazone_helper import get_project_repo
+from migration.athena.query_notebooks import generate_query_notebooks
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import add_instrumentation_arguments, enable_instrumentation_from_args, phase
+from migration.utils.log import add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+from migration.utils.repository import API_BACKEND, add_repository_arguments, get_repository_backend
 
-def migrate_queries(workgroup_name, domain_id, project_id, account_id, region):
-    # Create boto3 clients with the specified region
-    athena = boto3.client('athena', region_name=region)
-    code_commit = boto3.client('codecommit', region_name=region)
+logger = get_logger('migration.athena.athena_workgroup_migration')
 
-    repo = get_project_repo(domain_id, project_id, region)
-    branch = "main"
+REPO_QUERIES_FOLDER = 'athena_saved_queries'
 
+async def _get_named_queries(engine, athena, workgroup_name):
+    async_athena = engine.wrap(athena)
     # Initialize an empty list to store all named query IDs
-    all_named_query_ids = []
+    all_named_query_ids = [query_id async for query_id in async_athena.paginate('list_named_queries', 'NamedQueryIds', WorkGroup=workgroup_name)]
+    # Get all named queries concurrently, in the listed order
+    query_results = await gather_in_order(async_athena.get_named_query(NamedQueryId=query_id) for query_id in all_named_query_ids)
+    return list(zip(all_named_query_ids, query_results))
+
+@phase('query export')
+def migrate_queries(workgroup_name, domain_id, project_id, account_id, region, repo_backend=API_BACKEND, repo_url=None,
+                    notebook_workers=None, validate_notebooks=0):
+    # Create boto3 clients with the specified region
+    athena = create_client('athena', region_name=region)
+
+    repository = get_repository_backend(domain_id, project_id, region, repo_backend, repo_url)
 
-    # Paginate through all named queries
-    paginator = athena.get_paginator('list_named_queries')
-    for page in paginator.paginate(WorkGroup=workgroup_name):
-        all_named_query_ids.extend(page['NamedQueryIds'])
+    engine = AsyncAwsEngine()
+    named_queries = engine.run_until_complete(_get_named_queries(engine, athena, workgroup_name))
+
+    # Generate a UUID for the notebook of each query
+    queries = [(query_result['NamedQuery']['Name'], query_result['NamedQuery']['QueryString'], str(uuid.uuid4()))
+               for _, query_result in named_queries]
+    notebooks = generate_query_notebooks(queries, region, account_id, notebook_workers, validate_notebooks)
 
     putFilesList = []
     migration_info = []  # List to store migration information
 
     # Process each named query
-    for query_id in all_named_query_ids:
-        query_result = athena.get_named_query(NamedQueryId=query_id)
-        query_name = query_result['NamedQuery']['Name']
-        query_string = query_result['NamedQuery']['QueryString']
-
-        # Generate a UUID for this iteration
-        new_uuid = str(uuid.uuid4())
-
-        # Create the sqlnb file
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        template_file = os.path.join(script_dir, 'template.sqlnb')
-        nb = nbf.read(template_file, as_version=4)
-        code_cell = nbf.v4.new_code_cell(query_string)
-        cell_metadata = {'isLimitOn': True, 'displayMode': 'maximized', 'width': 12}
-        code_cell['metadata'] = cell_metadata
-        nb['cells'].append(code_cell)
-        nb['metadata']['title'] = query_name
-        nb['metadata']['id'] = nb['metadata']['id'].replace('<uniqueid>', new_uuid)
-        nb['metadata']['id'] = nb['metadata']['id'].replace('<region>', region)
-        nb['metadata']['id'] = nb['metadata']['id'].replace('<aws-account-id>', account_id)
-
-        # Write the sqlnb file
-        with open(f'{query_name}.sqlnb', 'w') as f:
-            nbf.write(nb, f)
-
+    for (query_id, _), (query_name, _, _), file_content in zip(named_queries, queries, notebooks):
         # Add the file to putFilesList
-        with open(f'{query_name}.sqlnb', mode='r+b') as file_obj:
-            file_content = file_obj.read()
-        file_path = f'athena_saved_queries/{workgroup_name}/{query_name}.sqlnb'
+        file_path = f'{REPO_QUERIES_FOLDER}/{workgroup_name}/{query_name}.sqlnb'
         putFileEntry = {
             'filePath': file_path,
             'fileContent': file_content
@@ -68,49 +58,39 @@ def migrate_queries(workgroup_name, domain_id, project_id, account_id, region):
             'path': file_path
         })
 
-        # Clean up the local file
-        os.remove(f'{query_name}.sqlnb')
-
     # Perform a single commit with all files
     if putFilesList:
-        parent_commit_id = code_commit.get_branch(repositoryName=repo, branchName=branch).get("branch").get("commitId")
-        commit_response = code_commit.create_commit(
-            repositoryName=repo,
-            branchName=branch,
-            parentCommitId=parent_commit_id,
-            putFiles=putFilesList
-        )
-        
+        commit_id = repository.commit_files(((entry['filePath'], entry['fileContent']) for entry in putFilesList),
+                                            f"Migrate saved queries of Athena workgroup {workgroup_name}")
+
         # Check if commit was successful
-        if 'commitId' in commit_response:
-            print("Migration successful. Commit ID:", commit_response['commitId'])
-            print("\nMigrated queries:")
+        if commit_id:
+            logger.info("Migration successful. Commit ID: %s", commit_id)
+            logger.debug("Migrated queries:")
             for info in migration_info:
-                print(f"Name: {info['name']}")
-                print(f"Query ID: {info['query_id']}")
-                print(f"Migrated to: {info['path']}")
-                print("---")
+                logger.debug("Name: %s, Query ID: %s, Migrated to: %s", info['name'], info['query_id'], info['path'])
         else:
-            print("Migration failed. No commit was made.")
+            logger.info("No commit was made, the queries are already in the repository with the same content.")
     else:
-        print("No queries to migrate.")
+        logger.info("No queries to migrate.")
 
-    print(f"Query migration process completed. Total queries migrated: {len(all_named_query_ids)}")
+    logger.info(f"Query migration process completed. Total queries migrated: {len(named_queries)}")
 
 
+@phase('workgroup adoption')
 def bring_your_own_workgroup(workgroup_name, domain_id, project_id, account_id, region):
-    print(f"Tagging Athena workgroup {workgroup_name} with DataZone project ID...")
+    logger.info(f"Tagging Athena workgroup {workgroup_name} with DataZone project ID...")
     # Call Athena tag-resource API with the given workgroup_name
-    athena = boto3.client('athena', region_name=region)
+    athena = create_client('athena', region_name=region)
     athena.tag_resource(
         ResourceARN=f'arn:aws:athena:{region}:{account_id}:workgroup/{workgroup_name}',
         Tags=[{'Key': 'AmazonDataZoneProject', 'Value': project_id}]
     )
-    print(f"Tagged Athena workgroup {workgroup_name} with DataZone project ID.")
+    logger.info(f"Tagged Athena workgroup {workgroup_name} with DataZone project ID.")
 
-    print(f"Updating default Athena connection with workgroup {workgroup_name}...")
+    logger.info(f"Updating default Athena connection with workgroup {workgroup_name}...")
     # Call Datazone list-connections API to find the default Athena connection
-    datazone = boto3.client('datazone', region_name=region)
+    datazone = create_client('datazone', region_name=region)
     default_athena_connection = datazone.list_connections(
         domainIdentifier=domain_id,
         projectIdentifier=project_id,
@@ -126,17 +106,46 @@ def bring_your_own_workgroup(workgroup_name, domain_id, project_id, account_id,
             }
         }
     )
-    print(f"Updated default Athena connection with workgroup {workgroup_name}.")
+    logger.info(f"Updated default Athena connection with workgroup {workgroup_name}.")
 
 
-if __name__ == "__main__":
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Migrate Athena named queries to CodeCommit')
     parser.add_argument('--workgroup-name', type=str, required=True, help='Athena workgroup name')
     parser.add_argument('--domain-id', type=str, required=True, help='ID of the SageMaker Unified Studio Domain')
     parser.add_argument('--project-id', type=str, required=True, help='Project ID in the SageMaker Unified Studio Domain')
     parser.add_argument('--account-id', type=str, required=True, help='AWS account ID')
     parser.add_argument('--region', type=str, required=True, help='AWS region')
-    args = parser.parse_args()
+    parser.add_argument('--notebook-workers',
+                        type=int,
+                        help='Number of processes generating the notebooks of the queries, defaults to the number of CPUs')
+    parser.add_argument('--validate-notebooks',
+                        type=int,
+                        default=0,
+                        help='Number of generated notebooks, picked at random, to validate against the notebook schema. '
+                             'The template is always validated, notebooks built from it are valid')
+    add_repository_arguments(parser)
+    add_instrumentation_arguments(parser)
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def run_migration(args):
+    migrate_queries(args.workgroup_name, args.domain_id, args.project_id, args.account_id, args.region, args.repo_backend, args.repo_url,
+                    args.notebook_workers, args.validate_notebooks)
+    bring_your_own_workgroup(args.workgroup_name, args.domain_id, args.project_id, args.account_id, args.region)
+
+
+def athena_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation_from_args(args)
+    enable_profiling_from_args(args)
+    enable_rate_limiting_from_args(args)
+    run_migration(args)
 
-    migrate_queries(args.workgroup_name, args.domain_id, args.project_id, args.account_id, args.region)
-    bring_your_own_workgroup(args.workgroup_name, args.domain_id, args.project_id, args.account_id, args.region)
\ No newline at end of file
+
+if __name__ == "__main__":
+    athena_main()
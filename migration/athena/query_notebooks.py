@@ -0,0 +1,139 @@
+import copy
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import nbformat as nbf
+from nbformat.corpus.words import generate_corpus_id
+
+from migration.utils.instrumentation import phase
+from migration.utils.log import get_logger
+
+logger = get_logger('migration.athena.query_notebooks')
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'template.sqlnb')
+CELL_METADATA = {'isLimitOn': True, 'displayMode': 'maximized', 'width': 12}
+# Below this many notebooks per worker, starting the worker processes takes longer than generating the notebooks
+MIN_NOTEBOOKS_PER_WORKER = 500
+CHUNKS_PER_WORKER = 4
+
+_worker_template = None
+
+
+def validation_error(notebook):
+    """
+    Returns the message of the first error of a notebook against the notebook schema, or None if it is valid
+    """
+    try:
+        nbf.validate(notebook)
+    except nbf.ValidationError as e:
+        return e.message
+    return None
+
+
+def load_template(template_file=TEMPLATE_FILE):
+    """
+    Reads the notebook template and validates it against the notebook schema, it is the only full validation of the
+    export: notebooks built by build_query_notebook only differ from the template in fields the schema allows any value of.
+    An invalid template is reported and used as is, as nbformat writes invalid notebooks.
+
+    Returns the template and its validation error
+    """
+    template = nbf.read(template_file, as_version=4)
+    template_error = validation_error(template)
+    if template_error:
+        logger.warning("Notebook template %s does not match the notebook schema, notebooks are generated from it as is: %s",
+                       template_file, template_error)
+    return template, template_error
+
+
+def build_query_notebook(template, query_name, query_string, region, account_id, unique_id):
+    """
+    Returns a notebook with a copy of the template metadata and one code cell running `query_string`.
+    The cell is built as nbf.v4.new_code_cell builds it, without validating it.
+    """
+    notebook = copy.deepcopy(template)
+    notebook['cells'].append(nbf.NotebookNode(
+        id=generate_corpus_id(),
+        cell_type='code',
+        metadata=nbf.NotebookNode(CELL_METADATA),
+        execution_count=None,
+        source=query_string,
+        outputs=[],
+    ))
+    notebook['metadata']['title'] = query_name
+    notebook['metadata']['id'] = (notebook['metadata']['id'].replace('<uniqueid>', unique_id)
+                                  .replace('<region>', region)
+                                  .replace('<aws-account-id>', account_id))
+    return notebook
+
+
+def serialize_notebook(notebook):
+    """
+    Returns the notebook as the bytes nbf.write writes, without validating it against the notebook schema
+    """
+    return (nbf.v4.writes_json(notebook) + '\n').encode('utf-8')
+
+
+def _generate_chunk(template, queries, region, account_id):
+    # -> [(content bytes, validation error of the sampled notebooks)]
+    notebooks = []
+    for query_name, query_string, unique_id, validate in queries:
+        notebook = build_query_notebook(template, query_name, query_string, region, account_id, unique_id)
+        notebooks.append((serialize_notebook(notebook), validation_error(notebook) if validate else None))
+    return notebooks
+
+
+def _init_worker(template):
+    global _worker_template
+    _worker_template = template
+
+
+def _generate_worker_chunk(queries, region, account_id):
+    return _generate_chunk(_worker_template, queries, region, account_id)
+
+
+@phase('notebook generation')
+def generate_query_notebooks(queries, region, account_id, workers=None, validate_sample=0, template_file=TEMPLATE_FILE):
+    """
+    Generate the .sqlnb notebooks of Athena named queries.
+
+    The template is validated once, notebooks are built from it without schema validation, and serialized by a pool of
+    `workers` processes for large exports.
+
+    Args:
+        queries: List of (query name, query string, unique id of the notebook)
+        region: AWS region of the notebooks
+        account_id: AWS account ID of the notebooks
+        workers: Number of worker processes, defaults to the number of CPUs
+        validate_sample: Number of notebooks, picked at random, validated against the notebook schema, all notebooks if
+            at least the number of queries. Invalid notebooks are reported and migrated as nbformat would write them
+
+    Returns the content bytes of the notebooks, in the order of `queries`
+    """
+    template, template_error = load_template(template_file)
+    validated = set(random.sample(range(len(queries)), min(max(validate_sample, 0), len(queries))))
+    queries = [(query_name, query_string, unique_id, index in validated)
+               for index, (query_name, query_string, unique_id) in enumerate(queries)]
+    workers = min(workers or os.cpu_count() or 1, len(queries) // MIN_NOTEBOOKS_PER_WORKER)
+    if workers <= 1:
+        notebooks = _generate_chunk(template, queries, region, account_id)
+    else:
+        chunk_size = -(-len(queries) // (workers * CHUNKS_PER_WORKER))
+        chunks = [queries[start:start + chunk_size] for start in range(0, len(queries), chunk_size)]
+        # Spawned workers do not inherit the locks held by the threads of the migration, which forked workers could
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(template,)) as executor:
+            notebooks = [notebook
+                         for chunk_notebooks in executor.map(_generate_worker_chunk, chunks,
+                                                             [region] * len(chunks), [account_id] * len(chunks))
+                         for notebook in chunk_notebooks]
+    for (query_name, _, _, _), (_, error) in zip(queries, notebooks):
+        # Errors of the template are reported once, by load_template
+        if error and error != template_error:
+            logger.warning("Notebook of query %s does not match the notebook schema: %s", query_name, error)
+    logger.info("Generated %d notebooks with %d worker processes, %d validated against the notebook schema",
+                len(notebooks), max(workers, 1), len(validated),
+                extra={'fields': {'notebooks': len(notebooks), 'workers': max(workers, 1), 'validated_notebooks': len(validated)}})
+    return [content for content, _ in notebooks]
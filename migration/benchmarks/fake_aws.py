@@ -0,0 +1,117 @@
+import contextlib
+import io
+import random
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+import boto3
+from botocore import xform_name
+from botocore.awsrequest import AWSResponse
+from botocore.response import StreamingBody
+
+
+class FakeAwsError(Exception):
+    def __init__(self, code, message='', status_code=400):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+class _FakeRequestsResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+def page(items, token, page_size):
+    """
+    Returns the page of items starting at the index encoded in token, and the token of the next page or None
+    """
+    start = int(token) if token else 0
+    end = start + page_size
+    return items[start:end], (str(end) if end < len(items) else None)
+
+
+class FakeAwsBackend:
+    """
+    Local stand-in for the AWS APIs used by the migration scripts.
+
+    Real boto3 clients are created as usual, so parameter validation, paginators and event hooks behave as in
+    production, but every call is answered by a `<service>_<operation>` method of the backend instead of being
+    sent over the network. Each call sleeps for the configured latency first and is counted per operation.
+    Subclasses, usually one per scenario, implement the operations their scripts call.
+    """
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.latency_seconds = latency_ms / 1000
+        self.jitter_seconds = jitter_ms / 1000
+        self.call_counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        client.meta.events.register('before-parameter-build', self._capture_params)
+        client.meta.events.register('before-call', self._handle_call)
+        return client
+
+    @contextlib.contextmanager
+    def install(self):
+        """
+        Route every boto3 client, and the signed EMR requests of emr_helper, created inside the block to this backend
+        """
+        original_client = boto3.session.Session.client
+        backend = self
+
+        def client(session, *args, **kwargs):
+            return backend.attach(original_client(session, *args, **kwargs))
+
+        with mock.patch.object(boto3.session.Session, 'client', client), \
+                mock.patch('migration.utils.emr_helper.requests.request', self._handle_emr_request):
+            yield self
+
+    def _capture_params(self, params, context, **kwargs):
+        context['fake_aws_params'] = dict(params)
+
+    def _handle_call(self, model, context, **kwargs):
+        service_name = model.service_model.service_name.replace('-', '')
+        operation_name = xform_name(model.name)
+        self._count(service_name, operation_name)
+        self._sleep()
+        handler = getattr(self, f"{service_name}_{operation_name}", None)
+        if handler is None:
+            raise NotImplementedError(f"{type(self).__name__} does not implement {service_name}.{operation_name}")
+        try:
+            parsed = handler(**context.get('fake_aws_params', {})) or {}
+            status_code = 200
+        except FakeAwsError as e:
+            parsed = {'Error': {'Code': e.code, 'Message': e.message}}
+            status_code = e.status_code
+        parsed.setdefault('ResponseMetadata', {'HTTPStatusCode': status_code})
+        return AWSResponse(None, status_code, {}, None), parsed
+
+    def _handle_emr_request(self, method, url, headers=None, timeout=None, data=None, **kwargs):
+        operation_name = xform_name(headers['X-Amz-Target'].split('.')[-1])
+        self._count('emr', operation_name)
+        self._sleep()
+        return _FakeRequestsResponse(getattr(self, f"emr_{operation_name}")(data))
+
+    def _count(self, service_name, operation_name):
+        with self._lock:
+            self.call_counts[f"{service_name}.{operation_name}"] += 1
+
+    def _sleep(self):
+        if self.latency_seconds or self.jitter_seconds:
+            with self._lock:
+                jitter = self._random.uniform(0, self.jitter_seconds)
+            time.sleep(self.latency_seconds + jitter)
+
+    @staticmethod
+    def streaming_body(data):
+        return StreamingBody(io.BytesIO(data), len(data))
@@ -0,0 +1,112 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from migration.benchmarks.scenarios import DEFAULT_SIZES, REGION, SCENARIOS
+from migration.cli import REPO_ROOT
+from migration.utils.log import flush_logs
+
+
+def _peak_rss_mb():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def _sizes(scale):
+    return {name: max(1, int(size * scale)) for name, size in DEFAULT_SIZES.items()}
+
+
+def run_scenario(name, scale, latency_ms, jitter_ms, verbose):
+    """
+    Run one scenario in the current process and return its measurements
+    """
+    backend_class, driver = SCENARIOS[name]
+    backend = backend_class(_sizes(scale), latency_ms=latency_ms, jitter_ms=jitter_ms)
+    start_time = time.perf_counter()
+    with contextlib.ExitStack() as output:
+        if not verbose:
+            output.enter_context(contextlib.redirect_stdout(output.enter_context(open(os.devnull, 'w'))))
+        with backend.install():
+            driver(backend)
+        # Buffered records of the scripts are written while stdout is still redirected
+        flush_logs()
+    wall_seconds = time.perf_counter() - start_time
+    return {
+        'scenario': name,
+        'wall_seconds': round(wall_seconds, 3),
+        'api_calls': sum(backend.call_counts.values()),
+        'api_calls_by_operation': dict(backend.call_counts.most_common()),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def _run_scenario_in_subprocess(name, args):
+    # Every scenario gets its own interpreter so peak RSS and module state are not shared between scenarios
+    with tempfile.TemporaryDirectory() as work_dir:
+        result_file = os.path.join(work_dir, 'result.json')
+        env = dict(os.environ,
+                   PYTHONPATH=REPO_ROOT,
+                   AWS_ACCESS_KEY_ID='benchmark',
+                   AWS_SECRET_ACCESS_KEY='benchmark',
+                   AWS_SESSION_TOKEN='benchmark',
+                   AWS_DEFAULT_REGION=REGION,
+                   AWS_EC2_METADATA_DISABLED='true')
+        env.pop('AWS_PROFILE', None)
+        command = [sys.executable, '-m', 'migration.benchmarks.run_benchmarks', '--scenario', name,
+                   '--scale', str(args.scale), '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+                   '--child-result-file', result_file]
+        if args.verbose:
+            command.append('--verbose')
+        subprocess.run(command, cwd=work_dir, env=env, check=True)
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def _print_report(results, args):
+    print(f"\nScale {args.scale}, latency {args.latency_ms} ms + up to {args.jitter_ms} ms jitter per call\n")
+    print(f"{'scenario':<10} {'wall (s)':>10} {'api calls':>10} {'peak RSS (MB)':>14}  top operations")
+    for result in results:
+        top_operations = ', '.join(f"{operation}={count}" for operation, count in list(result['api_calls_by_operation'].items())[:3])
+        print(f"{result['scenario']:<10} {result['wall_seconds']:>10.2f} {result['api_calls']:>10} {result['peak_rss_mb']:>14.1f}  {top_operations}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Run the migration scripts end to end against a simulated AWS backend and report wall time, API calls and peak memory')
+    parser.add_argument('--scenario', nargs='+', choices=sorted(SCENARIOS), default=sorted(SCENARIOS), help='Scenarios to run, defaults to all')
+    parser.add_argument('--scale', type=float, default=1.0, help=f"Multiplier applied to the input sizes {DEFAULT_SIZES}")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated latency of every AWS API call in milliseconds')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra latency of up to this many milliseconds per call')
+    parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', default=False, help='Show the output of the migration scripts')
+    parser.add_argument('--child-result-file', type=str, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    if args.child_result_file:
+        result = run_scenario(args.scenario[0], args.scale, args.latency_ms, args.jitter_ms, args.verbose)
+        with open(args.child_result_file, 'w') as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    for name in args.scenario:
+        print(f"Running scenario {name}...")
+        results.append(_run_scenario_in_subprocess(name, args))
+    _print_report(results, args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scale': args.scale, 'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'results': results}, f, indent=2)
+        print(f"\nWrote benchmark report to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
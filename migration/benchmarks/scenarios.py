@@ -0,0 +1,489 @@
+import datetime
+import json
+import sys
+from unittest import mock
+from urllib.parse import quote
+
+from migration.benchmarks.fake_aws import FakeAwsBackend, FakeAwsError, page
+from migration.cli import load_script
+from migration.utils.codecommit_helper import git_blob_id
+
+REGION = 'us-east-1'
+ACCOUNT_ID = '123456789012'
+DOMAIN_ID = 'dzd_bench'
+PROJECT_ID = 'benchproject'
+REPO_NAME = 'datazone-benchproject-repo'
+NOW = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Input sizes at scale 1.0
+DEFAULT_SIZES = {
+    'emr_workspace_files': 10000,
+    'athena_named_queries': 5000,
+    'glue_tables': 20000,
+    's3_tables': 2000,
+    'lakeformation_grants': 5000,
+}
+
+
+def run_main(main, argv):
+    with mock.patch.object(sys, 'argv', argv):
+        main()
+
+
+class ProjectBackend(FakeAwsBackend):
+    """
+    DataZone project with a Tooling environment and its CodeCommit repository
+    """
+    def __init__(self, sizes, **kwargs):
+        super().__init__(**kwargs)
+        self.sizes = sizes
+        self.committed_files = 0
+        # Path -> blob id of the files of the repository branch
+        self.repo_files = {}
+
+    def datazone_list_environments(self, domainIdentifier, projectIdentifier, nextToken=None, **kwargs):
+        return {'items': [{'id': 'env_tooling', 'name': 'Tooling'}]}
+
+    def datazone_get_environment(self, domainIdentifier, identifier, **kwargs):
+        return {'id': identifier, 'provisionedResources': [{'name': 'codeRepositoryName', 'value': REPO_NAME}]}
+
+    def codecommit_get_branch(self, repositoryName, branchName, **kwargs):
+        return {'branch': {'branchName': branchName, 'commitId': '0' * 40}}
+
+    def codecommit_get_differences(self, repositoryName, afterCommitSpecifier, afterPath=None, NextToken=None, MaxResults=100, **kwargs):
+        paths = sorted(path for path in self.repo_files if not afterPath or path.startswith(afterPath + '/'))
+        paths, next_token = page(paths, NextToken, MaxResults)
+        response = {'differences': [{'afterBlob': {'path': path, 'blobId': self.repo_files[path], 'mode': '100644'}, 'changeType': 'A'}
+                                    for path in paths]}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def codecommit_create_commit(self, repositoryName, branchName, parentCommitId=None, putFiles=(), **kwargs):
+        self.committed_files += len(putFiles)
+        with self._lock:
+            for put_file in putFiles:
+                if 'sourceFile' in put_file:
+                    source_path = put_file['sourceFile']['filePath']
+                    if source_path not in self.repo_files:
+                        raise FakeAwsError('FileDoesNotExistException', f"Source file {source_path} does not exist")
+                    self.repo_files[put_file['filePath']] = self.repo_files[source_path]
+                else:
+                    self.repo_files[put_file['filePath']] = git_blob_id(put_file['fileContent'])
+        return {'commitId': '1' * 40, 'treeId': '2' * 40, 'filesAdded': [{'absolutePath': f['filePath']} for f in putFiles]}
+
+
+class EmrBackend(ProjectBackend):
+    STORAGE_LOCATION = 's3://bench-emr-studio/workspaces'
+    WORKSPACE_ID = 'e-BENCH'
+
+    def __init__(self, sizes, **kwargs):
+        super().__init__(sizes, **kwargs)
+        prefix = f"workspaces/{self.WORKSPACE_ID}/"
+        self.objects = {}
+        for i in range(sizes['emr_workspace_files']):
+            if i % 200 == 0:
+                # A few large notebooks with embedded outputs
+                self.objects[f"{prefix}notebooks/team_{i % 50}/report_{i}.ipynb"] = 1024 * 1024
+            elif i % 20 == 0:
+                self.objects[f"{prefix}notebooks/team_{i % 50}/.ipynb_checkpoints/nb_{i}-checkpoint.ipynb"] = 4096
+            elif i % 10 == 5:
+                # Copies of a few notebooks shared by all teams
+                self.objects[f"{prefix}notebooks/team_{i % 50}/shared/common_{i % 3}_{i}.ipynb"] = 4096
+            else:
+                self.objects[f"{prefix}notebooks/team_{i % 50}/nb_{i}.ipynb"] = 4096
+        self.keys = sorted(self.objects)
+        # One of the shared notebooks was committed by the migration of another workspace
+        self.repo_files['emr_notebooks/es-OTHER/e-OTHER/common_0.ipynb'] = git_blob_id(self._payload(f"{prefix}shared/common_0_0.ipynb", 4096))
+
+    def emr_describe_editor_private(self, data):
+        return {'Editor': {'LocationUri': self.STORAGE_LOCATION}}
+
+    def s3_list_objects_v2(self, Bucket, Prefix='', Delimiter=None, ContinuationToken=None, MaxKeys=1000, **kwargs):
+        # Keys, and with a delimiter the common prefixes of the keys below the next delimiter, in key order
+        entries = []
+        for key in self.keys:
+            if not key.startswith(Prefix):
+                continue
+            end = key.find(Delimiter, len(Prefix)) if Delimiter else -1
+            entry = key if end < 0 else (key[:end + len(Delimiter)],)
+            if not entries or entries[-1] != entry:
+                entries.append(entry)
+        entries, next_token = page(entries, ContinuationToken, MaxKeys)
+        keys = [entry for entry in entries if isinstance(entry, str)]
+        response = {
+            'Contents': [{'Key': key, 'Size': self.objects[key], 'LastModified': NOW} for key in keys],
+            'KeyCount': len(entries),
+            'IsTruncated': next_token is not None,
+        }
+        common_prefixes = [entry[0] for entry in entries if isinstance(entry, tuple)]
+        if common_prefixes:
+            response['CommonPrefixes'] = [{'Prefix': prefix} for prefix in common_prefixes]
+        if next_token:
+            response['NextContinuationToken'] = next_token
+        return response
+
+    def s3_head_object(self, Bucket, Key, **kwargs):
+        if Key not in self.objects:
+            raise FakeAwsError('404', 'Not Found', 404)
+        return {'ContentLength': self.objects[Key], 'ETag': '"bench"', 'LastModified': NOW}
+
+    def s3_get_object(self, Bucket, Key, Range=None, **kwargs):
+        data = self._payload(Key, self.objects[Key])
+        if Range:
+            start, end = Range.replace('bytes=', '').split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': self.streaming_body(data), 'ContentLength': len(data), 'ETag': '"bench"', 'LastModified': NOW}
+
+    @staticmethod
+    def _payload(key, size):
+        # Files have distinct contents, except the copies of a shared notebook
+        name = key.rsplit('/', 1)[-1]
+        source = name.rsplit('_', 1)[0] if '/shared/' in key else key
+        notebook = json.dumps({'cells': [], 'metadata': {'source': source}, 'nbformat': 4, 'nbformat_minor': 5}).encode()
+        return notebook + b' ' * max(0, size - len(notebook))
+
+
+class AthenaBackend(ProjectBackend):
+    WORKGROUP = 'bench-workgroup'
+
+    def athena_list_named_queries(self, WorkGroup, NextToken=None, MaxResults=50, **kwargs):
+        ids = [f"query-{i:06d}" for i in range(self.sizes['athena_named_queries'])]
+        ids, next_token = page(ids, NextToken, MaxResults)
+        response = {'NamedQueryIds': ids}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def athena_get_named_query(self, NamedQueryId, **kwargs):
+        return {'NamedQuery': {
+            'Name': f"bench_{NamedQueryId}",
+            'NamedQueryId': NamedQueryId,
+            'Database': 'bench_db',
+            'WorkGroup': self.WORKGROUP,
+            'QueryString': f"SELECT customer_id, SUM(amount) FROM bench_db.orders WHERE order_id > {NamedQueryId[-6:]} GROUP BY 1",
+        }}
+
+
+class LakeFormationResourcesMixin:
+    """
+    Registered Lake Formation data lake locations
+    """
+    def lakeformation_list_resources(self, NextToken=None, MaxResults=100, FilterConditionList=None, **kwargs):
+        with self._lock:
+            resources = list(self.registered_resources)
+        for condition in FilterConditionList or []:
+            if condition['Field'] == 'ROLE_ARN':
+                resources = [resource for resource in resources if resource.get('RoleArn') in condition['StringValueList']]
+        resources, next_token = page(resources, NextToken, MaxResults)
+        response = {'ResourceInfoList': resources}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def lakeformation_register_resource(self, ResourceArn, RoleArn=None, **kwargs):
+        with self._lock:
+            if any(resource['ResourceArn'] == ResourceArn for resource in self.registered_resources):
+                raise FakeAwsError('AlreadyExistsException', f"{ResourceArn} is already registered")
+            self.registered_resources.append({'ResourceArn': ResourceArn, 'RoleArn': RoleArn})
+
+    def lakeformation_update_resource(self, RoleArn, ResourceArn, **kwargs):
+        pass
+
+    def lakeformation_grant_permissions(self, Principal, Resource, Permissions, **kwargs):
+        pass
+
+    def lakeformation_create_lake_formation_opt_in(self, Principal, Resource, **kwargs):
+        pass
+
+
+class GdcBackend(LakeFormationResourcesMixin, FakeAwsBackend):
+    DATABASE = 'bench_db'
+    COLUMNS = 25
+    PARTITIONS = 3000
+
+    def __init__(self, sizes, **kwargs):
+        super().__init__(**kwargs)
+        self.sizes = sizes
+        # Most tables live in an already registered bucket, the others need to be registered
+        self.registered_resources = [{'ResourceArn': 'arn:aws:s3:::bench-gdc-registered', 'RoleArn': None}]
+
+    def _table(self, index):
+        bucket = 'bench-gdc-unregistered' if index % 10 == 0 else 'bench-gdc-registered'
+        columns = [{'Name': f"column_{c}", 'Type': 'string', 'Comment': 'x' * 40} for c in range(self.COLUMNS)]
+        return {
+            'Name': f"table_{index:06d}",
+            'DatabaseName': self.DATABASE,
+            'CreateTime': NOW,
+            'Parameters': {'classification': 'parquet', 'EXTERNAL': 'TRUE'},
+            'PartitionKeys': [{'Name': 'dt', 'Type': 'string'}],
+            'StorageDescriptor': {
+                'Columns': columns,
+                'Location': f"s3://{bucket}/{self.DATABASE}/table_{index:06d}/",
+                'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+                'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+                'SerdeInfo': {'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'},
+            },
+        }
+
+    def glue_get_tables(self, DatabaseName, NextToken=None, MaxResults=100, **kwargs):
+        indexes, next_token = page(range(self.sizes['glue_tables']), NextToken, MaxResults)
+        response = {'TableList': [self._table(index) for index in indexes]}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def glue_get_table(self, DatabaseName, Name, **kwargs):
+        return {'Table': self._table(int(Name.split('_')[-1]))}
+
+    def _partition_locations(self, index):
+        # A few tables keep their partitions in another bucket, some under the table location, the others have none yet
+        if index % 1000 == 0:
+            return [f"s3://bench-gdc-external/{self.DATABASE}/table_{index:06d}/dt=2024-{p // 28 % 12 + 1:02d}-{p % 28 + 1:02d}/" for p in range(self.PARTITIONS)]
+        if index % 100 == 0:
+            table_location = self._table(index)['StorageDescriptor']['Location']
+            return [f"{table_location}dt={p}/" for p in range(self.PARTITIONS)]
+        return []
+
+    def glue_get_partitions(self, DatabaseName, TableName, NextToken=None, MaxResults=1000, Segment=None, **kwargs):
+        locations = self._partition_locations(int(TableName.split('_')[-1]))
+        if Segment:
+            locations = locations[Segment['SegmentNumber']::Segment['TotalSegments']]
+        locations, next_token = page(locations, NextToken, MaxResults)
+        response = {'Partitions': [{'Values': [location.split('=')[-1].rstrip('/')], 'DatabaseName': DatabaseName, 'TableName': TableName,
+                                    'StorageDescriptor': {'Location': location}} for location in locations]}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def lakeformation_list_permissions(self, Principal=None, Resource=None, **kwargs):
+        # Every database and table is still managed through IAM access
+        if Principal and Principal['DataLakePrincipalIdentifier'] == 'IAM_ALLOWED_PRINCIPALS':
+            return {'PrincipalResourcePermissions': [{'Principal': Principal, 'Resource': Resource, 'Permissions': ['ALL']}]}
+        return {'PrincipalResourcePermissions': []}
+
+    def lakeformation_list_lake_formation_opt_ins(self, **kwargs):
+        return {'LakeFormationOptInsInfoList': []}
+
+
+class S3TablesBackend(LakeFormationResourcesMixin, FakeAwsBackend):
+    NAMESPACES = 20
+
+    def __init__(self, sizes, **kwargs):
+        super().__init__(**kwargs)
+        self.sizes = sizes
+        self.registered_resources = []
+        self.table_bucket_arn = f"arn:aws:s3tables:{REGION}:{ACCOUNT_ID}:bucket/bench-table-bucket"
+
+    def lakeformation_get_data_lake_settings(self, **kwargs):
+        return {'DataLakeSettings': {'DataLakeAdmins': [], 'ReadOnlyAdmins': []}}
+
+    def lakeformation_put_data_lake_settings(self, DataLakeSettings, **kwargs):
+        pass
+
+    def glue_create_catalog(self, Name, CatalogInput, **kwargs):
+        pass
+
+    def s3tables_list_tables(self, tableBucketARN, namespace=None, continuationToken=None, maxTables=1000, **kwargs):
+        tables = [{'namespace': [f"namespace_{i % self.NAMESPACES}"], 'name': f"table_{i:06d}", 'type': 'customer',
+                   'tableARN': f"{tableBucketARN}/table/{i}", 'createdAt': NOW, 'modifiedAt': NOW}
+                  for i in range(self.sizes['s3_tables'])]
+        if namespace:
+            tables = [table for table in tables if namespace in table['namespace']]
+        tables, next_token = page(tables, continuationToken, maxTables)
+        response = {'tables': tables}
+        if next_token:
+            response['continuationToken'] = next_token
+        return response
+
+    def s3tables_get_table(self, tableBucketARN, namespace, name, **kwargs):
+        return {'name': name, 'namespace': [namespace], 'type': 'customer', 'format': 'ICEBERG'}
+
+
+class ByorBackend(LakeFormationResourcesMixin, FakeAwsBackend):
+    ENVIRONMENTS = ['Tooling', 'Lakehouse Database', 'RedshiftServerless']
+    NOISE_ROLES = 2000
+    NOISE_DOMAINS = 200
+    MANAGED_POLICIES = 10
+    INLINE_POLICIES = 5
+    APPS = 20
+    OPT_INS = 200
+
+    def __init__(self, sizes, **kwargs):
+        super().__init__(**kwargs)
+        self.sizes = sizes
+        self.project_role_name = f"datazone_usr_role_{PROJECT_ID}_env_tooling"
+        self.project_role_arn = f"arn:aws:iam::{ACCOUNT_ID}:role/{self.project_role_name}"
+        self.byor_role_arn = f"arn:aws:iam::{ACCOUNT_ID}:role/bench-byor-role"
+        self.role_names = [f"noise-role-{i:05d}" for i in range(self.NOISE_ROLES)] + [self.project_role_name, 'bench-byor-role']
+        self.sagemaker_domain_id = 'd-benchdomain'
+        self.apps = {f"app-{i}": 'InService' for i in range(self.APPS)}
+        self.registered_resources = [{'ResourceArn': f"arn:aws:s3:::bench-lake-{i}", 'RoleArn': self.project_role_arn} for i in range(50)]
+        grants = []
+        for i in range(sizes['lakeformation_grants']):
+            for principal in (self.project_role_arn, f"arn:aws:iam::{ACCOUNT_ID}:role/noise-role-{i % self.NOISE_ROLES:05d}"):
+                grants.append({
+                    'Principal': {'DataLakePrincipalIdentifier': principal},
+                    'Resource': {'Table': {'CatalogId': ACCOUNT_ID, 'DatabaseName': f"db_{i % 100}", 'Name': f"table_{i}"}},
+                    'Permissions': ['SELECT', 'DESCRIBE'],
+                    'PermissionsWithGrantOption': [],
+                })
+        self.grants = grants
+
+    # IAM, which returns policy documents as URL encoded JSON that botocore decodes
+    @staticmethod
+    def _policy_document(document):
+        return quote(json.dumps(document))
+
+    def _trust_policy(self, service):
+        return self._policy_document({'Version': '2012-10-17', 'Statement': [{'Effect': 'Allow', 'Principal': {'Service': service}, 'Action': ['sts:AssumeRole', 'sts:TagSession']}]})
+
+    def iam_list_roles(self, Marker=None, MaxItems=100, **kwargs):
+        names, next_marker = page(self.role_names, Marker, MaxItems)
+        response = {'Roles': [{'RoleName': name, 'Arn': f"arn:aws:iam::{ACCOUNT_ID}:role/{name}"} for name in names], 'IsTruncated': next_marker is not None}
+        if next_marker:
+            response['Marker'] = next_marker
+        return response
+
+    def iam_get_role(self, RoleName, **kwargs):
+        service = 'datazone.amazonaws.com' if RoleName == self.project_role_name else 'sagemaker.amazonaws.com'
+        return {'Role': {'RoleName': RoleName, 'Arn': f"arn:aws:iam::{ACCOUNT_ID}:role/{RoleName}", 'AssumeRolePolicyDocument': self._trust_policy(service)}}
+
+    def iam_update_assume_role_policy(self, RoleName, PolicyDocument, **kwargs):
+        pass
+
+    def iam_list_attached_role_policies(self, RoleName, **kwargs):
+        return {'AttachedPolicies': [{'PolicyName': f"env_tooling-policy-{i}", 'PolicyArn': f"arn:aws:iam::{ACCOUNT_ID}:policy/env_tooling-policy-{i}"} for i in range(self.MANAGED_POLICIES)], 'IsTruncated': False}
+
+    def iam_get_policy(self, PolicyArn, **kwargs):
+        return {'Policy': {'PolicyName': PolicyArn.split('/')[-1], 'Arn': PolicyArn, 'DefaultVersionId': 'v1'}}
+
+    def iam_get_policy_version(self, PolicyArn, VersionId, **kwargs):
+        return {'PolicyVersion': {'VersionId': VersionId, 'Document': self._policy_document({'Version': '2012-10-17', 'Statement': [
+            {'Effect': 'Allow', 'Action': 'iam:PassRole', 'Resource': self.project_role_arn},
+            {'Effect': 'Allow', 'Action': ['s3:GetObject', 's3:PutObject'], 'Resource': [f"arn:aws:s3:::bench-bucket-{i}/*" for i in range(20)]},
+        ]})}}
+
+    def iam_create_policy_version(self, PolicyArn, PolicyDocument, SetAsDefault=False, **kwargs):
+        return {'PolicyVersion': {'VersionId': 'v2'}}
+
+    def iam_attach_role_policy(self, RoleName, PolicyArn, **kwargs):
+        pass
+
+    def iam_list_role_policies(self, RoleName, **kwargs):
+        return {'PolicyNames': [f"inline-policy-{i}" for i in range(self.INLINE_POLICIES)], 'IsTruncated': False}
+
+    def iam_get_role_policy(self, RoleName, PolicyName, **kwargs):
+        return {'RoleName': RoleName, 'PolicyName': PolicyName, 'PolicyDocument': self._policy_document({'Version': '2012-10-17', 'Statement': [{'Effect': 'Allow', 'Action': 'glue:*', 'Resource': '*'}]})}
+
+    def iam_put_role_policy(self, RoleName, PolicyName, PolicyDocument, **kwargs):
+        pass
+
+    def iam_list_role_tags(self, RoleName, **kwargs):
+        return {'Tags': [{'Key': 'RoleName', 'Value': RoleName}, {'Key': 'AmazonDataZoneProject', 'Value': PROJECT_ID}], 'IsTruncated': False}
+
+    def iam_tag_role(self, RoleName, Tags, **kwargs):
+        pass
+
+    # DataZone
+    def datazone_list_environments(self, domainIdentifier, projectIdentifier, **kwargs):
+        return {'items': [{'id': f"env_{i}", 'name': name} for i, name in enumerate(self.ENVIRONMENTS)]}
+
+    def datazone_get_environment(self, domainIdentifier, identifier, **kwargs):
+        return {'id': identifier, 'provisionedResources': [{'name': 'userRoleArn', 'value': self.project_role_arn}]}
+
+    def datazone_list_subscription_targets(self, domainIdentifier, environmentIdentifier, **kwargs):
+        return {'items': []}
+
+    def datazone_disassociate_environment_role(self, **kwargs):
+        pass
+
+    def datazone_associate_environment_role(self, **kwargs):
+        pass
+
+    # SageMaker
+    def sagemaker_list_domains(self, NextToken=None, MaxResults=50, **kwargs):
+        domains = [{'DomainName': f"noise-domain-{i}", 'DomainId': f"d-noise{i}"} for i in range(self.NOISE_DOMAINS)]
+        domains.append({'DomainName': f"SageMakerUnifiedStudio-{PROJECT_ID}", 'DomainId': self.sagemaker_domain_id})
+        domains, next_token = page(domains, NextToken, MaxResults)
+        response = {'Domains': domains}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def sagemaker_list_apps(self, DomainIdEquals=None, NextToken=None, **kwargs):
+        with self._lock:
+            apps = [{'DomainId': DomainIdEquals, 'AppType': 'JupyterLab', 'AppName': name, 'SpaceName': f"space-{name}", 'Status': status}
+                    for name, status in self.apps.items()]
+        return {'Apps': apps}
+
+    def sagemaker_delete_app(self, DomainId, AppType, AppName, **kwargs):
+        with self._lock:
+            self.apps[AppName] = 'Deleted'
+
+    def sagemaker_update_domain(self, DomainId, **kwargs):
+        return {'DomainArn': f"arn:aws:sagemaker:{REGION}:{ACCOUNT_ID}:domain/{DomainId}"}
+
+    # Lake Formation
+    def lakeformation_list_permissions(self, NextToken=None, MaxResults=100, **kwargs):
+        grants, next_token = page(self.grants, NextToken, MaxResults)
+        response = {'PrincipalResourcePermissions': grants}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+    def lakeformation_list_lake_formation_opt_ins(self, Principal=None, NextToken=None, MaxResults=100, **kwargs):
+        opt_ins = [{'Principal': Principal, 'Resource': {'Database': {'Name': f"db_{i}"}}} for i in range(self.OPT_INS)]
+        opt_ins, next_token = page(opt_ins, NextToken, MaxResults)
+        response = {'LakeFormationOptInsInfoList': opt_ins}
+        if next_token:
+            response['NextToken'] = next_token
+        return response
+
+
+def run_emr(backend):
+    from migration.emr import emr_migration
+    run_main(emr_migration.emr_main, [
+        'emr_migration', '--domain-id', DOMAIN_ID, '--project-id', PROJECT_ID, '--emr-studio-id', 'es-BENCH',
+        '--emr-workspace-id', EmrBackend.WORKSPACE_ID, '--region', REGION,
+    ])
+
+
+def run_athena(backend):
+    from migration.athena import athena_workgroup_migration
+    athena_workgroup_migration.migrate_queries(AthenaBackend.WORKGROUP, DOMAIN_ID, PROJECT_ID, ACCOUNT_ID, REGION)
+
+
+def run_gdc(backend):
+    module = load_script('migration/bring-your-own-gdc-assets/bring_your_own_gdc_assets.py', 'bring_your_own_gdc_assets')
+    run_main(module.byogdc_main, [
+        'bring_your_own_gdc_assets.py', '--project-role-arn', f"arn:aws:iam::{ACCOUNT_ID}:role/datazone_usr_role_{PROJECT_ID}",
+        '--database-name', GdcBackend.DATABASE, '--region', REGION,
+    ])
+
+
+def run_s3tables(backend):
+    module = load_script('migration/bring-your-own-s3-tables/bring_your_own_s3_table_bucket.py', 'bring_your_own_s3_table_bucket')
+    run_main(module.byos3tb_main, [
+        'bring_your_own_s3_table_bucket.py', '--project-role-arn', f"arn:aws:iam::{ACCOUNT_ID}:role/datazone_usr_role_{PROJECT_ID}",
+        '--iam-role-arn-lf-resource-register', f"arn:aws:iam::{ACCOUNT_ID}:role/bench-lf-register",
+        '--table-bucket-arn', backend.table_bucket_arn, '--region', REGION, '--execute',
+    ])
+
+
+def run_byor(backend):
+    module = load_script('migration/bring-your-own-role/byor.py', 'byor')
+    run_main(module.byor_main, [
+        'byor.py', 'use-your-own-role', '--domain-id', DOMAIN_ID, '--project-id', PROJECT_ID,
+        '--bring-in-role-arn', backend.byor_role_arn, '--region', REGION, '--execute', '--force-update',
+    ])
+
+
+# Scenario name -> (backend class, driver)
+SCENARIOS = {
+    'emr': (EmrBackend, run_emr),
+    'athena': (AthenaBackend, run_athena),
+    'gdc': (GdcBackend, run_gdc),
+    's3tables': (S3TablesBackend, run_s3tables),
+    'byor': (ByorBackend, run_byor),
+}
@@ -1,7 +1,39 @@
 import argparse
 import boto3
 
-def _parse_args():
+from botocore.exceptions import ClientError
+
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import add_instrumentation_arguments, enable_instrumentation_from_args, phase
+from migration.utils.log import ProgressReporter, add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.pagination import paginate
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+
+logger = get_logger('migration.bring_your_own_gdc_assets')
+
+# Glue scans the partitions of a table in at most 10 parallel segments
+MAX_PARTITION_SCAN_SEGMENTS = 10
+
+class GlueTable:
+    '''
+    Name, S3 location and number of partition keys of a Glue table, all the import needs. Listed tables are reduced
+    to these records page by page, so their columns, partition keys and parameters are never held for the whole database.
+    '''
+    __slots__ = ('name', 'location', 'partition_key_count')
+
+    def __init__(self, name, location, partition_key_count=0):
+        self.name = name
+        self.location = location
+        self.partition_key_count = partition_key_count
+
+    @classmethod
+    def from_table(cls, table):
+        # Views and federated tables have no storage location
+        return cls(table['Name'], table.get('StorageDescriptor', {}).get('Location'), len(table.get('PartitionKeys', [])))
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Python script to bring your glue tables to a specified project in sagemaker unified studio')
 
     parser.add_argument('--project-role-arn', type=str, required=True, help='Project role arn of the project in which you want to bring your own glue tables')
@@ -10,9 +42,17 @@ def _parse_args():
     parser.add_argument('--iam-role-arn-lf-resource-register', type=str, required=False, help='IAM Role arn which would be used in registration of S3 location in LakeFormation. Please refer to https://docs.aws.amazon.com/lake-formation/latest/dg/registration-role.html'
                                                                                               ' for role requirements. If not provided, AWSServiceRoleForLakeFormation service-linked role is used.')
     parser.add_argument('--region', type=str, required=False, help='The AWS region. If not specified, the default region from your AWS credentials will be used')
+    parser.add_argument('--partition-scan-segments', type=int, choices=range(1, MAX_PARTITION_SCAN_SEGMENTS + 1), default=MAX_PARTITION_SCAN_SEGMENTS, metavar=f"1-{MAX_PARTITION_SCAN_SEGMENTS}",
+                        help='Number of parallel segments the partitions of a table with more than one page of partitions are scanned in, to find partition locations outside of the table location')
+    parser.add_argument('--skip-partition-locations', default=False, action='store_true', help='Only register the table locations, not the locations of partitions stored outside of them')
+    add_instrumentation_arguments(parser)
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
+@phase('database opt-in')
 def _check_database_managed_by_iam_access_and_enable_opt_in(database_name, role_arn, lf_client):
     '''
     Checks if the database is managed by IAM access. If it is, then enables hybrid mode for the database to allow Lake Formation permissions to work.
@@ -30,7 +70,7 @@ def _check_database_managed_by_iam_access_and_enable_opt_in(database_name, role_
         ).get('PrincipalResourcePermissions', [])
 
         if db_access:
-            print(f"Glue database: {database_name} is managed via IAM access")
+            logger.info(f"Glue database: {database_name} is managed via IAM access")
             db_opt_in = lf_client.list_lake_formation_opt_ins(
                 Principal={
                     'DataLakePrincipalIdentifier': role_arn
@@ -43,7 +83,7 @@ def _check_database_managed_by_iam_access_and_enable_opt_in(database_name, role_
             ).get('LakeFormationOptInsInfoList', [])
 
             if db_opt_in:
-                print(f"Principal: {role_arn} is already opted-in to {database_name}")
+                logger.info(f"Principal: {role_arn} is already opted-in to {database_name}")
             else:
                 lf_client.create_lake_formation_opt_in(
                     Principal={
@@ -55,14 +95,15 @@ def _check_database_managed_by_iam_access_and_enable_opt_in(database_name, role_
                         }
                     }
                 )
-                print(f"Successfully created Lake Formation opt-in for database: {database_name}")
+                logger.info(f"Successfully created Lake Formation opt-in for database: {database_name}")
         else:
-            print(f"Glue database: {database_name} is already managed via LakeFormation")
+            logger.info(f"Glue database: {database_name} is already managed via LakeFormation")
 
     except Exception as e:
-        print(f"Error checking whether glue database {database_name} is managed by IAM access and setting opt in : {str(e)}")
+        logger.error(f"Error checking whether glue database {database_name} is managed by IAM access and setting opt in : {str(e)}")
         raise e
 
+@phase('table opt-in')
 def _check_table_managed_by_iam_access_and_enable_opt_in(database_name, table_name, role_arn, lf_client):
     '''
     Checks if the table is managed by IAM access. If it is, then enables hybrid mode for the table to allow Lake Formation permissions to work.
@@ -81,7 +122,7 @@ def _check_table_managed_by_iam_access_and_enable_opt_in(database_name, table_na
         ).get('PrincipalResourcePermissions', [])
 
         if table_access:
-            print(f"Glue table: {database_name}.{table_name} is managed via IAM access")
+            logger.debug("Glue table: %s.%s is managed via IAM access", database_name, table_name)
             tb_opt_in = lf_client.list_lake_formation_opt_ins(
                 Principal={
                     'DataLakePrincipalIdentifier': role_arn
@@ -95,7 +136,7 @@ def _check_table_managed_by_iam_access_and_enable_opt_in(database_name, table_na
             ).get('LakeFormationOptInsInfoList', [])
 
             if tb_opt_in:
-                print(f"Principal: {role_arn} is already opted-in to {database_name}.{table_name}")
+                logger.debug("Principal: %s is already opted-in to %s.%s", role_arn, database_name, table_name)
             else:
                 lf_client.create_lake_formation_opt_in(
                     Principal={
@@ -108,12 +149,12 @@ def _check_table_managed_by_iam_access_and_enable_opt_in(database_name, table_na
                         }
                     }
                 )
-                print(f"Successfully created Lake Formation opt-in for {database_name}.{table_name}")
+                logger.debug("Successfully created Lake Formation opt-in for %s.%s", database_name, table_name)
         else:
-            print(f"Glue table: {database_name}.{table_name} is already managed via LakeFormation")
+            logger.debug("Glue table: %s.%s is already managed via LakeFormation", database_name, table_name)
 
     except Exception as e:
-        print(f"Error checking whether glue database and table {database_name}.{table_name} is managed by IAM access and setting opt in : {str(e)}")
+        logger.error(f"Error checking whether glue database and table {database_name}.{table_name} is managed by IAM access and setting opt in : {str(e)}")
         raise e
 
 def _register_s3_location(s3_path, role_arn, lf_client):
@@ -130,7 +171,7 @@ def _register_s3_location(s3_path, role_arn, lf_client):
                 RoleArn=role_arn,
                 HybridAccessEnabled=True
             )
-            print(f"Successfully registered {resource_arn} to {role_arn}")
+            logger.info(f"Successfully registered {resource_arn} to {role_arn}")
         else:
             # if role arn for access is not provided by the user, AWSServiceRoleForLakeFormationDataAccess service linked role would be used
             lf_client.register_resource(
@@ -138,12 +179,13 @@ def _register_s3_location(s3_path, role_arn, lf_client):
                 UseServiceLinkedRole=True,
                 HybridAccessEnabled=True
             )
-            print(f"Successfully registered {resource_arn} to AWSServiceRoleForLakeFormationDataAccess service linked role")
+            logger.info(f"Successfully registered {resource_arn} to AWSServiceRoleForLakeFormationDataAccess service linked role")
 
     except Exception as e:
-        print(f"Error registering {resource_arn}: {str(e)}")
+        logger.error(f"Error registering {resource_arn}: {str(e)}")
         raise e
 
+@phase('LF grant')
 def _grant_permissions_to_table(role_arn, database_name, table_name, lf_client):
     try:
         lf_client.grant_permissions(
@@ -159,9 +201,9 @@ def _grant_permissions_to_table(role_arn, database_name, table_name, lf_client):
             Permissions=['ALL'],
             PermissionsWithGrantOption=['ALL']
         )
-        print(f"Successfully granted ALL permission and ALL WITH GRANT Option permission on database {database_name}.{table_name} to {role_arn}")
+        logger.debug("Successfully granted ALL permission and ALL WITH GRANT Option permission on database %s.%s to %s", database_name, table_name, role_arn)
     except Exception as e:
-        print(f"Error granting permissions: {str(e)}")
+        logger.error(f"Error granting permissions: {str(e)}")
         raise e
 
 def s3_arn_to_s3_path(arn):
@@ -200,97 +242,146 @@ def _get_S3_registered_locations(lf_client):
     Get all registered S3 locations
     """
     registered_locations = []
-    next_token = None
 
     try:
-        while True:
-            params = {}
-            if next_token:
-                params['NextToken'] = next_token
-
-            response = lf_client.list_resources(**params)
-
-            # Process resources in current page
-            for resource in response.get('ResourceInfoList', []):
-                resource_arn = resource.get('ResourceArn', '')
-                if 's3:::' in resource_arn:
-                    registered_locations.append(s3_arn_to_s3_path(resource_arn))
-
-            # Check if there are more resources to fetch
-            next_token = response.get('NextToken')
-            if not next_token:
-                break
+        for resource in paginate(lf_client.list_resources, 'ResourceInfoList'):
+            resource_arn = resource.get('ResourceArn', '')
+            if 's3:::' in resource_arn:
+                registered_locations.append(s3_arn_to_s3_path(resource_arn))
 
     except ClientError as e:
-        print(f"Error calling Lake Formation list_resources api to fetch registered S3 locations: {str(e)}")
+        logger.error(f"Error calling Lake Formation list_resources api to fetch registered S3 locations: {str(e)}")
         raise e
 
     return registered_locations
 
-def _check_and_register_location(tables, role_arn, lf_client):
-    s3_registered_locations = _get_S3_registered_locations(lf_client)
+def _is_covered(s3_path, s3_locations):
+    return any(subpath in s3_locations for subpath in _get_s3_subpaths(s3_path))
 
+def collapse_s3_locations(s3_locations):
+    """
+    Returns the minimal set of S3 locations covering all given locations, i.e. without locations below another one
+    """
+    minimal_locations = set()
+    # Parents are shorter than their children, so they are kept first
+    for s3_location in sorted({location.rstrip('/') for location in s3_locations}, key=len):
+        if not _is_covered(s3_location, minimal_locations):
+            minimal_locations.add(s3_location)
+    return minimal_locations
+
+def _partition_root(s3_location, partition_key_count):
+    # Hive style partition locations end with one `key=value` folder per partition key, their parent holds all partitions
+    parts = s3_location.rstrip('/').split('/')
+    for _ in range(partition_key_count):
+        if len(parts) <= 4 or '=' not in parts[-1]:
+            break
+        parts.pop()
+    return '/'.join(parts)
+
+async def _scan_partition_locations(engine, glue_client, database_name, table, segments):
+    glue = engine.wrap(glue_client)
+    table_roots = {table.location.rstrip('/')} if table.location else set()
+    partition_roots = set()
+
+    def add(partition):
+        # Partition definitions are reduced to the roots of their locations right away, only these are kept
+        location = partition.get('StorageDescriptor', {}).get('Location')
+        if location:
+            partition_root = _partition_root(location, table.partition_key_count)
+            if not _is_covered(partition_root, table_roots):
+                partition_roots.add(partition_root)
+
+    params = {'DatabaseName': database_name, 'TableName': table.name, 'ExcludeColumnSchema': True}
+    # Most tables have a single page of partitions, only scan the larger ones in parallel segments. The segments cover
+    # the whole table, so a larger table's first page is read again by them and only kept from there; scanning in
+    # segments right away would turn the single call of every small table into `segments` calls.
+    first_page = await glue.get_partitions(**params)
+    if not first_page.get('NextToken'):
+        for partition in first_page.get('Partitions', []):
+            add(partition)
+    else:
+        async def scan_segment(segment_number):
+            async for partition in glue.paginate('get_partitions', 'Partitions', Segment={'SegmentNumber': segment_number, 'TotalSegments': segments}, **params):
+                add(partition)
+        await gather_in_order(scan_segment(segment_number) for segment_number in range(segments))
+    return collapse_s3_locations(partition_roots)
+
+@phase('partition location scan')
+def _get_partition_locations(database_name, tables, glue_client, segments=MAX_PARTITION_SCAN_SEGMENTS):
+    '''
+    Returns the minimal set of S3 locations holding the partitions of the tables which are stored outside of their table's location
+    '''
+    partitioned_tables = [table for table in tables if table.partition_key_count]
+    engine = AsyncAwsEngine()
+    with ProgressReporter(logger, 'Scanned partitioned tables', total=len(partitioned_tables)) as progress:
+        async def scan_table(table):
+            partition_locations = await _scan_partition_locations(engine, glue_client, database_name, table, segments)
+            progress.update()
+            if partition_locations:
+                logger.debug("Table %s has partitions outside of its location in %s", table.name, sorted(partition_locations))
+            return partition_locations
+
+        async def scan_tables():
+            return await gather_in_order(scan_table(table) for table in partitioned_tables)
+
+        try:
+            results = engine.run_until_complete(scan_tables())
+        except ClientError as e:
+            logger.error(f"Error while scanning partitions of tables in database {database_name} : {e}")
+            raise e
+    return collapse_s3_locations(set().union(*results))
+
+@phase('S3 location registration')
+def _check_and_register_location(tables, role_arn, lf_client, partition_locations=()):
+    s3_registered_locations = set(_get_S3_registered_locations(lf_client))
+
+    s3_locations = []
     for table in tables:
-        # Remove trailing '/' if present
-        s3_location = table['StorageDescriptor']['Location'].rstrip('/')
-        s3_subpaths = _get_s3_subpaths(s3_location)
-        s3_registration = False
-        for s3_path in s3_subpaths:
-            if s3_path in s3_registered_locations:
-                print(f"S3 location: {s3_location} is already registered in Lake Formation, either directly or through its subpaths.")
-                s3_registration = True
-                break
+        if not table.location:
+            logger.debug("Table %s has no S3 location, skipping its registration.", table.name)
+            continue
+        s3_locations.append(table.location)
+    s3_locations.extend(sorted(partition_locations))
 
-        if not s3_registration:
-            _register_s3_location(s3_location, role_arn, lf_client)
-            s3_registered_locations.append(s3_location)
+    for s3_location in s3_locations:
+        # Remove trailing '/' if present
+        s3_location = s3_location.rstrip('/')
+        if _is_covered(s3_location, s3_registered_locations):
+            logger.debug("S3 location: %s is already registered in Lake Formation, either directly or through its subpaths.", s3_location)
+            continue
+        _register_s3_location(s3_location, role_arn, lf_client)
+        s3_registered_locations.add(s3_location)
 
 
+@phase('table listing')
 def _get_table(database_name, table_name, glue_client):
     try:
-        return glue_client.get_table(DatabaseName=database_name, Name=table_name)['Table']
+        return GlueTable.from_table(glue_client.get_table(DatabaseName=database_name, Name=table_name)['Table'])
     except Exception as e:
-        print(f"Error retrieving table in database {database_name} : {str(e)}")
+        logger.error(f"Error retrieving table in database {database_name} : {str(e)}")
         raise e
 
+async def _list_tables(engine, database_name, glue_client):
+    # GetTables can only project table names and types, the locations need the full definitions
+    return [GlueTable.from_table(table) async for table in engine.wrap(glue_client).paginate('get_tables', 'TableList', DatabaseName=database_name)]
+
+@phase('table listing')
 def _get_all_tables_for_a_database(database_name, glue_client):
     try:
-        tables = []
-        next_token = None
-
-        while True:
-            if next_token:
-                response = glue_client.get_tables(
-                    DatabaseName=database_name,
-                    NextToken=next_token
-                )
-            else:
-                response = glue_client.get_tables(
-                    DatabaseName=database_name
-                )
-
-            for table in response['TableList']:
-                tables.append(table)
-
-            if 'NextToken' in response:
-                next_token = response['NextToken']
-            else:
-                break
-
-        return tables
+        engine = AsyncAwsEngine()
+        return engine.run_until_complete(_list_tables(engine, database_name, glue_client))
 
     except ClientError as e:
-        print(f"Error while retrieving tables in database {database_name} : {e}")
+        logger.error(f"Error while retrieving tables in database {database_name} : {e}")
         raise e
 
-def byogdc_main():
-    args = _parse_args()
+def run_migration(args):
     if args.region:
         session = boto3.Session(region_name=args.region)
     else:
         session = boto3.Session()
-    lf_client = session.client('lakeformation')
-    glue_client = session.client('glue')
+    lf_client = create_client('lakeformation', session=session)
+    glue_client = create_client('glue', session=session)
 
     try:
         _check_database_managed_by_iam_access_and_enable_opt_in(args.database_name, args.project_role_arn, lf_client)
@@ -300,17 +391,32 @@ def byogdc_main():
         else:
             tables = _get_all_tables_for_a_database(args.database_name, glue_client)
 
-        _check_and_register_location(tables, args.iam_role_arn_lf_resource_register, lf_client)
+        partition_locations = set()
+        if not args.skip_partition_locations:
+            partition_locations = _get_partition_locations(args.database_name, tables, glue_client, args.partition_scan_segments)
+            logger.info("Found %d S3 locations of partitions stored outside of their table location", len(partition_locations))
+
+        _check_and_register_location(tables, args.iam_role_arn_lf_resource_register, lf_client, partition_locations)
 
-        for table in tables:
-            table_name = table['Name']
-            _check_table_managed_by_iam_access_and_enable_opt_in(args.database_name, table_name, args.project_role_arn, lf_client)
-            _grant_permissions_to_table(args.project_role_arn, args.database_name, table_name, lf_client)
+        with ProgressReporter(logger, 'Imported tables', total=len(tables)) as progress:
+            for table in tables:
+                table_name = table.name
+                _check_table_managed_by_iam_access_and_enable_opt_in(args.database_name, table_name, args.project_role_arn, lf_client)
+                _grant_permissions_to_table(args.project_role_arn, args.database_name, table_name, lf_client)
+                progress.update()
 
     except Exception as e:
-        print(f"An error occurred during import process: {e}")
+        logger.error(f"An error occurred during import process: {e}")
         raise
+    logger.info("Successfully imported resources into provided project")
+
+def byogdc_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation_from_args(args)
+    enable_profiling_from_args(args)
+    enable_rate_limiting_from_args(args)
+    run_migration(args)
 
 if __name__ == "__main__":
     byogdc_main()
-    print(f"Successfully imported resources into provided project")
@@ -1,21 +1,92 @@
 import argparse
+import asyncio
+import copy
+import csv
+import os
+import threading
 import time
 import boto3
 import json
-from pprint import pprint
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from botocore.exceptions import ClientError
 
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import add_instrumentation_arguments, enable_instrumentation_from_args, in_current_phase, phase
+from migration.utils.journal import MigrationJournal
+from migration.utils.log import ProgressReporter, add_logging_arguments, configure_logging_from_args, get_logger, lazy_pformat
+from migration.utils.pagination import paginate
+from migration.utils.policy import (INLINE_ROLE_POLICIES_MAX_CHARACTERS, MANAGED_POLICY_MAX_CHARACTERS, TRUST_POLICY_MAX_CHARACTERS,
+                                    check_policy_size, merge_policy_documents, policy_size)
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+from migration.utils.sagemaker_helper import DEFAULT_DOMAIN_CACHE_TTL_SECONDS, SageMakerDomainIndex, get_domain_id_from_provisioned_resources
+
 ROLE_REPLACEMENT = 'use-your-own-role'
 ROLE_ENHANCEMENT = 'enhance-project-role'
+BATCH = 'batch'
+# Number of concurrent IAM read calls when fetching role policies
+IAM_MAX_WORKERS = 8
+# Number of concurrent Lake Formation resource updates
+LAKEFORMATION_MAX_WORKERS = 8
+# Journal steps recorded while copying DataZone subscriptions
+SUBSCRIPTION_GRANTS_RECORDED = 'subscription grants recorded'
+SUBSCRIPTION_GRANTS_DELETED = 'subscription grants deleted'
+SUBSCRIPTION_TARGET_UPDATED = 'subscription target updated'
+SUBSCRIPTION_GRANT_CREATED = 'subscription grant created'
+
+logger = get_logger('migration.byor')
+
+class AccountIndex:
+    """
+    In-memory indexes over account wide listings, shared by all projects of a batch run so that
+    the IAM role, SageMaker domain and Lake Formation permission listings are each done only once.
+    """
+    def __init__(self, iam_client, lakeformation, sagemaker_domain_index):
+        self._iam_client = iam_client
+        self._lakeformation = lakeformation
+        self.sagemaker_domain_index = sagemaker_domain_index
+        self._role_names_lock = threading.Lock()
+        self._grants_lock = threading.Lock()
+        self._role_names = None
+        self._grants_by_principal = None
+
+    def find_project_role_name(self, project_id):
+        with self._role_names_lock:
+            if self._role_names is None:
+                self._role_names = []
+                paginator = self._iam_client.get_paginator('list_roles')
+                for page in paginator.paginate():
+                    self._role_names.extend(role['RoleName'] for role in page['Roles'])
+        return next((name for name in self._role_names if f"datazone_usr_role_{project_id}" in name), None)
+
+    def list_lakeformation_grants(self, principal_arn):
+        with self._grants_lock:
+            if self._grants_by_principal is None:
+                self._grants_by_principal = {}
+                for grant in paginate(self._lakeformation.list_permissions, 'PrincipalResourcePermissions'):
+                    principal = grant['Principal']['DataLakePrincipalIdentifier']
+                    self._grants_by_principal.setdefault(principal, []).append(grant)
+        # Grants are modified by _filter_lakeformationsource, hand out copies
+        return copy.deepcopy(self._grants_by_principal.get(principal_arn, []))
 
 # There should only one Role found per Project
-def _find_project_execution_role(args, iam_client):
+@phase('role lookup')
+def _find_project_execution_role(args, iam_client, account_index=None):
+    if account_index:
+        role_name = account_index.find_project_role_name(args.project_id)
+        if role_name:
+            logger.info(f"Found Project Role: {role_name}")
+            return iam_client.get_role(
+                RoleName=role_name,
+            )
+        raise Exception(f"Could not find execution IAM role for Project {args.project_id}")
     paginator = iam_client.get_paginator('list_roles')
     for page in paginator.paginate():
         for role in page['Roles']:
             if f"datazone_usr_role_{args.project_id}" in role['RoleName']:
-                print(f"Found Project Role: {role['RoleName']}\n")
+                logger.info(f"Found Project Role: {role['RoleName']}")
                 return iam_client.get_role(
                     RoleName=role['RoleName'],
                 )
@@ -26,76 +97,120 @@ def _get_role_name_from_arn(role_arn):
 
 # Combine trust policy statements and dedup on statement level
 def _combine_trust_policy(trust_policy_1, trust_policy_2):
-    combined_trust_policy = trust_policy_1.copy()
-    for new_statement in trust_policy_2['Statement']:
-        if not any(_statements_equal(new_statement, existing_statement) 
-                   for existing_statement in combined_trust_policy['Statement']):
-            combined_trust_policy['Statement'].append(new_statement)
-    return combined_trust_policy
-
-def _statements_equal(statement1, statement2):
-    # Helper function to sort nested structures in trust policy
-    def sort_nested(item):
-        if isinstance(item, dict):
-            return {k: sort_nested(v) for k, v in sorted(item.items())}
-        elif isinstance(item, list):
-            return sorted(sort_nested(i) for i in item)
-        else:
-            return item
-
-    # Sort all nested structures
-    sorted_statement1 = sort_nested(statement1)
-    sorted_statement2 = sort_nested(statement2)
-    return json.dumps(sorted_statement1, sort_keys=True) == json.dumps(sorted_statement2, sort_keys=True)
+    return merge_policy_documents(trust_policy_1, trust_policy_2)
 
 
+@phase('trust policy update')
 def _update_trust_policy(role_name, new_trust_policy, iam_client, execute_flag):
+    check_policy_size(policy_size(new_trust_policy), TRUST_POLICY_MAX_CHARACTERS, f"Combined trust policy of role `{role_name}`")
     if execute_flag:
-        print(f"Updating trust policy for role: {role_name}")
+        logger.info(f"Updating trust policy for role: {role_name}")
         iam_client.update_assume_role_policy(
             RoleName=role_name,
-            PolicyDocument=str(new_trust_policy).replace("'", '"')
+            PolicyDocument=json.dumps(new_trust_policy)
         )
-        print(f"Trust policy updated successfully for role: `{role_name}`\n")
+        logger.info(f"Trust policy updated successfully for role: `{role_name}`")
     else:
-        print(f"New trust policy for role `{role_name}` would be:")
-        pprint(new_trust_policy)
-        print(f"Trust policy update skipped for role: `{role_name}`, set --execute flag to True to do the actual update.\n")
+        logger.info("New trust policy for role `%s` would be:\n%s", role_name, lazy_pformat(new_trust_policy))
+        logger.info(f"Trust policy update skipped for role: `{role_name}`, set --execute flag to True to do the actual update.")
+
+def _list_role_items(iam_client, operation, result_key, role_name):
+    items = []
+    for page in iam_client.get_paginator(operation).paginate(RoleName=role_name):
+        items.extend(page[result_key])
+    return items
+
+def _get_managed_policy_document(iam_client, policy_arn):
+    policy = iam_client.get_policy(PolicyArn=policy_arn)['Policy']
+    policy_document = iam_client.get_policy_version(
+        PolicyArn=policy_arn,
+        VersionId=policy['DefaultVersionId']
+    )['PolicyVersion']['Document']
+    return policy, policy_document
+
+def _get_inline_policy_document(iam_client, role_name, policy_name):
+    policy_document = iam_client.get_role_policy(
+        RoleName=role_name,
+        PolicyName=policy_name
+    )['PolicyDocument']
+    return policy_name, policy_document
+
+class RolePolicies:
+    def __init__(self, managed_policies, inline_policies, tags):
+        # List of (policy, policy document) tuples for attached managed policies
+        self.managed_policies = managed_policies
+        # List of (policy name, policy document) tuples for inline policies
+        self.inline_policies = inline_policies
+        self.tags = tags
+
+# Fetch everything the policy migration stage needs from a role. Listing calls and per policy document
+# calls are independent of each other, so they are issued concurrently instead of one by one.
+@phase('policy copy')
+def _fetch_role_policies(role, iam_client):
+    role_name = role['Role']['RoleName']
+    list_role_items = in_current_phase(_list_role_items)
+    with ThreadPoolExecutor(max_workers=IAM_MAX_WORKERS) as executor:
+        attached_policies = executor.submit(list_role_items, iam_client, 'list_attached_role_policies', 'AttachedPolicies', role_name)
+        inline_policy_names = executor.submit(list_role_items, iam_client, 'list_role_policies', 'PolicyNames', role_name)
+        tags = executor.submit(list_role_items, iam_client, 'list_role_tags', 'Tags', role_name)
+        managed_policies = [executor.submit(in_current_phase(_get_managed_policy_document), iam_client, policy['PolicyArn'])
+                            for policy in attached_policies.result()]
+        inline_policies = [executor.submit(in_current_phase(_get_inline_policy_document), iam_client, role_name, policy_name)
+                           for policy_name in inline_policy_names.result()]
+        return RolePolicies(
+            [future.result() for future in managed_policies],
+            [future.result() for future in inline_policies],
+            tags.result()
+        )
+
+# Replace old_value with new_value in every string of a policy document with a single walk of the document.
+# Returns the new document and whether anything was replaced.
+def _replace_in_policy_document(policy_document, old_value, new_value):
+    changed = False
+
+    def replace(item):
+        nonlocal changed
+        if isinstance(item, dict):
+            return {replace(k): replace(v) for k, v in item.items()}
+        elif isinstance(item, list):
+            return [replace(i) for i in item]
+        elif isinstance(item, str) and old_value in item:
+            changed = True
+            return item.replace(old_value, new_value)
+        else:
+            return item
+
+    return replace(policy_document), changed
 
 # Customer managed Policy may contain project user role's Arn, we need to update policy content with BYOR role when necessary
 # We will only do the change for both
 #   case 1: Role Replacement
 #   case 2: Role Enhancement
-# so basically just check all source role's inline policies, and update any source role arn string to dest role arn
-def _copy_managed_policies_arn(source_role, dest_role, environment_id_list, iam_client, execute_flag):
-    paginator = iam_client.get_paginator('list_attached_role_policies')
+# so basically just check all source role's managed policies, and update any source role arn string to dest role arn
+@phase('policy copy')
+def _copy_managed_policies_arn(source_role, dest_role, source_policies, environment_id_list, iam_client, execute_flag):
     policies_to_attach = []
-    for page in paginator.paginate(RoleName=source_role['Role']['RoleName']):
-        for policy in page['AttachedPolicies']:
-            policies_to_attach.append(policy['PolicyArn'])
-    
-    for policy_arn in policies_to_attach:
-        policy = iam_client.get_policy(PolicyArn=policy_arn)['Policy']
-        policy_document = iam_client.get_policy_version(
-            PolicyArn=policy_arn,
-            VersionId=policy['DefaultVersionId']
-        )['PolicyVersion']['Document']
+    for policy, policy_document in source_policies.managed_policies:
+        policies_to_attach.append(policy['Arn'])
         # Replace the role ARN if source_role is present in customer managed policy
-        for env_id in environment_id_list:
-            if env_id in policy['PolicyName']:
-                policy_str = json.dumps(policy_document)
-                if source_role['Role']['Arn'] in policy_str:
-                    update_policy_str = policy_str.replace(source_role['Role']['Arn'], dest_role['Role']['Arn'])
-                    print(f"Updated policy doc for {policy['PolicyName']}: {update_policy_str}")
-                    if execute_flag:
-                        iam_client.create_policy_version(
-                            PolicyArn=policy_arn,
-                            PolicyDocument=update_policy_str,
-                            SetAsDefault=True
-                        )
-                        print(f"Successfully updated policy {policy['PolicyName']} with new version after replacing execution role content.")
-                    else:
-                        print(f"Policy {policy['PolicyName']} update skipped, set --execute flag to True to do the actual update.\n")
+        if not any(env_id in policy['PolicyName'] for env_id in environment_id_list):
+            continue
+        update_policy_document, changed = _replace_in_policy_document(policy_document, source_role['Role']['Arn'], dest_role['Role']['Arn'])
+        # Skip unchanged documents, e.g. on reruns, so we do not run into the limit of 5 versions per policy
+        if not changed:
+            continue
+        update_policy_str = json.dumps(update_policy_document)
+        check_policy_size(policy_size(update_policy_document), MANAGED_POLICY_MAX_CHARACTERS, f"Updated policy {policy['PolicyName']}")
+        logger.info(f"Updated policy doc for {policy['PolicyName']}: {update_policy_str}")
+        if execute_flag:
+            iam_client.create_policy_version(
+                PolicyArn=policy['Arn'],
+                PolicyDocument=update_policy_str,
+                SetAsDefault=True
+            )
+            logger.info(f"Successfully updated policy {policy['PolicyName']} with new version after replacing execution role content.")
+        else:
+            logger.info(f"Policy {policy['PolicyName']} update skipped, set --execute flag to True to do the actual update.")
 
     if execute_flag:
         for policy_arn in policies_to_attach:
@@ -103,60 +218,55 @@ def _copy_managed_policies_arn(source_role, dest_role, environment_id_list, iam_
                 RoleName=dest_role['Role']['RoleName'],
                 PolicyArn=policy_arn
             )
-        print(f"Managed policies attached successfully to role: `{dest_role['Role']['RoleName']}`\n")
+        logger.info(f"Managed policies attached successfully to role: `{dest_role['Role']['RoleName']}`")
     else:
-        print(f"Managed policies to attach to role `{dest_role['Role']['RoleName']}` would be:")
-        pprint(policies_to_attach)
-        print(f"Managed policies attach skipped for role: `{dest_role['Role']['RoleName']}`, set --execute flag to True to do the actual update.\n")
-
-def _copy_inline_policies_arn(source_role, dest_role, iam_client, execute_flag):
-    paginator = iam_client.get_paginator('list_role_policies')
-    for page in paginator.paginate(RoleName=source_role['Role']['RoleName']):
-        for policy_name in page['PolicyNames']:
-            policy_document = iam_client.get_role_policy(
-                RoleName=source_role['Role']['RoleName'],
-                PolicyName=policy_name
-            )['PolicyDocument']
-            if execute_flag:
-                iam_client.put_role_policy(
-                    RoleName=dest_role['Role']['RoleName'],
-                    PolicyName=policy_name,
-                    PolicyDocument=str(policy_document).replace("'", '"')
-                )
-            else:
-                print(f"New inline policy `{policy_name}` would be copied to role `{dest_role['Role']['RoleName']}` is:")
-                pprint(policy_document)
-                print(f"Skipping copy new inline policy `{policy_name}` to role `{dest_role['Role']['RoleName']}`, set --execute flag to True to do the actual copy.\n")
+        logger.info("Managed policies to attach to role `%s` would be:\n%s", dest_role['Role']['RoleName'], lazy_pformat(policies_to_attach))
+        logger.info(f"Managed policies attach skipped for role: `{dest_role['Role']['RoleName']}`, set --execute flag to True to do the actual update.")
+
+@phase('policy copy')
+def _copy_inline_policies_arn(dest_role, source_policies, iam_client, execute_flag):
+    check_policy_size(sum(policy_size(policy_document) for _, policy_document in source_policies.inline_policies),
+                      INLINE_ROLE_POLICIES_MAX_CHARACTERS, f"Inline policies copied to role `{dest_role['Role']['RoleName']}`")
+    for policy_name, policy_document in source_policies.inline_policies:
+        if execute_flag:
+            iam_client.put_role_policy(
+                RoleName=dest_role['Role']['RoleName'],
+                PolicyName=policy_name,
+                PolicyDocument=json.dumps(policy_document)
+            )
+        else:
+            logger.info("New inline policy `%s` would be copied to role `%s` is:\n%s", policy_name, dest_role['Role']['RoleName'], lazy_pformat(policy_document))
+            logger.info(f"Skipping copy new inline policy `{policy_name}` to role `{dest_role['Role']['RoleName']}`, set --execute flag to True to do the actual copy.")
     if execute_flag:
-        print(f"Successfully copied inline policies to role: `{dest_role['Role']['RoleName']}`\n")
+        logger.info(f"Successfully copied inline policies to role: `{dest_role['Role']['RoleName']}`")
  
-def _copy_tags(source_role_name, dest_role_name, iam_client, execute_flag):
-    paginator = iam_client.get_paginator('list_role_tags')
+@phase('policy copy')
+def _copy_tags(source_role_name, dest_role_name, source_policies, iam_client, execute_flag):
     tags_to_copy = []
-    for page in paginator.paginate(RoleName=source_role_name):
-        for tag in page['Tags']:
-            if tag['Key'] == 'RoleName' and tag['Value'] == source_role_name:
-                tag['Value'] = dest_role_name
-                print(f"Update IAM Role's tag {tag['Key']} value from {source_role_name} to {dest_role_name}\n")
-            tags_to_copy.append(tag)
+    for tag in source_policies.tags:
+        if tag['Key'] == 'RoleName' and tag['Value'] == source_role_name:
+            tag = {'Key': tag['Key'], 'Value': dest_role_name}
+            logger.info(f"Update IAM Role's tag {tag['Key']} value from {source_role_name} to {dest_role_name}")
+        tags_to_copy.append(tag)
     if tags_to_copy and execute_flag:
         iam_client.tag_role(
             RoleName=dest_role_name,
             Tags=tags_to_copy
         )
-        print(f"Tags copied successfully to role: `{dest_role_name}`\n")
+        logger.info(f"Tags copied successfully to role: `{dest_role_name}`")
     else:
-        print(f"Tags to copy to role `{dest_role_name}` would be:")
-        pprint(tags_to_copy)
-        print(f"Tags copy skipped for role: `{dest_role_name}`, set --execute flag to True to do the actual update.\n")
+        logger.info("Tags to copy to role `%s` would be:\n%s", dest_role_name, lazy_pformat(tags_to_copy))
+        logger.info(f"Tags copy skipped for role: `{dest_role_name}`, set --execute flag to True to do the actual update.")
 
 class EnvironmentWithRole:
-    def __init__(self, name, id, user_role_arn):
+    def __init__(self, name, id, user_role_arn, sagemaker_domain_id=None):
         self.name = name
         self.id = id
         self.user_role_arn = user_role_arn
+        self.sagemaker_domain_id = sagemaker_domain_id
 
 # Get environment name, id and its userRoleArn
+@phase('environment lookup')
 def _get_enviroments_with_role_from_project(datazone, args, fallback_role_arn):
     environment_lists = []
     paginator = datazone.get_paginator('list_environments')
@@ -172,15 +282,16 @@ def _get_enviroments_with_role_from_project(datazone, args, fallback_role_arn):
             except (IndexError, KeyError):
                 # Use fallback role if userRoleArn is not found
                 role_arn = fallback_role_arn
-            environment_lists.append(EnvironmentWithRole(environment['name'], environment['id'], role_arn))
+            sagemaker_domain_id = get_domain_id_from_provisioned_resources(provisioned_resources)
+            environment_lists.append(EnvironmentWithRole(environment['name'], environment['id'], role_arn, sagemaker_domain_id))
     return environment_lists
                 
-def wait_for_subscription_grant_deletion(datazone, domain_id, grant_id, max_attempts=30, delay_seconds=5):
+async def wait_for_subscription_grant_deletion(datazone, domain_id, grant_id, max_attempts=30, delay_seconds=5):
     """
     Wait for subscription grant deletion to complete
     
     Args:
-        datazone: DataZone client
+        datazone: DataZone client wrapped by an AsyncAwsEngine
         domain_id: Domain identifier
         grant_id: Subscription grant identifier
         max_attempts: Maximum number of polling attempts
@@ -191,31 +302,141 @@ def wait_for_subscription_grant_deletion(datazone, domain_id, grant_id, max_atte
     """
     for attempt in range(max_attempts):
         try:
-            response = datazone.get_subscription_grant(
+            response = await datazone.get_subscription_grant(
                 domainIdentifier=domain_id,
                 identifier=grant_id
             )
             
             status = response.get('status')
             if status == 'COMPLETED':
-                print(f"Deleted subscription grant `{grant_id}` successfully")
+                logger.debug("Deleted subscription grant `%s` successfully", grant_id)
                 return True
             elif status in ['REVOKE_FAILED', 'GRANT_AND_REVOKE_FAILED']:
-                print(f"Deletion failed with status: {status}")
+                logger.error(f"Deletion failed with status: {status}")
                 return False
                 
-            print(f"Deletion of subscription grant: `{grant_id}` in progress. Current status: {status}. Attempt {attempt + 1}/{max_attempts}")
-            time.sleep(delay_seconds)
+            logger.debug("Deletion of subscription grant: `%s` in progress. Current status: %s. Attempt %d/%d", grant_id, status, attempt + 1, max_attempts)
+            await asyncio.sleep(delay_seconds)
             
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                print(f"Subscription grant {grant_id} no longer exists")
+                logger.debug("Subscription grant %s no longer exists", grant_id)
                 return True
             raise
     
     raise TimeoutError(f"Deletion of subscription grant: `{grant_id}` did not complete after {max_attempts} attempts")
 
-def _copy_datazone_subscriptions(domain_id, environment_id, datazone, byor_role, execute_flag):
+async def _delete_subscription_grant(datazone, domain_id, grant_id, journal):
+    logger.debug("Calling delete subscription grant %s API...", grant_id)
+    try:
+        await datazone.delete_subscription_grant(
+            domainIdentifier=domain_id,
+            identifier=grant_id
+        )
+    except ClientError as e:
+        # Deleted by a previous run which failed before recording it
+        if not (journal and e.response['Error']['Code'] == 'ResourceNotFoundException'):
+            raise e
+    await wait_for_subscription_grant_deletion(
+        datazone=datazone,
+        domain_id=domain_id,
+        grant_id=grant_id
+    )
+    logger.debug("Deleted subscription grant %s successfully", grant_id)
+
+async def _create_subscription_grant(datazone, domain_id, environment_id, target_id, sub_grant, journal):
+    listing = sub_grant['grantedEntity']['listing']
+    grant_key = f"{target_id}/{listing['id']}/{listing['revision']}"
+    if journal and journal.is_done(SUBSCRIPTION_GRANT_CREATED, grant_key):
+        return
+    create_response = await datazone.create_subscription_grant(
+        domainIdentifier=domain_id,
+        environmentIdentifier=environment_id,
+        subscriptionTargetIdentifier=target_id,
+        grantedEntity={
+            'listing': {
+                'identifier': listing['id'],
+                'revision': listing['revision'],
+            }
+        }
+    )
+    if journal:
+        journal.record(SUBSCRIPTION_GRANT_CREATED, grant_key, grant_id=create_response.get('id'))
+    logger.debug("Created new subscription grants successfully: %s", create_response)
+
+async def _update_subscription_target(datazone, domain_id, environment_id, target_id, role_arn, max_attempts=5, delay_seconds=1):
+    for attempt in range(max_attempts):
+        try:
+            return await datazone.update_subscription_target(
+                domainIdentifier=domain_id,
+                environmentIdentifier=environment_id,
+                identifier=target_id,
+                authorizedPrincipals=[role_arn]
+            )
+        except ClientError as e:
+            # In rare case right after deleting all subscription grants, updating the subscription target is still rejected
+            # while the revokes settle, retry with backoff instead of always waiting a fixed time up front
+            if e.response['Error']['Code'] not in ('ConflictException', 'ValidationException') or attempt == max_attempts - 1:
+                raise e
+            logger.debug("Update of subscription target %s rejected: %s, retrying. Attempt %d/%d", target_id, e, attempt + 1, max_attempts)
+            await asyncio.sleep(delay_seconds * 2 ** attempt)
+
+async def _copy_subscription_target(datazone, domain_id, environment_id, subscription_target, byor_role, execute_flag, journal):
+    target_id = subscription_target['id']
+    inputs = {'destination_role': byor_role['Role']['Arn']}
+    logger.info(f"Checking and copying subscription grants for subscription target `{target_id}`...")
+    recorded_grants = journal.get(SUBSCRIPTION_GRANTS_RECORDED, target_id, inputs) if journal else None
+    if recorded_grants is not None:
+        # Grants may already be deleted by a previous run, use the ones recorded before the deletion
+        sub_grants_list = recorded_grants['grants']
+        source = f"recorded in journal {journal.path}"
+    else:
+        sub_grants_list = []
+        async for subscription_grant in datazone.paginate('list_subscription_grants', 'items', 'nextToken', 'nextToken',
+                                                          domainIdentifier=domain_id, subscriptionTargetId=target_id):
+            sub_grants_list.append({
+                'id': subscription_grant['id'],
+                'grantedEntity': {'listing': {
+                    'id': subscription_grant['grantedEntity']['listing']['id'],
+                    'revision': subscription_grant['grantedEntity']['listing']['revision'],
+                }}
+            })
+        if journal:
+            journal.record(SUBSCRIPTION_GRANTS_RECORDED, target_id, inputs, environment_id=environment_id, grants=sub_grants_list)
+        source = 'listed'
+    logger.info(f"Found {len(sub_grants_list)} Subscription grants for subscription target `{target_id}` {source}")
+    logger.debug("%s", lazy_pformat(sub_grants_list))
+    if not execute_flag:
+        return
+
+    # Delete all subscription grants
+    if not (journal and journal.is_done(SUBSCRIPTION_GRANTS_DELETED, target_id)):
+        await gather_in_order(_delete_subscription_grant(datazone, domain_id, sub_grant['id'], journal) for sub_grant in sub_grants_list)
+        if journal:
+            journal.record(SUBSCRIPTION_GRANTS_DELETED, target_id)
+
+    # Update subscription target with the BYOR Role
+    if not (journal and journal.is_done(SUBSCRIPTION_TARGET_UPDATED, target_id, inputs)):
+        await _update_subscription_target(datazone, domain_id, environment_id, target_id, byor_role['Role']['Arn'])
+        if journal:
+            journal.record(SUBSCRIPTION_TARGET_UPDATED, target_id, inputs)
+
+    # Create all subscription grants which were deleted earlier
+    await gather_in_order(_create_subscription_grant(datazone, domain_id, environment_id, target_id, sub_grant, journal)
+                          for sub_grant in sub_grants_list)
+
+async def _copy_subscription_targets(engine, domain_id, environment_id, datazone, byor_role, execute_flag, journal):
+    async_datazone = engine.wrap(datazone)
+    # Subscription targets are independent of each other, copy them concurrently
+    copies = []
+    async for subscription_target in async_datazone.paginate('list_subscription_targets', 'items', 'nextToken', 'nextToken',
+                                                             domainIdentifier=domain_id, environmentIdentifier=environment_id):
+        copies.append(asyncio.ensure_future(_copy_subscription_target(
+            async_datazone, domain_id, environment_id, subscription_target, byor_role, execute_flag, journal)))
+    await gather_in_order(copies)
+
+@phase('subscription recreation')
+def _copy_datazone_subscriptions(domain_id, environment_id, datazone, byor_role, execute_flag, journal=None):
     """
     Copy Subscription Targets and Subscription Grants to the new BYOR Role
     
@@ -225,62 +446,14 @@ def _copy_datazone_subscriptions(domain_id, environment_id, datazone, byor_role,
         3. Delete each subscription grant
         4. Update the subscription target with the BYOR Role as the authorized principal
         5. Create new subscription grants for the new subscription target
-    """
-    print(f"Checking and copying subscription targets and grants for environment `{environment_id}`...\n")
-    sub_target_paginator = datazone.get_paginator('list_subscription_targets')
-    for sub_target_page in sub_target_paginator.paginate(domainIdentifier=domain_id, environmentIdentifier=environment_id):
-        for subscription_target in sub_target_page['items']:
-            target_id = subscription_target['id']
-            print(f"Checking and copying subscription grants for subscription target `{target_id}`...\n")
-            sub_grants_list = []
-            sub_grant_paginator = datazone.get_paginator('list_subscription_grants')
-            for sub_grant_page in sub_grant_paginator.paginate(domainIdentifier=domain_id, subscriptionTargetId=target_id):
-                for subscription_grant in sub_grant_page['items']:
-                    sub_grants_list.append(subscription_grant)
-            print(f"List all Subscription grants for subscription target `{target_id}`:")
-            pprint(sub_grants_list)
-
-            # Delete all subscription grants
-            for sub_grant in sub_grants_list:
-                if execute_flag:
-                    print(f"Calling delete subscription grant {sub_grant['id']} API... \n")
-                    datazone.delete_subscription_grant(
-                        domainIdentifier=domain_id,
-                        identifier=sub_grant['id']
-                    )
-                    wait_for_subscription_grant_deletion(
-                        datazone=datazone,
-                        domain_id=domain_id,
-                        grant_id=sub_grant['id']
-                    )
-                    print(f"Deleted subscription grant {sub_grant['id']} successfully \n")
 
-            # Update subscription target with the BYOR Role
-            if execute_flag:
-                # In rare case after deleting all subscription grants, we still get rejected to update subscription target.
-                # Add wait time bellow for safe.
-                time.sleep(10)
-                datazone.update_subscription_target(
-                    domainIdentifier=domain_id,
-                    environmentIdentifier=environment_id,
-                    identifier=subscription_target['id'],
-                    authorizedPrincipals=[byor_role['Role']['Arn']]
-                )
-            
-                # Create all subscription grants which were deleted earlier
-                for sub_grant in sub_grants_list:
-                    create_response = datazone.create_subscription_grant(
-                        domainIdentifier=domain_id,
-                        environmentIdentifier=environment_id,
-                        subscriptionTargetIdentifier=target_id,
-                        grantedEntity={
-                            'listing': {
-                                'identifier': sub_grant['grantedEntity']['listing']['id'],
-                                'revision': sub_grant['grantedEntity']['listing']['revision'],
-                            }
-                        }
-                    )
-                    print(f"Created new subscription grants successfully: {create_response} \n")
+    Subscription targets, and the grants of a target, are processed concurrently on an AsyncAwsEngine.
+    With a journal, the grants of every target are recorded before they are deleted and each step is recorded
+    once done, so a resumed run recreates grants lost by a failed run from the journal.
+    """
+    logger.info(f"Checking and copying subscription targets and grants for environment `{environment_id}`...")
+    engine = AsyncAwsEngine()
+    engine.run_until_complete(_copy_subscription_targets(engine, domain_id, environment_id, datazone, byor_role, execute_flag, journal))
 
 # LakeFormation Resource list got from list_permissions and list_lake_formation_opt_ins APIs may not be usable for create/grant API directly,
 # this method does some filter/refactor work to make it work properly.
@@ -295,143 +468,145 @@ def _filter_lakeformationsource(resource):
         resource.pop('TableWithColumns')
     return resource
 
-def _copy_lakeformation_grants(lakeformation, source_role_arn, destination_role_arn, execute_flag, script_option):
-    print(f"Checking and copying lakeformation grants associated with role `{source_role_arn}` to role `{destination_role_arn}`...\n")
+@phase('LF grant copy')
+def _copy_lakeformation_grants(lakeformation, source_role_arn, destination_role_arn, execute_flag, script_option, account_index=None):
+    logger.info(f"Checking and copying lakeformation grants associated with role `{source_role_arn}` to role `{destination_role_arn}`...")
     grants_list_to_copy = []
-    response = lakeformation.list_permissions()
-    for grant in response['PrincipalResourcePermissions']:
-        if grant['Principal']['DataLakePrincipalIdentifier'] == source_role_arn:
-            grants_list_to_copy.append(grant)
-    while response.get('NextToken'):
-        response = lakeformation.list_permissions(NextToken=response['NextToken'])
-        for grant in response['PrincipalResourcePermissions']:
+    if account_index:
+        grants_list_to_copy = account_index.list_lakeformation_grants(source_role_arn)
+    else:
+        for grant in paginate(lakeformation.list_permissions, 'PrincipalResourcePermissions'):
             if grant['Principal']['DataLakePrincipalIdentifier'] == source_role_arn:
                 grants_list_to_copy.append(grant)
     if not grants_list_to_copy:
         if script_option == ROLE_REPLACEMENT:
             # Auto generated Project role has grants associated with it in some project profiles but not all, log out warn message
-            print(f"WARN: No grants found associated with role {source_role_arn}, skipping copy... Please make sure you added script executor as LakeFormation Data lake administrators properly.\n")
+            logger.warning(f"No grants found associated with role {source_role_arn}, skipping copy... Please make sure you added script executor as LakeFormation Data lake administrators properly.")
 
-    for grant_to_copy in grants_list_to_copy:
-        print(f"Copying LakeFormation Grant:")
-        pprint(grant_to_copy)
-        print(f"to new role: {destination_role_arn}...\n")
-        if execute_flag:
-            lakeformation.grant_permissions(
-                Principal={
-                    'DataLakePrincipalIdentifier': destination_role_arn
-                },
-                Resource=_filter_lakeformationsource(grant_to_copy['Resource']),
-                Permissions=grant_to_copy['Permissions'],
-                PermissionsWithGrantOption=grant_to_copy['PermissionsWithGrantOption']
-            )
-            print(f"Successfully copy LakeFormation Grant:")
-            pprint(grant_to_copy)
-            print(f"to new role: {destination_role_arn} \n")
-        else:
-            print(f"Skipping copy LakeFormation Grant:")
-            pprint(grant_to_copy)
-            print(f"to new role: {destination_role_arn}, set --execute flag to True to do the actual update.\n")
+    with ProgressReporter(logger, 'Copied LakeFormation grants', total=len(grants_list_to_copy)) as progress:
+        for grant_to_copy in grants_list_to_copy:
+            logger.debug("Copying LakeFormation Grant:\n%s\nto new role: %s...", lazy_pformat(grant_to_copy), destination_role_arn)
+            if execute_flag:
+                lakeformation.grant_permissions(
+                    Principal={
+                        'DataLakePrincipalIdentifier': destination_role_arn
+                    },
+                    Resource=_filter_lakeformationsource(grant_to_copy['Resource']),
+                    Permissions=grant_to_copy['Permissions'],
+                    PermissionsWithGrantOption=grant_to_copy['PermissionsWithGrantOption']
+                )
+                logger.debug("Successfully copy LakeFormation Grant:\n%s\nto new role: %s", lazy_pformat(grant_to_copy), destination_role_arn)
+            else:
+                logger.debug("Skipping copy LakeFormation Grant:\n%s\nto new role: %s, set --execute flag to True to do the actual update.",
+                             lazy_pformat(grant_to_copy), destination_role_arn)
+            progress.update()
+    if grants_list_to_copy and not execute_flag:
+        logger.info(f"Skipping copy of {len(grants_list_to_copy)} LakeFormation Grants to new role: {destination_role_arn}, set --execute flag to True to do the actual update. Use --log-level DEBUG to list them.")
 
+@phase('LF opt-in copy')
 def _copy_lakeformation_opt_ins(lakeformation, source_role_arn, destination_role_arn, execute_flag):
-    print(f"Checking and copying lakeformation opt ins associated with role `{source_role_arn}` to role `{destination_role_arn}`...\n")
-    opt_in_list_to_copy = []
-    response = lakeformation.list_lake_formation_opt_ins(
+    logger.info(f"Checking and copying lakeformation opt ins associated with role `{source_role_arn}` to role `{destination_role_arn}`...")
+    opt_in_list_to_copy = list(paginate(
+        lakeformation.list_lake_formation_opt_ins,
+        'LakeFormationOptInsInfoList',
         Principal={
             'DataLakePrincipalIdentifier': source_role_arn
         }
-    )
-    for opt_in in response['LakeFormationOptInsInfoList']:
-        opt_in_list_to_copy.append(opt_in)
-    while response.get('NextToken'):
-        response = lakeformation.list_lake_formation_opt_ins(NextToken=response['NextToken'])
-        for opt_in in response['LakeFormationOptInsInfoList']:
-            opt_in_list_to_copy.append(opt_in)
-
-    for opt_in_to_copy in opt_in_list_to_copy:
-        print(f"Copying LakeFormation Opt In:")
-        pprint(opt_in_to_copy)
-        print(f"to new role: {destination_role_arn}...\n")
-        if execute_flag:
-            try:
-                lakeformation.create_lake_formation_opt_in(
-                    Principal={
-                        'DataLakePrincipalIdentifier': destination_role_arn
-                    },
-                    Resource=_filter_lakeformationsource(opt_in_to_copy['Resource']),
-                )
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'InvalidInputException':
-                    print(f"Opt-in already exists, skipping...\n")
-                else:
-                    raise e
-            print(f"Successfully copy LakeFormation Opt In:")
-            pprint(opt_in_to_copy)
-            print(f"to new role: {destination_role_arn} \n")
-        else:
-            print(f"Skipping copy LakeFormation Opt In:")
-            pprint(opt_in_to_copy)
-            print(f"to new role: {destination_role_arn}, set --execute flag to True to do the actual update.\n")
+    ))
 
-def _find_sagemaker_domain_id(sagemaker_client, args):
-    project_id = args.project_id
-    paginator = sagemaker_client.get_paginator('list_domains')
-    for page in paginator.paginate():
-        for domain in page['Domains']:
-            if f"SageMakerUnifiedStudio-{project_id}" in domain['DomainName']:
-                print(f"Found Project's SageMaker Domain, name: {domain['DomainName']}, id: {domain['DomainId']}\n")
-                return domain['DomainId']
-
-def _wait_for_sagemaker_app_deletion(sagemaker,
-                                    domain_id,
-                                    app_name,
-                                    app_type,
-                                    user_profile_name=None,
-                                    space_name=None,
-                                    max_attempts=30,
-                                    delay_seconds=5):
+    with ProgressReporter(logger, 'Copied LakeFormation opt-ins', total=len(opt_in_list_to_copy)) as progress:
+        for opt_in_to_copy in opt_in_list_to_copy:
+            logger.debug("Copying LakeFormation Opt In:\n%s\nto new role: %s...", lazy_pformat(opt_in_to_copy), destination_role_arn)
+            if execute_flag:
+                try:
+                    lakeformation.create_lake_formation_opt_in(
+                        Principal={
+                            'DataLakePrincipalIdentifier': destination_role_arn
+                        },
+                        Resource=_filter_lakeformationsource(opt_in_to_copy['Resource']),
+                    )
+                except ClientError as e:
+                    if e.response['Error']['Code'] == 'InvalidInputException':
+                        logger.debug("Opt-in already exists, skipping...")
+                    else:
+                        raise e
+                logger.debug("Successfully copy LakeFormation Opt In:\n%s\nto new role: %s", lazy_pformat(opt_in_to_copy), destination_role_arn)
+            else:
+                logger.debug("Skipping copy LakeFormation Opt In:\n%s\nto new role: %s, set --execute flag to True to do the actual update.",
+                             lazy_pformat(opt_in_to_copy), destination_role_arn)
+            progress.update()
+    if opt_in_list_to_copy and not execute_flag:
+        logger.info(f"Skipping copy of {len(opt_in_list_to_copy)} LakeFormation Opt Ins to new role: {destination_role_arn}, set --execute flag to True to do the actual update. Use --log-level DEBUG to list them.")
+
+@phase('SageMaker domain lookup')
+def _find_sagemaker_domain_id(args, sagemaker_domain_index):
+    domain = sagemaker_domain_index.get_domain(args.project_id)
+    if domain:
+        logger.info(f"Found Project's SageMaker Domain, name: {domain['DomainName']}, id: {domain['DomainId']}")
+        return domain['DomainId']
+    return None
+
+# Statuses of ListApps records of apps which no longer run
+INACTIVE_APP_STATUSES = ('Deleted', 'Failed')
+
+def _app_key(app):
+    return (app['AppType'], app['AppName'], app.get('UserProfileName'), app.get('SpaceName'))
+
+def _wait_for_sagemaker_apps_deletion(sagemaker,
+                                      domain_id,
+                                      pending_apps,
+                                      max_attempts=30,
+                                      delay_seconds=5):
     """
-    Wait for SageMaker App to be deleted
+    Wait for all given SageMaker Apps under a domain to be deleted
+
+    Instead of polling DescribeApp for one app at a time, every attempt takes a single ListApps snapshot of
+    the domain and checks the status of all pending apps at once, so the whole domain drains in one wait window.
+
+    Args:
+        sagemaker: SageMaker client
+        domain_id: SageMaker Domain identifier
+        pending_apps: Apps returned by ListApps for which DeleteApp has been issued
+        max_attempts: Maximum number of polling attempts
+        delay_seconds: Delay between polling attempts in seconds
     """
+    pending = {_app_key(app): app for app in pending_apps}
+    total = len(pending)
     for attempt in range(max_attempts):
-        try:
-            if user_profile_name:
-                response = sagemaker.describe_app(
-                    DomainId=domain_id,
-                    AppType=app_type,
-                    AppName=app_name,
-                    UserProfileName=user_profile_name
-                )
-            elif space_name:
-                response = sagemaker.describe_app(
-                    DomainId=domain_id,
-                    AppType=app_type,
-                    AppName=app_name,
-                    SpaceName=space_name
-                )
-            else:
-                raise ValueError("Either UserProfileName or SpaceName must be passed for DescribeApp operation.")
-            
-            status = response.get('Status')
-            if status == 'Deleted':
-                print(f"Deleted SageMaker App `{app_name}` deleted successfully")
-                return
-            print(f"Deletion of SageMaker App `{app_name}` in progress. Current status: {status}. Attempt {attempt + 1}/{max_attempts}")
-            time.sleep(delay_seconds)
-            
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                print(f"Deleted SageMaker App `{app_name}` deleted successfully")
-                return
-            raise e
-    
-    raise TimeoutError(f"Deletion of SageMaker App `{app_name}` did not complete after {max_attempts} attempts")
+        active_statuses = {}
+        paginator = sagemaker.get_paginator('list_apps')
+        for page in paginator.paginate(DomainIdEquals=domain_id):
+            for app in page['Apps']:
+                # ListApps keeps returning the records of earlier apps with the same key once they are deleted,
+                # an app is only gone when none of its records is still active
+                if app.get('Status') not in INACTIVE_APP_STATUSES:
+                    active_statuses[_app_key(app)] = app.get('Status')
+
+        for key in list(pending):
+            # Apps no longer returned by ListApps are gone as well
+            if key not in active_statuses:
+                logger.debug("Deleted SageMaker App `%s` successfully", key[1])
+                pending.pop(key)
+
+        if not pending:
+            return
+        in_progress = ', '.join(f"{key[1]} ({active_statuses[key]})" for key in pending)
+        logger.info(f"Deletion of SageMaker Apps in progress: {total - len(pending)}/{total} deleted. "
+                    f"Waiting for: {in_progress}. Attempt {attempt + 1}/{max_attempts}")
+        time.sleep(delay_seconds)
 
+    raise TimeoutError(f"Deletion of SageMaker Apps {[key[1] for key in pending]} did not complete after {max_attempts} attempts")
+
+@phase('SageMaker app teardown')
 def _stop_apps_under_domain(sagemaker_client, sagemaker_domain_id, execute_flag):
+    start_time = time.monotonic()
+    apps_to_wait = []
     paginator = sagemaker_client.get_paginator('list_apps')
     for page in paginator.paginate(DomainIdEquals=sagemaker_domain_id):
         for app in page['Apps']:
-            print(f"Found app {app['AppName']} under Project's SageMaker Domain id: {sagemaker_domain_id}\n")
+            if app.get('Status') == 'Deleted':
+                continue
+            logger.debug("Found app %s under Project's SageMaker Domain id: %s", app['AppName'], sagemaker_domain_id)
             if execute_flag:
                 try:
                     if app.get('UserProfileName'):
@@ -441,7 +616,6 @@ def _stop_apps_under_domain(sagemaker_client, sagemaker_domain_id, execute_flag)
                             AppName=app['AppName'],
                             UserProfileName=app['UserProfileName']
                         )
-                        _wait_for_sagemaker_app_deletion(sagemaker_client, sagemaker_domain_id, app['AppName'], app['AppType'], app['UserProfileName'], None)
                     elif app.get('SpaceName'):
                         sagemaker_client.delete_app(
                             DomainId=sagemaker_domain_id,
@@ -449,18 +623,26 @@ def _stop_apps_under_domain(sagemaker_client, sagemaker_domain_id, execute_flag)
                             AppName=app['AppName'],
                             SpaceName=app['SpaceName']
                         )
-                        _wait_for_sagemaker_app_deletion(sagemaker_client, sagemaker_domain_id, app['AppName'], app['AppType'], None, app['SpaceName'])
-                    print(f"Stopped app {app['AppName']} successfully\n")
+                    else:
+                        raise ValueError("Either UserProfileName or SpaceName must be present to delete a SageMaker App.")
+                    logger.debug("Issued delete for app %s", app['AppName'])
+                    apps_to_wait.append(app)
                 except ClientError as e:
                     if e.response['Error']['Code'] == 'ValidationException':
-                        print(f"App {app['AppName']} already deleted, skipping...\n")
+                        logger.debug("App %s already deleted, skipping...", app['AppName'])
                     else:
                         raise e
             else:
-                print(f"Skipping stop app {app['AppName']}, set --execute flag to True to do the actual update")
+                logger.info("Skipping stop app %s, set --execute flag to True to do the actual update", app['AppName'])
 
+    # All deletions are issued up front, then wait for all of them together
+    if apps_to_wait:
+        _wait_for_sagemaker_apps_deletion(sagemaker_client, sagemaker_domain_id, apps_to_wait)
+        logger.info(f"Stopped {len(apps_to_wait)} apps under SageMaker Domain id: {sagemaker_domain_id} successfully in {time.monotonic() - start_time:.1f}s")
+
+@phase('SageMaker domain update')
 def _update_domain_execution_role(sagemaker, domain_id, bring_in_role_arn, execute_flag):
-    print(f"Updating Project's SageMaker Domain id: {domain_id} execution role to {bring_in_role_arn}...\n")
+    logger.info(f"Updating Project's SageMaker Domain id: {domain_id} execution role to {bring_in_role_arn}...")
     if execute_flag:
         sagemaker.update_domain(
             DomainId=domain_id,
@@ -471,14 +653,16 @@ def _update_domain_execution_role(sagemaker, domain_id, bring_in_role_arn, execu
                 'ExecutionRole': bring_in_role_arn
             }
         )
-        print(f"Updated Project's SageMaker Domain id: {domain_id} default execution role to {bring_in_role_arn} successfully\n")
+        logger.info(f"Updated Project's SageMaker Domain id: {domain_id} default execution role to {bring_in_role_arn} successfully")
     else:
-        print(f"Skipping update Project's SageMaker Domain id: {domain_id} default execution role, set --execute flag to True to do the actual update\n")
+        logger.info(f"Skipping update Project's SageMaker Domain id: {domain_id} default execution role, set --execute flag to True to do the actual update")
 
+@phase('LF registration update')
 def _update_s3_lakeformation_registration(lakeformation, old_role_arn, new_role_arn, execute_flag):
-    print(f"Updating lakeformation resource registered with role: `{old_role_arn}` to role `{new_role_arn}`...\n")
-    resources_list = []
-    response = lakeformation.list_resources(
+    logger.info(f"Updating lakeformation resource registered with role: `{old_role_arn}` to role `{new_role_arn}`...")
+    resources_list = list(paginate(
+        lakeformation.list_resources,
+        'ResourceInfoList',
         FilterConditionList=[
             {
                 'Field': 'ROLE_ARN',
@@ -488,33 +672,25 @@ def _update_s3_lakeformation_registration(lakeformation, old_role_arn, new_role_
                 ]
             },
         ]
-    )
-    for resource in response['ResourceInfoList']:
-        resources_list.append(resource)
-    while response.get('NextToken'):
-        response = lakeformation.list_resources(
-            FilterConditionList=[
-                {
-                    'Field': 'ROLE_ARN',
-                    'ComparisonOperator': 'EQ',
-                    'StringValueList': [
-                        old_role_arn,
-                    ]
-                },
-            ]
+    ))
+    if not execute_flag:
+        for resource in resources_list:
+            logger.info("Skipping updating LakeFormation Resource: `%s` by updating RoleArn to `%s`, set --execute flag to True to do the actual update.", resource['ResourceArn'], new_role_arn)
+        return
+
+    def update_resource(resource):
+        lakeformation.update_resource(
+            RoleArn=new_role_arn,
+            ResourceArn=resource['ResourceArn']
         )
-        for resource in response['ResourceInfoList']:
-            resources_list.append(resource)
-    for resource in resources_list:
-        if execute_flag:
-            lakeformation.update_resource(
-                RoleArn=new_role_arn,
-                ResourceArn=resource['ResourceArn']
-            )
-            print(f"Successfully updated LakeFormation Resource: `{resource['ResourceArn']}` by updating RoleArn to `{new_role_arn}` successfully\n")
-        else:
-            print(f"Skipping updating LakeFormation Resource: `{resource['ResourceArn']}` by updating RoleArn to `{new_role_arn}`, set --execute flag to True to do the actual update.\n")
-    
+        return resource
+
+    # Resources are independent of each other, update them concurrently
+    with ThreadPoolExecutor(max_workers=LAKEFORMATION_MAX_WORKERS) as executor:
+        for resource in executor.map(in_current_phase(update_resource), resources_list):
+            logger.debug("Successfully updated LakeFormation Resource: `%s` by updating RoleArn to `%s` successfully", resource['ResourceArn'], new_role_arn)
+    logger.info(f"Updated {len(resources_list)} LakeFormation Resources to role `{new_role_arn}` successfully")
+
 def _add_common_arguments(parser):
     parser.add_argument('--domain-id',
                     help='Your Project\'s Domain Id', 
@@ -532,8 +708,35 @@ def _add_common_arguments(parser):
     parser.add_argument('--region',
                         help='Region where you have your Project',
                         required=False)
+    add_instrumentation_arguments(parser)
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
+    parser.add_argument('--journal',
+                        help='File recording completed steps when --execute is set. Defaults to byor_journal_<project-id>.jsonl',
+                        required=False)
+    _add_resume_argument(parser)
 
-def _parse_args():
+def _add_resume_argument(parser):
+    parser.add_argument('--resume',
+                        help='Continue a previous run which failed, skipping the steps its journal records as completed. '
+                             'The run stops if a completed step was applied to other roles than the ones given',
+                        action='store_true',
+                        default=False)
+
+def _add_sagemaker_domain_cache_arguments(parser):
+    parser.add_argument('--sagemaker-domain-cache',
+                        help='File to cache the SageMaker domain index in, so later runs can skip listing all SageMaker domains',
+                        required=False)
+    parser.add_argument('--sagemaker-domain-cache-ttl',
+                        help='Seconds after which the SageMaker domain cache is rebuilt',
+                        type=int,
+                        default=DEFAULT_DOMAIN_CACHE_TTL_SECONDS)
+
+def _sagemaker_domain_index(args, sagemaker):
+    return SageMakerDomainIndex(sagemaker, args.sagemaker_domain_cache, args.sagemaker_domain_cache_ttl)
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Tool which grant your role ability to work for specified Project.')
     subparsers = parser.add_subparsers(dest='command', help='The action you want to take.')
 
@@ -544,144 +747,313 @@ def _parse_args():
                         action='store_true',
                         default=False)
     _add_common_arguments(parser_use_own_role)
+    _add_sagemaker_domain_cache_arguments(parser_use_own_role)
         
     # Parser for enhance-project-role command
     parser_enhance = subparsers.add_parser(ROLE_ENHANCEMENT, help='Enhance existing Project Role.')
     _add_common_arguments(parser_enhance)
 
-    return parser.parse_args()
+    # Parser for batch command
+    parser_batch = subparsers.add_parser(BATCH, help='Run use-your-own-role or enhance-project-role for many projects listed in a manifest.')
+    parser_batch.add_argument('--manifest',
+                        help='CSV or JSON file with project_id, bring_in_role_arn and optional command for every project to migrate',
+                        required=True)
+    parser_batch.add_argument('--domain-id',
+                        help='Your Projects\' Domain Id',
+                        required=True)
+    parser_batch.add_argument('--max-workers',
+                        help='Number of projects migrated concurrently',
+                        type=int,
+                        default=4)
+    parser_batch.add_argument('--force-update',
+                        help='WARNING: Setting this flag to True allows the script to stop existing resources. Only use if you explicitly accept compute resources stopping.',
+                        action='store_true',
+                        default=False)
+    parser_batch.add_argument('--execute',
+                        help='Determine if the script should generate overview or do the actual work',
+                        action='store_true',
+                        default=False)
+    parser_batch.add_argument('--region',
+                        help='Region where you have your Projects',
+                        required=False)
+    add_instrumentation_arguments(parser_batch)
+    add_profiling_arguments(parser_batch)
+    add_rate_limit_arguments(parser_batch)
+    add_logging_arguments(parser_batch)
+    parser_batch.add_argument('--journal-dir',
+                        help='Folder for the per Project journals recording completed steps when --execute is set',
+                        default='.')
+    _add_resume_argument(parser_batch)
+    _add_sagemaker_domain_cache_arguments(parser_batch)
+
+    return parser.parse_args(argv)
 
-def byor_main():
-    args = _parse_args()
-    session = boto3.Session()
-    if (args.region):
-        session = boto3.Session(region_name=args.region)
-    iam_client = session.client('iam')
-    datazone = session.client('datazone')
-    lakeformation = session.client('lakeformation')
-    sagemaker = session.client('sagemaker')
-        
-    if args.command == ROLE_REPLACEMENT:
-        print(f"Use bring in Role: {args.bring_in_role_arn} as Project Role...")
-        # Get Project's Auto Generated Execution Role, there should be one role per project
-        project_role = _find_project_execution_role(args, iam_client)
-        # Get Execution Role's trust policy
-        project_role_trust_policy = project_role['Role']['AssumeRolePolicyDocument']
-
-        environment_with_role_lists = _get_enviroments_with_role_from_project(datazone, args, project_role['Role']['Arn'])
-        environment_id_list = [env.id for env in environment_with_role_lists]
-        # Get BYOR Role's trust policy
-        byor_role = iam_client.get_role(
-            RoleName=_get_role_name_from_arn(args.bring_in_role_arn),
-        )
-        byor_role_trust_policy = byor_role['Role']['AssumeRolePolicyDocument']
+@phase('environment role swap')
+def _replace_environment_role(args, datazone, environment):
+    logger.info(f"Will replace IAM role {environment.user_role_arn} attached to environment name: {environment.name}, id: {environment.id} with new role {args.bring_in_role_arn}...")
+    if args.execute:
+        try:
+            logger.info(f"Disassociate role {environment.user_role_arn} from environment {environment.id} in progress...")
+            response = datazone.disassociate_environment_role(
+                domainIdentifier=args.domain_id,
+                environmentIdentifier=environment.id,
+                environmentRoleArn=environment.user_role_arn
+            )
+            logger.info(f"Successfully disassociate role {environment.user_role_arn} from environment {environment.id}: {response}")
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                logger.warning(f"Disassociate role {environment.user_role_arn} from environment {environment.id} failed: Role not found in environment, skip disassociate.")
+            else:
+                raise e
+        logger.info(f"Associate role {args.bring_in_role_arn} to environment {environment.id} in progress...")
+        try:
+            response = datazone.associate_environment_role(
+                domainIdentifier=args.domain_id,
+                environmentIdentifier=environment.id,
+                environmentRoleArn=args.bring_in_role_arn
+            )
+            logger.info(f"Associate role {args.bring_in_role_arn} to environment {environment.id} successfully: {response}")
+        except Exception as e:
+            # Associate environment role failed, re-associate with original role
+            logger.error(f"Associate role {args.bring_in_role_arn} to environment {environment.id} failed: {e}, re-associate with original role {environment.user_role_arn}. "
+                         f"Subscriptions of the environment now target role {args.bring_in_role_arn}, completed steps and subscription grants are recorded in the journal, rerun with --resume to continue.")
+            response = datazone.associate_environment_role(
+                domainIdentifier=args.domain_id,
+                environmentIdentifier=environment.id,
+                environmentRoleArn=environment.user_role_arn
+            )
+            raise e
+    else:
+        logger.info(f"Skipping disassociate and associate role operations, set --execute flag to True to do the actual update. environment {environment.name} still use {environment.user_role_arn} as its role.")
 
-        # Combine trust policy and update BYOR Role's trust policy
-        new_trust_policy = _combine_trust_policy(project_role_trust_policy, byor_role_trust_policy)
-        _update_trust_policy(byor_role['Role']['RoleName'], new_trust_policy, iam_client, args.execute)
+def _open_journal(args):
+    # Only runs which change resources need to be resumable
+    if not args.execute:
+        return None
+    return MigrationJournal(args.journal or f"byor_journal_{args.project_id}.jsonl", args.resume)
 
-        # Copy Project Execution Role's managed policies to BYOR Role
-        _copy_managed_policies_arn(project_role, byor_role, environment_id_list, iam_client, args.execute)
+def _step_inputs(args, source_role_arn, destination_role_arn, **inputs):
+    # The roles a step acts on are recorded with it, a resumed run with other roles must not skip it
+    return {'source_role': source_role_arn, 'destination_role': destination_role_arn, 'execute': args.execute, **inputs}
 
-        # Copy Project Execution Role's inline policies to BYOR Role
-        _copy_inline_policies_arn(project_role, byor_role, iam_client, args.execute)
+def _run_step(journal, step, key, step_function, inputs=None):
+    """
+    Run a migration step unless the journal records it as completed, and record it in the journal with its `inputs`
+    once it completes. A step completed with other inputs stops the run, see MigrationJournal.is_done
+    """
+    if journal and journal.is_done(step, key, inputs):
+        logger.info(f"Skipping {step} for `{key}`, already completed according to journal {journal.path}")
+        return
+    step_function()
+    if journal:
+        journal.record(step, key, inputs)
+
+def _copy_role_policies(source_role, dest_role, environment_id_list, iam_client, execute_flag):
+    # Fetch source Role's managed policies, inline policies and tags
+    source_policies = _fetch_role_policies(source_role, iam_client)
+
+    # Copy source Role's managed policies to destination Role
+    _copy_managed_policies_arn(source_role, dest_role, source_policies, environment_id_list, iam_client, execute_flag)
+
+    # Copy source Role's inline policies to destination Role
+    _copy_inline_policies_arn(dest_role, source_policies, iam_client, execute_flag)
+
+    # Copy source Role's Tags to destination Role
+    _copy_tags(source_role['Role']['RoleName'], dest_role['Role']['RoleName'], source_policies, iam_client, execute_flag)
+
+def _replace_sagemaker_domain_role(args, sagemaker, environment_with_role_lists, account_index):
+    # Use the domain ID carried by the environments if any, otherwise look it up in the domain index
+    sagemaker_domain_id = next((env.sagemaker_domain_id for env in environment_with_role_lists if env.sagemaker_domain_id), None)
+    if sagemaker_domain_id:
+        logger.info(f"Found Project's SageMaker Domain id: {sagemaker_domain_id} in Project's environments")
+    else:
+        sagemaker_domain_index = account_index.sagemaker_domain_index if account_index else _sagemaker_domain_index(args, sagemaker)
+        sagemaker_domain_id = _find_sagemaker_domain_id(args, sagemaker_domain_index)
+    if sagemaker_domain_id:
+        if args.force_update:
+            _stop_apps_under_domain(sagemaker, sagemaker_domain_id, args.execute)
+        else:
+            logger.warning("Updating SageMaker Domain without deleting existing apps. The script execution may fail if there are running apps. Set --force-update flag if you accept app deletion to ensure successful script execution.")
+        _update_domain_execution_role(sagemaker, sagemaker_domain_id, args.bring_in_role_arn, args.execute)
 
-        # Copy Project Execution Role's Tags to BYOR Role
-        _copy_tags(project_role['Role']['RoleName'], byor_role['Role']['RoleName'], iam_client, args.execute)
+def _use_your_own_role(args, iam_client, datazone, lakeformation, sagemaker, account_index=None):
+    logger.info(f"Use bring in Role: {args.bring_in_role_arn} as Project Role...")
+    journal = _open_journal(args)
+    # Get Project's Auto Generated Execution Role, there should be one role per project
+    project_role = _find_project_execution_role(args, iam_client, account_index)
+    # Get Execution Role's trust policy
+    project_role_trust_policy = project_role['Role']['AssumeRolePolicyDocument']
+
+    environment_with_role_lists = _get_enviroments_with_role_from_project(datazone, args, project_role['Role']['Arn'])
+    environment_id_list = [env.id for env in environment_with_role_lists]
+    # Get BYOR Role's trust policy
+    byor_role = iam_client.get_role(
+        RoleName=_get_role_name_from_arn(args.bring_in_role_arn),
+    )
+    byor_role_name = byor_role['Role']['RoleName']
+    byor_role_trust_policy = byor_role['Role']['AssumeRolePolicyDocument']
+    role_inputs = _step_inputs(args, project_role['Role']['Arn'], args.bring_in_role_arn)
+
+    # Combine trust policy and update BYOR Role's trust policy
+    _run_step(journal, 'trust policy update', byor_role_name, lambda: _update_trust_policy(
+        byor_role_name, _combine_trust_policy(project_role_trust_policy, byor_role_trust_policy), iam_client, args.execute),
+        role_inputs)
+
+    # Copy Project Execution Role's managed policies, inline policies and tags to BYOR Role
+    _run_step(journal, 'policy copy', byor_role_name, lambda: _copy_role_policies(
+        project_role, byor_role, environment_id_list, iam_client, args.execute), role_inputs)
+    
+    # Replace SageMaker Domain Execution Role
+    _run_step(journal, 'SageMaker domain update', args.project_id, lambda: _replace_sagemaker_domain_role(
+        args, sagemaker, environment_with_role_lists, account_index),
+        _step_inputs(args, project_role['Role']['Arn'], args.bring_in_role_arn, force_update=args.force_update))
+
+    # Update LakeFormation Data lake locations resources with the new Role
+    _run_step(journal, 'LF registration update', project_role['Role']['Arn'], lambda: _update_s3_lakeformation_registration(
+        lakeformation, project_role['Role']['Arn'], args.bring_in_role_arn, args.execute), role_inputs)
+    # Replace Project Execution Role with BYOR Role
+    # Role is attached with environment, and one Project contains multiple environments, so 
+    # we need to replace role for each environment within a project
+    for environment in environment_with_role_lists:
+        environment_inputs = _step_inputs(args, environment.user_role_arn, args.bring_in_role_arn)
+        # Copy DataZone Subscriptions
+        if not environment.name == 'RedshiftServerless' and not environment.name == 'Redshift Serverless':
+            _run_step(journal, 'subscription recreation', environment.id, lambda: _copy_datazone_subscriptions(
+                args.domain_id, environment.id, datazone, byor_role, args.execute, journal), environment_inputs)
+        # Copy LakeFormation Permissions and Opt-Ins
+        _run_step(journal, 'LF grant copy', environment.id, lambda: _copy_lakeformation_grants(
+            lakeformation, environment.user_role_arn, args.bring_in_role_arn, args.execute, args.command, account_index),
+            environment_inputs)
+        _run_step(journal, 'LF opt-in copy', environment.id, lambda: _copy_lakeformation_opt_ins(
+            lakeformation, environment.user_role_arn, args.bring_in_role_arn, args.execute), environment_inputs)
         
-        # Replace SageMaker Domain Execution Role
-        sagemaker_domain_id = _find_sagemaker_domain_id(sagemaker, args)
-        if sagemaker_domain_id:
-            if args.force_update:
-                _stop_apps_under_domain(sagemaker, sagemaker_domain_id, args.execute)
-            else:
-                print(f"WARNING: Updating SageMaker Domain without deleting existing apps. The script execution may fail if there are running apps. Set --force-update flag if you accept app deletion to ensure successful script execution.")
-            _update_domain_execution_role(sagemaker, sagemaker_domain_id, args.bring_in_role_arn, args.execute)
-
-        # Update LakeFormation Data lake locations resources with the new Role
-        _update_s3_lakeformation_registration(lakeformation, project_role['Role']['Arn'], args.bring_in_role_arn, args.execute)
-        # Replace Project Execution Role with BYOR Role
-        # Role is attached with environment, and one Project contains multiple environments, so 
-        # we need to replace role for each environment within a project
-        for environment in environment_with_role_lists:
-            # Copy DataZone Subscriptions
-            if not environment.name == 'RedshiftServerless' and not environment.name == 'Redshift Serverless':
-                _copy_datazone_subscriptions(args.domain_id, environment.id, datazone, byor_role, args.execute)
-            # Copy LakeFormation Permissions and Opt-Ins
-            _copy_lakeformation_grants(lakeformation, environment.user_role_arn, args.bring_in_role_arn, args.execute, args.command)
-            _copy_lakeformation_opt_ins(lakeformation, environment.user_role_arn, args.bring_in_role_arn, args.execute)
-            
-            print(f"Will replace IAM role {environment.user_role_arn} attached to environment name: {environment.name}, id: {environment.id} with new role {args.bring_in_role_arn}...\n")
-            if args.execute:
-                try:
-                    print(f"Disassociate role {environment.user_role_arn} from environment {environment.id} in progress... \n")
-                    response = datazone.disassociate_environment_role(
-                        domainIdentifier=args.domain_id,
-                        environmentIdentifier=environment.id,
-                        environmentRoleArn=environment.user_role_arn
-                    )
-                    print(f"Successfully disassociate role {environment.user_role_arn} from environment {environment.id}: {response} \n")
-                except ClientError as e:
-                    if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                        print(f"Disassociate role {environment.user_role_arn} from environment {environment.id} failed: Role not found in environment, skip disassociate. \n")
-                    else:
-                        raise e
-                print(f"Associate role {args.bring_in_role_arn} to environment {environment.id} in progress... \n")
-                try:
-                    response = datazone.associate_environment_role(
-                        domainIdentifier=args.domain_id,
-                        environmentIdentifier=environment.id,
-                        environmentRoleArn=args.bring_in_role_arn
-                    )
-                    print(f"Associate role {args.bring_in_role_arn} to environment {environment.id} successfully: {response} \n")
-                except Exception as e:
-                    # Associate environment role failed, re-associate with original role
-                    print(f"Associate role {args.bring_in_role_arn} to environment {environment.id} failed: {e}, re-associate with original role {environment.user_role_arn}. But all subscriptions are lost, please recreate necessary subscriptions.\n")
-                    response = datazone.associate_environment_role(
-                        domainIdentifier=args.domain_id,
-                        environmentIdentifier=environment.id,
-                        environmentRoleArn=environment.user_role_arn
-                    )
-                    raise e
-            else:
-                print(f"Skipping disassociate and associate role operations, set --execute flag to True to do the actual update. environment {environment.name} still use {environment.user_role_arn} as its role.\n")
-                
-        if args.execute:
-            print(f"Successfully replace Project {args.project_id} user role with your own role: {byor_role['Role']['Arn']}")
-    elif args.command == ROLE_ENHANCEMENT:
-        print(f"Enhance Project Role...")
-        # Get Project's Auto Generated Role
-        project_role = _find_project_execution_role(args, iam_client)
-        # Get Project Role's trust policy
-        project_role_trust_policy = project_role['Role']['AssumeRolePolicyDocument']
-
-        # Get BYOR Role's trust policy
-        byor_role = iam_client.get_role(
-            RoleName=_get_role_name_from_arn(args.bring_in_role_arn),
+        _run_step(journal, 'environment role swap', environment.id, lambda: _replace_environment_role(args, datazone, environment),
+                  environment_inputs)
+
+    if args.execute:
+        logger.info(f"Successfully replace Project {args.project_id} user role with your own role: {byor_role['Role']['Arn']}")
+
+def _enhance_project_role(args, iam_client, lakeformation, account_index=None):
+    logger.info("Enhance Project Role...")
+    journal = _open_journal(args)
+    # Get Project's Auto Generated Role
+    project_role = _find_project_execution_role(args, iam_client, account_index)
+    project_role_name = project_role['Role']['RoleName']
+    # Get Project Role's trust policy
+    project_role_trust_policy = project_role['Role']['AssumeRolePolicyDocument']
+
+    # Get BYOR Role's trust policy
+    byor_role = iam_client.get_role(
+        RoleName=_get_role_name_from_arn(args.bring_in_role_arn),
+    )
+    logger.info(f"BYOR Role ARN: {args.bring_in_role_arn}")
+    byor_role_trust_policy = byor_role['Role']['AssumeRolePolicyDocument']
+
+    role_inputs = _step_inputs(args, args.bring_in_role_arn, project_role['Role']['Arn'])
+
+    # Combine trust policy and update Project Role's trust policy
+    _run_step(journal, 'trust policy update', project_role_name, lambda: _update_trust_policy(
+        project_role_name, _combine_trust_policy(project_role_trust_policy, byor_role_trust_policy), iam_client, args.execute),
+        role_inputs)
+
+    # Copy BYOR Role's managed policies, inline policies and tags to Project Role
+    _run_step(journal, 'policy copy', project_role_name, lambda: _copy_role_policies(
+        byor_role, project_role, [], iam_client, args.execute), role_inputs)
+    
+    # Copy LakeFormation Permissions and Opt-Ins
+    _run_step(journal, 'LF grant copy', project_role_name, lambda: _copy_lakeformation_grants(
+        lakeformation, args.bring_in_role_arn, project_role['Role']['Arn'], args.execute, args.command, account_index),
+        role_inputs)
+    _run_step(journal, 'LF opt-in copy', project_role_name, lambda: _copy_lakeformation_opt_ins(
+        lakeformation, args.bring_in_role_arn, project_role['Role']['Arn'], args.execute), role_inputs)
+    if args.execute:
+        logger.info(f"Successfully enhance project user role: {project_role['Role']['Arn']} referring to your own role: {byor_role['Role']['Arn']}")
+
+def _read_manifest(manifest_path):
+    """
+    Read project to role mappings from a CSV file with a header row, or from a JSON file containing a list of objects.
+    Each entry needs `project_id` and `bring_in_role_arn`, and may set `command` to `use-your-own-role` (default)
+    or `enhance-project-role`.
+    """
+    with open(manifest_path, newline='') as manifest_file:
+        if manifest_path.lower().endswith('.json'):
+            entries = json.load(manifest_file)
+        else:
+            entries = list(csv.DictReader(manifest_file))
+
+    for index, entry in enumerate(entries):
+        if not entry.get('project_id') or not entry.get('bring_in_role_arn'):
+            raise ValueError(f"Manifest entry {index + 1} must contain both project_id and bring_in_role_arn: {entry}")
+        entry['command'] = entry.get('command') or ROLE_REPLACEMENT
+        if entry['command'] not in (ROLE_REPLACEMENT, ROLE_ENHANCEMENT):
+            raise ValueError(f"Manifest entry {index + 1} has invalid command `{entry['command']}`. Expecting '{ROLE_REPLACEMENT}' or '{ROLE_ENHANCEMENT}'.")
+    return entries
+
+def _run_batch(args, iam_client, datazone, lakeformation, sagemaker):
+    entries = _read_manifest(args.manifest)
+    logger.info(f"Migrating {len(entries)} projects from manifest {args.manifest} with {args.max_workers} workers...")
+    account_index = AccountIndex(iam_client, lakeformation, _sagemaker_domain_index(args, sagemaker))
+
+    def migrate_project(entry):
+        project_args = argparse.Namespace(
+            command=entry['command'],
+            domain_id=args.domain_id,
+            project_id=entry['project_id'],
+            bring_in_role_arn=entry['bring_in_role_arn'],
+            execute=args.execute,
+            force_update=args.force_update,
+            region=args.region,
+            sagemaker_domain_cache=args.sagemaker_domain_cache,
+            sagemaker_domain_cache_ttl=args.sagemaker_domain_cache_ttl,
+            journal=os.path.join(args.journal_dir, f"byor_journal_{entry['project_id']}.jsonl"),
+            resume=args.resume
         )
-        print(f"BYOR Role ARN: {args.bring_in_role_arn}\n")
-        byor_role_trust_policy = byor_role['Role']['AssumeRolePolicyDocument']
+        if project_args.command == ROLE_REPLACEMENT:
+            _use_your_own_role(project_args, iam_client, datazone, lakeformation, sagemaker, account_index)
+        else:
+            _enhance_project_role(project_args, iam_client, lakeformation, account_index)
 
-        # Combine trust policy and update Project Role's trust policy
-        new_trust_policy = _combine_trust_policy(project_role_trust_policy, byor_role_trust_policy)
-        _update_trust_policy(project_role['Role']['RoleName'], new_trust_policy, iam_client, args.execute)
+    failed_projects = {}
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        futures = {executor.submit(in_current_phase(migrate_project), entry): entry['project_id'] for entry in entries}
+        for future in as_completed(futures):
+            project_id = futures[future]
+            try:
+                future.result()
+                logger.info(f"Project {project_id} finished successfully")
+            except Exception as e:
+                logger.error(f"Project {project_id} failed: {e}")
+                failed_projects[project_id] = e
 
-        # Copy BYOR Role's managed policies to Project Role
-        _copy_managed_policies_arn(byor_role, project_role, [], iam_client, args.execute)
+    logger.info(f"Batch finished: {len(entries) - len(failed_projects)} succeeded, {len(failed_projects)} failed.")
+    if failed_projects:
+        raise Exception(f"Failed to migrate projects: {', '.join(failed_projects)}")
 
-        # Copy BYOR Role's inline policies to Project Role
-        _copy_inline_policies_arn(byor_role, project_role, iam_client, args.execute)
+def run_migration(args):
+    session = boto3.Session()
+    if (args.region):
+        session = boto3.Session(region_name=args.region)
+    iam_client = create_client('iam', session=session)
+    datazone = create_client('datazone', session=session)
+    lakeformation = create_client('lakeformation', session=session)
+    sagemaker = create_client('sagemaker', session=session)
 
-        # Copy BYOR Role's Tags to Project Role
-        _copy_tags(byor_role['Role']['RoleName'], project_role['Role']['RoleName'], iam_client, args.execute)
-        
-        # Copy LakeFormation Permissions and Opt-Ins
-        _copy_lakeformation_grants(lakeformation, args.bring_in_role_arn, project_role['Role']['Arn'], args.execute, args.command)
-        _copy_lakeformation_opt_ins(lakeformation, args.bring_in_role_arn, project_role['Role']['Arn'], args.execute)
-        if args.execute:
-            print(f"Successfully enhance project user role: {project_role['Role']['Arn']} referring to your own role: {byor_role['Role']['Arn']}")
+    if args.command == ROLE_REPLACEMENT:
+        _use_your_own_role(args, iam_client, datazone, lakeformation, sagemaker)
+    elif args.command == ROLE_ENHANCEMENT:
+        _enhance_project_role(args, iam_client, lakeformation)
+    elif args.command == BATCH:
+        _run_batch(args, iam_client, datazone, lakeformation, sagemaker)
     else:
-        print(f"Invalid command. Expecting '{ROLE_REPLACEMENT}' or '{ROLE_ENHANCEMENT}'.")
+        logger.error(f"Invalid command. Expecting '{ROLE_REPLACEMENT}', '{ROLE_ENHANCEMENT}' or '{BATCH}'.")
+
+def byor_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation_from_args(args)
+    enable_profiling_from_args(args)
+    enable_rate_limiting_from_args(args)
+    run_migration(args)
 
 if __name__ == "__main__":
     byor_main()
@@ -1,11 +1,20 @@
 import argparse
+import asyncio
 import json
 import boto3
-from pprint import pprint
 
 from botocore.exceptions import ClientError
 
-def _parse_args():
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import add_instrumentation_arguments, enable_instrumentation_from_args, phase
+from migration.utils.log import ProgressReporter, add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+
+logger = get_logger('migration.bring_your_own_s3_table_bucket')
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Python script to bring your tables in S3 Table Bucket into a specified project in sagemaker unified studio')
 
     parser.add_argument('--project-role-arn', type=str, required=True, help='Project role arn of the SageMaker Unified Studio project in which you want to bring your own glue tables')
@@ -16,13 +25,18 @@ def _parse_args():
     parser.add_argument('--table-name', type=str, required=False, help='Name of the table created in S3 table bucket you want to bring into your project. If not provided, imports all the tables of the provided s3 table bucket namespace into the project')
     parser.add_argument('--region', type=str, required=False, help='The AWS region. If not specified, the default region from your AWS credentials will be used')
     parser.add_argument('--execute', default=False, help='Determine if the script should generate overview or do the actual work', action='store_true')
+    add_instrumentation_arguments(parser)
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
+@phase('LF admin setup')
 def _add_lf_admin(lf_client, account_id, execute_flag):
     data_lake_settings = lf_client.get_data_lake_settings()
-    print(f"Checking current Data lake administrators:")
-    pprint(f"{json.dumps(data_lake_settings, sort_keys=True)}\n")
+    logger.info("Checking current Data lake administrators:")
+    logger.info("%s", json.dumps(data_lake_settings, sort_keys=True))
     redshift_principal = f"arn:aws:iam::{account_id}:role/aws-service-role/redshift.amazonaws.com/AWSServiceRoleForRedshift"
     if execute_flag:
         # Check if principal already exists
@@ -37,10 +51,11 @@ def _add_lf_admin(lf_client, account_id, execute_flag):
         lf_client.put_data_lake_settings(
             DataLakeSettings = data_lake_settings['DataLakeSettings']
         )
-        print(f"Successfully added AWSServiceRoleForRedshift role as Data lake ReadOnlyAdmins\n")
+        logger.info("Successfully added AWSServiceRoleForRedshift role as Data lake ReadOnlyAdmins")
     else:
-        print(f"Skip adding AWSServiceRoleForRedshift role as Data lake ReadOnlyAdmins, set --execute flag to True to do the actual update\n")
+        logger.info("Skip adding AWSServiceRoleForRedshift role as Data lake ReadOnlyAdmins, set --execute flag to True to do the actual update")
 
+@phase('LF resource registration')
 def _register_resource(lf_client, table_bucket_arn, iam_role_arn_lf_resource_register, execute_flag):
     s3_table_bucket_account_id = table_bucket_arn.split(':')[4]
     s3_table_bucket_region = table_bucket_arn.split(':')[3]
@@ -51,15 +66,16 @@ def _register_resource(lf_client, table_bucket_arn, iam_role_arn_lf_resource_reg
                 WithPrivilegedAccess=True,
                 RoleArn=iam_role_arn_lf_resource_register
             )
-            print(f"Successfully registered {table_bucket_arn} as LakeFormation resource\n")
+            logger.info(f"Successfully registered {table_bucket_arn} as LakeFormation resource")
         except ClientError as e:
             if e.response['Error']['Code'] == 'AlreadyExistsException':
-                print(f"Resource {table_bucket_arn} already registered as LakeFormation resource with {iam_role_arn_lf_resource_register} as principal\n")
+                logger.info(f"Resource {table_bucket_arn} already registered as LakeFormation resource with {iam_role_arn_lf_resource_register} as principal")
             else:
                 raise e
     else:
-        print(f"Skip registering {table_bucket_arn} as LakeFormation resource with {iam_role_arn_lf_resource_register} as principal, set --execute flag to True to do the actual update\n")
+        logger.info(f"Skip registering {table_bucket_arn} as LakeFormation resource with {iam_role_arn_lf_resource_register} as principal, set --execute flag to True to do the actual update")
 
+@phase('Glue catalog creation')
 def _create_glue_catalog(glue_client, table_bucket_arn, execute_flag):
     s3_table_bucket_account_id = table_bucket_arn.split(':')[4]
     s3_table_bucket_region = table_bucket_arn.split(':')[3]
@@ -81,14 +97,14 @@ def _create_glue_catalog(glue_client, table_bucket_arn, execute_flag):
             glue_client.create_catalog(
                 **catalog_input
             )
-            print(f"Successfully created glue catalog 's3tablescatalog'\n")
+            logger.info("Successfully created glue catalog 's3tablescatalog'")
         except ClientError as e:
             if e.response['Error']['Code'] == 'AlreadyExistsException':
-                print(f"Successfully created glue catalog 's3tablescatalog'\n")
+                logger.info("Successfully created glue catalog 's3tablescatalog'")
             else:
                 raise e
     else:
-        print(f"Skip creating glue catalog 's3tablescatalog', set --execute flag to True to do the actual update\n")
+        logger.info("Skip creating glue catalog 's3tablescatalog', set --execute flag to True to do the actual update")
 
 def _grant_table_lf_permissions(lf_client, s3tables_client, table_bucket_arn, namespace, table_name, project_role_arn, execute_flag):
     account_id = table_bucket_arn.split(':')[4]
@@ -108,7 +124,7 @@ def _grant_table_lf_permissions(lf_client, s3tables_client, table_bucket_arn, na
             "Table": {
                 "CatalogId": f"{account_id}:s3tablescatalog/{s3_table_bucket_name}",
                 "DatabaseName": namespace,
--               "Name": table_name,
+                "Name": table_name,
                 # "TableWildcard": {}
             }
         },
@@ -119,72 +135,44 @@ def _grant_table_lf_permissions(lf_client, s3tables_client, table_bucket_arn, na
         lf_client.grant_permissions(
             **permissions_input_table
         )
-        print(f"Successfully granted lakeformation permissions to s3 table bucket '{table_bucket_arn}', namespace '{namespace}', table '{table_name}'\n")
+        logger.debug("Successfully granted lakeformation permissions to s3 table bucket '%s', namespace '%s', table '%s'", table_bucket_arn, namespace, table_name)
     else:
-        print(f"Skip granting lakeformation permissions to s3 table bucket '{table_bucket_arn}', namespace '{namespace}', table '{table_name}', set --execute flag to True to do the actual update\n")
+        logger.debug("Skip granting lakeformation permissions to s3 table bucket '%s', namespace '%s', table '%s', set --execute flag to True to do the actual update", table_bucket_arn, namespace, table_name)
     
 
+async def _grant_listed_tables_lf_permissions(engine, lf_client, s3tables_client, project_role_arn, table_bucket_arn,
+                                             table_bucket_namespace, execute_flag):
+    list_params = {'tableBucketARN': table_bucket_arn}
+    if table_bucket_namespace:
+        list_params['namespace'] = table_bucket_namespace
+    grants = []
+    with ProgressReporter(logger, 'Granted tables') as progress:
+        # Start granting the tables of a page while the next page is listed
+        async for table in engine.wrap(s3tables_client).paginate('list_tables', 'tables', 'continuationToken', 'continuationToken', **list_params):
+            for namespace in ([table_bucket_namespace] if table_bucket_namespace else table["namespace"]):
+                grant = asyncio.ensure_future(engine.run('lakeformation',
+                                                         _grant_table_lf_permissions,
+                                                         lf_client,
+                                                         s3tables_client,
+                                                         table_bucket_arn,
+                                                         namespace,
+                                                         table["name"],
+                                                         project_role_arn,
+                                                         execute_flag))
+                grant.add_done_callback(lambda _: progress.update())
+                grants.append(grant)
+        await gather_in_order(grants)
+
+@phase('LF grant')
 def _grant_s3_table_bucket_lf_permissions(lf_client, s3tables_client, project_role_arn, table_bucket_arn, 
                                           table_bucket_namespace, table_name, execute_flag):
     if not table_bucket_namespace and table_name:
         raise Exception(f"Error: Please provide namespace name along with the table name '{table_name}', or remove table name from input.")
-    # Import all tables under provide S3 Table Bucket into SMUS Project
-    elif not table_bucket_namespace and not table_name:
-        next_token = None
-        while True:
-            if next_token:
-                response = s3tables_client.list_tables(
-                    tableBucketARN=table_bucket_arn,
-                    nextToken=next_token
-                )
-            else:
-                response = s3tables_client.list_tables(
-                    tableBucketARN=table_bucket_arn
-                )
-            tables_list = response["tables"]
-            for table in tables_list:
-                for namespace in table["namespace"]:
-                    _grant_table_lf_permissions(lf_client,
-                                                s3tables_client,
-                                                table_bucket_arn,
-                                                namespace,
-                                                table["name"],
-                                                project_role_arn,
-                                                execute_flag)
-                
-            if 'continuationToken' in response:
-                next_token = response['continuationToken']
-            else:
-                break
-    # Import all tables under provide S3 Table Bucket and namespace into SMUS Project
-    elif table_bucket_namespace and not table_name:
-        next_token = None
-        while True:
-            if next_token:
-                response = s3tables_client.list_tables(
-                    tableBucketARN=table_bucket_arn,
-                    namespace=table_bucket_namespace,
-                    nextToken=next_token
-                )
-            else:
-                response = s3tables_client.list_tables(
-                    tableBucketARN=table_bucket_arn,
-                    namespace=table_bucket_namespace
-                )
-            tables_list = response["tables"]
-            for table in tables_list:
-                _grant_table_lf_permissions(lf_client,
-                                            s3tables_client,
-                                            table_bucket_arn,
-                                            table_bucket_namespace,
-                                            table["name"],
-                                            project_role_arn,
-                                            execute_flag)
-                
-            if 'continuationToken' in response:
-                next_token = response['continuationToken']
-            else:
-                break
+    # Import all tables under provide S3 Table Bucket, or under the provided namespace, into SMUS Project
+    elif not table_name:
+        engine = AsyncAwsEngine()
+        engine.run_until_complete(_grant_listed_tables_lf_permissions(engine, lf_client, s3tables_client, project_role_arn, table_bucket_arn,
+                                                                      table_bucket_namespace, execute_flag))
     # Import specific table into SMUS Project
     else:
         _grant_table_lf_permissions(lf_client,
@@ -195,14 +183,13 @@ def _grant_s3_table_bucket_lf_permissions(lf_client, s3tables_client, project_ro
                                     project_role_arn,
                                     execute_flag)
 
-def byos3tb_main():
-    args = _parse_args()
+def run_migration(args):
     session = boto3.Session()
     if (args.region):
         session = boto3.Session(region_name=args.region)
-    lf_client = session.client('lakeformation')
-    glue_client = session.client('glue')
-    s3tables_client = session.client('s3tables')
+    lf_client = create_client('lakeformation', session=session)
+    glue_client = create_client('glue', session=session)
+    s3tables_client = create_client('s3tables', session=session)
     
     current_region = session.region_name
     s3_table_bucket_region = args.table_bucket_arn.split(':')[3]
@@ -216,10 +203,18 @@ def byos3tb_main():
         _create_glue_catalog(glue_client, args.table_bucket_arn, args.execute)
         _grant_s3_table_bucket_lf_permissions(lf_client, s3tables_client, args.project_role_arn, args.table_bucket_arn, args.table_bucket_namespace, args.table_name, args.execute)
     except Exception as e:
-        print(f"An error occurred during import S3 Table Bucket process: {e}")
+        logger.error(f"An error occurred during import S3 Table Bucket process: {e}")
         raise
     if args.execute:
-        print("Successfully imported S3 Table Bucket to SMUS project")
+        logger.info("Successfully imported S3 Table Bucket to SMUS project")
+
+def byos3tb_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation_from_args(args)
+    enable_profiling_from_args(args)
+    enable_rate_limiting_from_args(args)
+    run_migration(args)
 
 if __name__ == "__main__":
     byos3tb_main()
@@ -0,0 +1,115 @@
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+import time
+
+_START_TIME = time.perf_counter()
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+PROFILE_STARTUP_TOP_MODULES = 20
+
+# Subcommand -> (module name, script path relative to the repository root for scripts living outside of a Python package,
+# main function, help). Modules are only imported once their subcommand is chosen.
+SUBCOMMANDS = {
+    'emr': ('migration.emr.emr_migration', None, 'emr_main',
+            'Migrate EMR workspace notebooks to a SageMaker Unified Studio project'),
+    'athena': ('migration.athena.athena_workgroup_migration', None, 'athena_main',
+               'Migrate Athena named queries and workgroup to a SageMaker Unified Studio project'),
+    'gdc': ('bring_your_own_gdc_assets', 'migration/bring-your-own-gdc-assets/bring_your_own_gdc_assets.py', 'byogdc_main',
+            'Bring your own Glue Data Catalog databases and tables into a project'),
+    's3tables': ('bring_your_own_s3_table_bucket', 'migration/bring-your-own-s3-tables/bring_your_own_s3_table_bucket.py', 'byos3tb_main',
+                 'Bring your own S3 Table Bucket into a project'),
+    'byor': ('byor', 'migration/bring-your-own-role/byor.py', 'byor_main',
+             'Bring your own IAM role as, or into, a project role'),
+    'pipeline': ('migration.pipeline', None, 'pipeline_main',
+                 'Run the migration steps of a project listed in a YAML or JSON pipeline spec'),
+    'scan': ('migration.scan', None, 'scan_main',
+             'Inventory the resources to migrate and estimate the API calls and time the migration takes, read-only'),
+    'verify': ('migration.verify', None, 'verify_main',
+               'Verify that migrated queries, notebooks and Lake Formation grants match their source'),
+}
+
+
+def load_script(relative_path, module_name):
+    """
+    Import one of the scripts living in a folder that is not a Python package, e.g. bring-your-own-role/byor.py
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_subcommand_module(name):
+    module_name, script_path, _, _ = SUBCOMMANDS[name]
+    return load_script(script_path, module_name) if script_path else importlib.import_module(module_name)
+
+
+def load_subcommand(name):
+    return getattr(load_subcommand_module(name), SUBCOMMANDS[name][2])
+
+
+def _module_name_from_path(path):
+    path = os.path.abspath(path)
+    for root in sorted(sys.path, key=len, reverse=True):
+        root = os.path.abspath(root or os.curdir)
+        if path.startswith(root + os.sep):
+            name = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, '.')
+            return name[:-len('.__init__')] if name.endswith('.__init__') else name
+    return path
+
+
+def _load_subcommand_profiled(name):
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    import_start = time.perf_counter()
+    profiler.enable()
+    main = load_subcommand(name)
+    profiler.disable()
+    import_seconds = time.perf_counter() - import_start
+
+    # Every executed module shows up as a `<module>` entry, its cumulative time is the time taken to import it
+    module_times = [(cumulative_seconds, _module_name_from_path(filename))
+                    for (filename, _, function_name), (_, _, _, cumulative_seconds, _) in pstats.Stats(profiler).stats.items()
+                    if function_name == '<module>']
+    module_times.sort(reverse=True)
+    print(f"Startup profile of `{name}`: CLI ready after {import_start - _START_TIME:.3f}s, subcommand imported in {import_seconds:.3f}s "
+          f"({len(module_times)} modules executed, times include profiling overhead)", file=sys.stderr)
+    print(f"{'cumulative s':>12}  module", file=sys.stderr)
+    for cumulative_seconds, module_name in module_times[:PROFILE_STARTUP_TOP_MODULES]:
+        print(f"{cumulative_seconds:>12.3f}  {module_name}", file=sys.stderr)
+    return main
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog='migration',
+                                     description='Migrate resources to Amazon SageMaker Unified Studio. '
+                                                 'Run `migration <subcommand> --help` for the options of a subcommand.')
+    parser.add_argument('--profile-startup',
+                        action='store_true',
+                        default=False,
+                        help='Print the time taken to import the subcommand and its slowest imported modules to stderr')
+    subparsers = parser.add_subparsers(dest='subcommand', metavar='subcommand', required=True)
+    for name, (_, _, _, help_text) in SUBCOMMANDS.items():
+        # Options of a subcommand are parsed by the subcommand itself
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    return parser.parse_known_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args, subcommand_argv = _parse_args(argv)
+    main_function = _load_subcommand_profiled(args.subcommand) if args.profile_startup else load_subcommand(args.subcommand)
+    sys.argv = [f"migration {args.subcommand}"] + subcommand_argv
+    return main_function()
+
+
+if __name__ == '__main__':
+    main()
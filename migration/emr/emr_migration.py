@@ -1,15 +1,25 @@
 import argparse
-import boto3
 import os
 import shutil
 
-from migration.utils.datazone_helper import get_project_repo
-from migration.utils.emr_helper import get_emr_workspace_storage_location
-from migration.utils.s3_helper import download_s3_directory_recursive
+from migration.utils.emr_helper import get_emr_studio_storage_location, get_emr_workspace_storage_location
+from migration.utils.instrumentation import add_instrumentation_arguments, enable_instrumentation_from_args, phase
+from migration.utils.log import ProgressReporter, add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.notebook import CHECKPOINTS_FOLDER, DEFAULT_MAX_OUTPUT_BYTES, SlimmingStats
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+from migration.utils.repository import API_BACKEND, add_repository_arguments, close_file_contents, get_repository_backend, read_file
+from migration.utils.s3_helper import add_transfer_arguments, download_s3_directory_recursive, transfer_settings_from_args
 
-def upload_notebooks(local_folder, domain_id, project_id, emr_studio_id, emr_workspace_id, region):
+logger = get_logger('migration.emr.emr_migration')
+
+REPO_NOTEBOOKS_FOLDER = 'emr_notebooks'
+
+@phase('notebook upload')
+def upload_notebooks(local_folder, domain_id, project_id, emr_studio_id, emr_workspace_id, region,
+                     slim_notebooks=False, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES, repo_backend=API_BACKEND, repo_url=None):
     if not local_folder:
-        print("No local folder provided. Skipping notebook upload.")
+        logger.info("No local folder provided. Skipping notebook upload.")
         return
     else:
         if not emr_studio_id or not emr_workspace_id:
@@ -18,60 +28,110 @@ def upload_notebooks(local_folder, domain_id, project_id, emr_studio_id, emr_wor
     if not os.path.exists(local_folder):
         raise ValueError(f"Local folder {local_folder} does not exist")
 
-    repo = get_project_repo(domain_id, project_id, region)
-
-    print(f"Uploading notebook from local folder {local_folder} to CodeCommit repo {repo}...")
-    code_commit = boto3.client('codecommit', region_name=region)
-    branch = "main"
-    putFilesList = []
-
-    for (root, folders, files) in os.walk(local_folder):
-        for file in files:
-            file_path = os.path.join(root, file)
-            print("Local file: " + file_path)
-            # If the file_path has '.git', then ignore it, because it will cause git pull to fail.
-            if ".git" in file_path:
-                print("Ignoring file: " + file_path)
-                continue
-            print("Uploading to: " + str(file_path).replace(local_folder, f'emr_notebooks/{emr_studio_id}/{emr_workspace_id}'))
-            with open(file_path, mode='r+b') as file_obj:
-                file_content = file_obj.read()
-                putFileEntry = {
-                    'filePath': str(file_path).replace(local_folder, f'emr_notebooks/{emr_studio_id}/{emr_workspace_id}'),
-                    'fileContent': file_content
-                }
-                putFilesList.append(putFileEntry)
-
-    parent_commit_id = code_commit.get_branch(repositoryName=repo, branchName=branch).get("branch").get("commitId")
-    code_commit.create_commit(
-        repositoryName=repo,
-        branchName=branch,
-        parentCommitId=parent_commit_id,
-        putFiles=putFilesList
-    )
-    print(f"Uploaded notebook from local folder {local_folder} to CodeCommit repo {repo}.")
+    repository = get_repository_backend(domain_id, project_id, region, repo_backend, repo_url)
 
+    logger.info(f"Uploading notebook from local folder {local_folder} to repo {repository.repo}...")
+    notebook_files = []
+    slimming_stats = SlimmingStats() if slim_notebooks else None
 
-if __name__ == '__main__':
+    with ProgressReporter(logger, 'Read notebook files') as progress:
+        for (root, folders, files) in os.walk(local_folder):
+            if slimming_stats and CHECKPOINTS_FOLDER in folders:
+                # Jupyter's autosaved copies of the notebooks, not worth committing
+                folders.remove(CHECKPOINTS_FOLDER)
+                slimming_stats.drop_folder(os.path.join(root, CHECKPOINTS_FOLDER))
+            for file in files:
+                file_path = os.path.join(root, file)
+                logger.debug("Local file: %s", file_path)
+                # If the file_path has '.git', then ignore it, because it will cause git pull to fail.
+                if ".git" in file_path:
+                    logger.debug("Ignoring file: %s", file_path)
+                    continue
+                repo_file_path = str(file_path).replace(local_folder, f'{REPO_NOTEBOOKS_FOLDER}/{emr_studio_id}/{emr_workspace_id}')
+                logger.debug("Uploading to: %s", repo_file_path)
+                if slimming_stats and file.endswith('.ipynb'):
+                    file_content = slimming_stats.read_notebook(file_path, max_output_bytes)
+                else:
+                    file_content = read_file(file_path)
+                notebook_files.append((repo_file_path, file_content))
+                progress.update()
+
+    if slimming_stats:
+        slimming_stats.log()
+    # Notebooks shared by several workspaces are sent once, other copies are made by the repository
+    try:
+        repository.commit_files(notebook_files, f"Migrate notebooks of EMR Studio workspace {emr_workspace_id}", REPO_NOTEBOOKS_FOLDER)
+    finally:
+        close_file_contents(notebook_files)
+    logger.info(f"Uploaded notebook from local folder {local_folder} to repo {repository.repo}.")
+
+
+def parse_args(argv=None):
     # Create an ArgumentParser object
     parser = argparse.ArgumentParser(description='Migrate EMR workspace notebooks to a SageMaker Unified Studio project')
     # Add arguments
     parser.add_argument('--domain-id', type=str, required=True, help='ID of the SageMaker Unified Studio Domain')
     parser.add_argument('--project-id', type=str, required=True, help='Project ID in the SageMaker Unified Studio Domain')
     parser.add_argument('--emr-studio-id', type=str, help='Id for EMR Studio. Format es-XXXX')
-    parser.add_argument('--emr-workspace-id', type=str, help='Id for EMR studio workspace. Format is e-YYYY')
+    parser.add_argument('--emr-workspace-id', type=str, help='Id for EMR studio workspace. Format is e-YYYY. '
+                                                                       'Omit it to migrate all workspaces of the studio, one commit per workspace')
     parser.add_argument('--region', type=str, required=True, help='AWS region')
+    parser.add_argument('--slim-notebooks', action='store_true', default=False,
+                        help='Truncate or remove notebook cell outputs larger than --max-output-bytes and skip .ipynb_checkpoints folders before committing')
+    parser.add_argument('--max-output-bytes', type=int, default=DEFAULT_MAX_OUTPUT_BYTES,
+                        help='Size above which a cell output is truncated or removed with --slim-notebooks')
+    add_transfer_arguments(parser)
+    add_repository_arguments(parser)
+    add_instrumentation_arguments(parser)
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
     # Parse the arguments
-    args = parser.parse_args()
+    return parser.parse_args(argv)
+
 
-    local_path = "DELEME_ME_downloaded_emr_workspace_files"
+def migrate_studio(args):
+    if not args.emr_studio_id:
+        raise ValueError("EMR Studio ID is required when migrating all workspaces of a studio")
+    # The workspaces are folders of the storage location of the studio, listed concurrently and downloaded in one go
+    local_path = f"DELEME_ME_downloaded_emr_studio_files_{args.emr_studio_id}"
+    studio_s3_uri = get_emr_studio_storage_location(args.emr_studio_id, args.region)
+    download_s3_directory_recursive(studio_s3_uri, local_path, transfer_settings_from_args(args))
+    emr_workspace_ids = sorted(folder for folder in os.listdir(local_path) if folder.startswith('e-'))
+    logger.info("Migrating %d workspaces of EMR Studio %s...", len(emr_workspace_ids), args.emr_studio_id)
+    for emr_workspace_id in emr_workspace_ids:
+        upload_notebooks(os.path.join(local_path, emr_workspace_id), args.domain_id, args.project_id, args.emr_studio_id,
+                         emr_workspace_id, args.region, args.slim_notebooks, args.max_output_bytes, args.repo_backend, args.repo_url)
+    # Clean up the downloaded files
+    logger.info("Cleaning up downloaded files...")
+    shutil.rmtree(local_path)
+    logger.info("Done")
+
+
+def run_migration(args):
+    if not args.emr_workspace_id:
+        migrate_studio(args)
+        return
+    # One folder per workspace, several workspaces may be migrated concurrently by a pipeline
+    local_path = f"DELEME_ME_downloaded_emr_workspace_files_{args.emr_workspace_id}"
     workspace_s3_uri = get_emr_workspace_storage_location(args.emr_workspace_id, args.region)
-    download_s3_directory_recursive(workspace_s3_uri, local_path)
-    upload_notebooks(local_path, args.domain_id, args.project_id, args.emr_studio_id, args.emr_workspace_id, args.region)
+    download_s3_directory_recursive(workspace_s3_uri, local_path, transfer_settings_from_args(args))
+    upload_notebooks(local_path, args.domain_id, args.project_id, args.emr_studio_id, args.emr_workspace_id, args.region,
+                     args.slim_notebooks, args.max_output_bytes, args.repo_backend, args.repo_url)
     # Clean up the downloaded files
-    print("Cleaning up downloaded files...")
+    logger.info("Cleaning up downloaded files...")
     shutil.rmtree(local_path)
-    print("Done")
+    logger.info("Done")
+
 
+def emr_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation_from_args(args)
+    enable_profiling_from_args(args)
+    enable_rate_limiting_from_args(args)
+    run_migration(args)
 
 
+if __name__ == '__main__':
+    emr_main()
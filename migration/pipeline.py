@@ -0,0 +1,259 @@
+import argparse
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from migration.cli import load_subcommand_module
+from migration.utils.async_aws import DEFAULT_MAX_CONCURRENCY_PER_SERVICE
+from migration.utils.aws_clients import enable_client_pool
+from migration.utils.instrumentation import enable_instrumentation, get_recorder
+from migration.utils.log import add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+
+logger = get_logger('migration.pipeline')
+
+DEFAULT_MAX_PARALLEL_STEPS = 4
+DEFAULT_REPORT_PATH = 'pipeline_report.json'
+# Step type -> settings of the spec passed to the step, when the step does not set them itself
+STEP_SETTINGS = {
+    'emr': ('domain_id', 'project_id', 'region', 'repo_backend', 'repo_url'),
+    'athena': ('domain_id', 'project_id', 'account_id', 'region', 'repo_backend', 'repo_url', 'notebook_workers'),
+    'gdc': ('region',),
+    's3tables': ('region', 'execute'),
+    'byor': ('domain_id', 'project_id', 'region', 'execute'),
+    'verify': ('domain_id', 'project_id', 'region', 'repo_backend', 'repo_url'),
+}
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class PipelineStep:
+    """
+    One migration script run of a pipeline, with the arguments it would get on the command line
+    """
+    def __init__(self, name, step_type, argv, depends_on):
+        self.name = name
+        self.step_type = step_type
+        self.argv = argv
+        self.depends_on = depends_on
+        self.args = None
+        self.status = PENDING
+        self.start_seconds = None
+        self.seconds = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'type': self.step_type,
+            'depends_on': self.depends_on,
+            'status': self.status,
+            'start_seconds': self.start_seconds,
+            'seconds': self.seconds,
+            'error': self.error,
+        }
+
+
+def load_spec(path):
+    """
+    Read a pipeline spec from a YAML (.yaml, .yml) or JSON file
+    """
+    with open(path) as spec_file:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML pipeline specs requires PyYAML, install it with `pip install pyyaml` or use a JSON spec")
+            return yaml.safe_load(spec_file)
+        return json.load(spec_file)
+
+
+def _to_argv(arguments):
+    # {'database_name': 'sales', 'execute': True} -> ['--database-name', 'sales', '--execute']
+    argv = []
+    for key, value in arguments.items():
+        option = '--' + key.replace('_', '-')
+        if value is True:
+            argv.append(option)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, list):
+            for item in value:
+                argv.extend([option, str(item)])
+        else:
+            argv.extend([option, str(value)])
+    return argv
+
+
+def build_steps(spec):
+    """
+    Build the steps of a pipeline spec and check that their dependencies exist and do not form a cycle.
+
+    A spec holds `settings` shared by the steps, such as domain_id, project_id, account_id, region and execute,
+    and a list of `steps`. Every step has a `name`, a `type` (one of STEP_SETTINGS), optional `depends_on` step names,
+    an optional `command` for scripts with subcommands, e.g. `use-your-own-role` for byor, and the script's `args`.
+    """
+    settings = spec.get('settings') or {}
+    steps = []
+    for index, entry in enumerate(spec.get('steps') or []):
+        step_type = entry.get('type')
+        if step_type not in STEP_SETTINGS:
+            raise ValueError(f"Step {index + 1} has invalid type `{step_type}`. Expecting one of {', '.join(STEP_SETTINGS)}.")
+        name = entry.get('name') or step_type
+        arguments = {key: settings[key] for key in STEP_SETTINGS[step_type] if key in settings}
+        arguments.update({key.replace('-', '_'): value for key, value in (entry.get('args') or {}).items()})
+        argv = ([entry['command']] if entry.get('command') else []) + _to_argv(arguments)
+        steps.append(PipelineStep(name, step_type, argv, list(entry.get('depends_on') or [])))
+    if not steps:
+        raise ValueError("The pipeline spec has no steps")
+
+    steps_by_name = {}
+    for step in steps:
+        if step.name in steps_by_name:
+            raise ValueError(f"Step name `{step.name}` is used more than once, give the steps unique names")
+        steps_by_name[step.name] = step
+    for step in steps:
+        for dependency in step.depends_on:
+            if dependency not in steps_by_name:
+                raise ValueError(f"Step `{step.name}` depends on unknown step `{dependency}`")
+    _check_acyclic(steps_by_name)
+    return steps
+
+
+def _check_acyclic(steps_by_name):
+    visited = set()
+
+    def visit(name, path):
+        if name in path:
+            raise ValueError(f"Steps depend on each other: {' -> '.join(path[path.index(name):] + [name])}")
+        if name in visited:
+            return
+        for dependency in steps_by_name[name].depends_on:
+            visit(dependency, path + [name])
+        visited.add(name)
+
+    for name in steps_by_name:
+        visit(name, [])
+
+
+def _parse_step_arguments(step):
+    module = load_subcommand_module(step.step_type)
+    try:
+        step.args = module.parse_args(step.argv)
+    except SystemExit:
+        logger.error("Invalid arguments for step `%s`: %s", step.name, ' '.join(step.argv))
+        raise
+    return module
+
+
+def _run_step(step, module, pipeline_start):
+    start = time.perf_counter()
+    step.start_seconds = round(start - pipeline_start, 3)
+    step.status = RUNNING
+    logger.info("Step `%s` (%s) started", step.name, step.step_type)
+    try:
+        module.run_migration(step.args)
+        step.status = SUCCEEDED
+        logger.info("Step `%s` succeeded in %.1fs", step.name, time.perf_counter() - start)
+    except Exception as e:
+        step.status = FAILED
+        step.error = str(e)
+        logger.error("Step `%s` failed: %s", step.name, e, exc_info=True)
+    finally:
+        step.seconds = round(time.perf_counter() - start, 3)
+
+
+def run_pipeline(steps, max_parallel_steps=DEFAULT_MAX_PARALLEL_STEPS):
+    """
+    Run the steps, each one as soon as the steps it depends on have succeeded, up to `max_parallel_steps` at once.
+    Steps depending on a failed or skipped step are skipped, independent steps still run.
+    """
+    # Arguments of every step are checked before anything runs
+    modules = {step.name: _parse_step_arguments(step) for step in steps}
+    steps_by_name = {step.name: step for step in steps}
+    pipeline_start = time.perf_counter()
+    pending = list(steps)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_parallel_steps, thread_name_prefix='pipeline-step') as executor:
+        while pending or running:
+            for step in list(pending):
+                dependencies = [steps_by_name[name] for name in step.depends_on]
+                if any(dependency.status in (FAILED, SKIPPED) for dependency in dependencies):
+                    step.status = SKIPPED
+                    pending.remove(step)
+                    logger.warning("Skipping step `%s`, a step it depends on did not succeed", step.name)
+                elif all(dependency.status == SUCCEEDED for dependency in dependencies):
+                    pending.remove(step)
+                    running[executor.submit(_run_step, step, modules[step.name], pipeline_start)] = step
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+    return time.perf_counter() - pipeline_start
+
+
+def pipeline_report(steps, wall_seconds):
+    recorder = get_recorder()
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'steps': {step.name: step.to_dict() for step in steps},
+        'api_calls': recorder.report() if recorder else None,
+    }
+
+
+def _log_summary(steps, wall_seconds):
+    logger.info("Pipeline finished in %.1fs", wall_seconds)
+    logger.info("%-30s %-10s %-10s %10s %10s", 'step', 'type', 'status', 'start s', 'seconds')
+    for step in steps:
+        logger.info("%-30s %-10s %-10s %10s %10s", step.name, step.step_type, step.status,
+                    step.start_seconds if step.start_seconds is not None else '-', step.seconds if step.seconds is not None else '-')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the migration steps of a project listed in a YAML or JSON pipeline spec. '
+                                                 'Independent steps run concurrently and share AWS clients and the project repository lookup.')
+    parser.add_argument('--spec', type=str, required=True, help='YAML or JSON file listing the settings and steps of the pipeline')
+    parser.add_argument('--max-parallel-steps',
+                        type=int,
+                        help=f"Number of steps run concurrently. Defaults to `max_parallel_steps` of the spec, or {DEFAULT_MAX_PARALLEL_STEPS}")
+    parser.add_argument('--report',
+                        type=str,
+                        default=DEFAULT_REPORT_PATH,
+                        help='File to write the timing report of the steps and their AWS API calls to as JSON')
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def pipeline_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation()
+    enable_profiling_from_args(args, args.report)
+    enable_rate_limiting_from_args(args)
+
+    spec = load_spec(args.spec)
+    steps = build_steps(spec)
+    max_parallel_steps = args.max_parallel_steps or spec.get('max_parallel_steps') or DEFAULT_MAX_PARALLEL_STEPS
+    # Every running step makes concurrent calls through the shared clients
+    enable_client_pool(max_parallel_steps * DEFAULT_MAX_CONCURRENCY_PER_SERVICE)
+    logger.info("Running %d steps from %s, up to %d at once...", len(steps), args.spec, max_parallel_steps)
+    wall_seconds = run_pipeline(steps, max_parallel_steps)
+
+    _log_summary(steps, wall_seconds)
+    with open(args.report, 'w') as report_file:
+        json.dump(pipeline_report(steps, wall_seconds), report_file, indent=2)
+    logger.info("Wrote pipeline report to %s", args.report)
+
+    unsuccessful_steps = [step.name for step in steps if step.status != SUCCEEDED]
+    if unsuccessful_steps:
+        raise Exception(f"Pipeline steps did not succeed: {', '.join(unsuccessful_steps)}")
+
+
+if __name__ == '__main__':
+    pipeline_main()
@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import json
+import math
+import statistics
+from collections import Counter
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from migration.utils.async_aws import DEFAULT_MAX_CONCURRENCY_PER_SERVICE, AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import enable_instrumentation, get_recorder, phase
+from migration.utils.log import add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+from migration.utils.s3_helper import DEFAULT_MULTIPART_CHUNK_BYTES, DEFAULT_MULTIPART_THRESHOLD
+
+logger = get_logger('migration.scan')
+
+SOURCES = ('athena', 'emr', 'glue', 's3tables', 'lakeformation')
+DEFAULT_REPORT_PATH = 'scan_report.json'
+# Used for the estimate when the scan made no call to measure the latency of
+DEFAULT_API_LATENCY_MS = 50.0
+# Roles of the projects of a SageMaker Unified Studio domain, see byor._find_project_execution_role
+PROJECT_ROLE_NAME_MARKER = 'datazone_usr_role_'
+ATHENA_NAMED_QUERY_PAGE_SIZE = 50
+CODECOMMIT_DIFFERENCES_PAGE_SIZE = 100
+LAKEFORMATION_OPT_IN_PAGE_SIZE = 100
+
+
+async def _scan_pages(client, operation_name, result_key, input_token='NextToken', output_token='NextToken', on_item=None, **kwargs):
+    """
+    Call every page of a paginated operation, pass its items to `on_item` and return the number of pages
+    """
+    params = dict(kwargs)
+    pages = 0
+    while True:
+        response = await getattr(client, operation_name)(**params)
+        pages += 1
+        if on_item:
+            for item in response.get(result_key, []):
+                on_item(item)
+        if not response.get(output_token):
+            return pages
+        params[input_token] = response[output_token]
+
+
+async def _list_items(client, operation_name, result_key, input_token='NextToken', output_token='NextToken', **kwargs):
+    items = []
+    await _scan_pages(client, operation_name, result_key, input_token, output_token, items.append, **kwargs)
+    return items
+
+
+async def _scan_athena(engine, region, workgroup_names):
+    athena = engine.wrap(create_client('athena', region_name=region))
+    if not workgroup_names:
+        workgroup_names = [workgroup['Name'] for workgroup in await _list_items(athena, 'list_work_groups', 'WorkGroups')]
+
+    async def scan_workgroup(workgroup_name):
+        named_query_ids = []
+        pages = await _scan_pages(athena, 'list_named_queries', 'NamedQueryIds', on_item=named_query_ids.append,
+                                  WorkGroup=workgroup_name, MaxResults=ATHENA_NAMED_QUERY_PAGE_SIZE)
+        return {'named_queries': len(named_query_ids), 'list_pages': pages}
+
+    results = await gather_in_order(scan_workgroup(workgroup_name) for workgroup_name in workgroup_names)
+    return {'workgroups': dict(zip(workgroup_names, results))}
+
+
+def _split_s3_uri(s3_uri):
+    bucket, _, prefix = s3_uri.replace('s3://', '', 1).partition('/')
+    return bucket, prefix.rstrip('/') + '/' if prefix else ''
+
+
+async def _scan_emr(engine, region, studio_ids):
+    emr = engine.wrap(create_client('emr', region_name=region))
+    s3 = engine.wrap(create_client('s3', region_name=region))
+    if not studio_ids:
+        studio_ids = [studio['StudioId'] for studio in await _list_items(emr, 'list_studios', 'Studios', 'Marker', 'Marker')]
+
+    async def scan_workspace(bucket, prefix):
+        workspace = {'files': 0, 'bytes': 0, 'download_parts': 0}
+
+        def add(obj):
+            if not obj['Key'].endswith('/'):
+                workspace['files'] += 1
+                workspace['bytes'] += obj['Size']
+                # Objects from the multipart threshold are downloaded in parts, one GetObject call per part
+                if obj['Size'] >= DEFAULT_MULTIPART_THRESHOLD:
+                    workspace['download_parts'] += math.ceil(obj['Size'] / DEFAULT_MULTIPART_CHUNK_BYTES)
+                else:
+                    workspace['download_parts'] += 1
+        workspace['list_pages'] = await _scan_pages(s3, 'list_objects_v2', 'Contents', 'ContinuationToken', 'NextContinuationToken', add,
+                                                    Bucket=bucket, Prefix=prefix)
+        return workspace
+
+    async def scan_studio(studio_id):
+        studio = (await emr.describe_studio(StudioId=studio_id))['Studio']
+        # Workspaces are stored in a folder named after their id under the default S3 location of their studio
+        bucket, prefix = _split_s3_uri(studio['DefaultS3Location'])
+        folders = await _list_items(s3, 'list_objects_v2', 'CommonPrefixes', 'ContinuationToken', 'NextContinuationToken',
+                                    Bucket=bucket, Prefix=prefix, Delimiter='/')
+        workspace_prefixes = {folder['Prefix'][len(prefix):].rstrip('/'): folder['Prefix'] for folder in folders}
+        workspace_prefixes = {workspace_id: folder for workspace_id, folder in workspace_prefixes.items() if workspace_id.startswith('e-')}
+        results = await gather_in_order(scan_workspace(bucket, folder) for folder in workspace_prefixes.values())
+        return {'location': studio['DefaultS3Location'], 'workspaces': dict(zip(workspace_prefixes, results))}
+
+    results = await gather_in_order(scan_studio(studio_id) for studio_id in studio_ids)
+    return {'studios': dict(zip(studio_ids, results))}
+
+
+async def _scan_glue(engine, region, database_names, count_partitions):
+    glue = engine.wrap(create_client('glue', region_name=region))
+    if not database_names:
+        database_names = [database['Name'] for database in await _list_items(glue, 'get_databases', 'DatabaseList')]
+
+    async def scan_partitions(database_name, table_name):
+        partition_count = 0
+
+        def add(_):
+            nonlocal partition_count
+            partition_count += 1
+        pages = await _scan_pages(glue, 'get_partitions', 'Partitions', on_item=add,
+                                  DatabaseName=database_name, TableName=table_name, ExcludeColumnSchema=True)
+        return partition_count, pages
+
+    async def scan_database(database_name):
+        partitioned_tables = []
+        database = {'tables': 0, 'partitioned_tables': 0}
+
+        def add(table):
+            database['tables'] += 1
+            if table.get('PartitionKeys'):
+                partitioned_tables.append(table['Name'])
+        database['table_pages'] = await _scan_pages(glue, 'get_tables', 'TableList', on_item=add, DatabaseName=database_name)
+        database['partitioned_tables'] = len(partitioned_tables)
+        if count_partitions:
+            results = await gather_in_order(scan_partitions(database_name, table_name) for table_name in partitioned_tables)
+            database['partitions'] = sum(count for count, _ in results)
+            database['partition_pages'] = sum(pages for _, pages in results)
+        return database
+
+    results = await gather_in_order(scan_database(database_name) for database_name in database_names)
+    return {'databases': dict(zip(database_names, results))}
+
+
+async def _scan_s3tables(engine, region, table_bucket_arns):
+    s3tables = engine.wrap(create_client('s3tables', region_name=region))
+    if not table_bucket_arns:
+        table_bucket_arns = [bucket['arn'] for bucket in await _list_items(s3tables, 'list_table_buckets', 'tableBuckets',
+                                                                            'continuationToken', 'continuationToken')]
+
+    async def scan_table_bucket(table_bucket_arn):
+        namespaces = Counter()
+        namespace_items = await _list_items(s3tables, 'list_namespaces', 'namespaces', 'continuationToken', 'continuationToken',
+                                            tableBucketARN=table_bucket_arn)
+        for namespace in namespace_items:
+            namespaces.setdefault(namespace['namespace'][0], 0)
+        pages = await _scan_pages(s3tables, 'list_tables', 'tables', 'continuationToken', 'continuationToken',
+                                  lambda table: namespaces.update((table['namespace'][0],)), tableBucketARN=table_bucket_arn)
+        return {'namespaces': dict(namespaces), 'tables': sum(namespaces.values()), 'table_pages': pages}
+
+    results = await gather_in_order(scan_table_bucket(table_bucket_arn) for table_bucket_arn in table_bucket_arns)
+    return {'table_buckets': dict(zip(table_bucket_arns, results))}
+
+
+async def _scan_lakeformation(engine, region, role_arns):
+    lakeformation = engine.wrap(create_client('lakeformation', region_name=region))
+    grants = Counter()
+
+    def add(grant):
+        principal = grant['Principal']['DataLakePrincipalIdentifier']
+        if principal in role_arns or (not role_arns and PROJECT_ROLE_NAME_MARKER in principal):
+            grants[principal] += 1
+    # Grants can only be listed for the whole account, like byor does, then counted per role
+    pages = await _scan_pages(lakeformation, 'list_permissions', 'PrincipalResourcePermissions', on_item=add)
+    roles = sorted(set(role_arns) | set(grants))
+
+    async def scan_role(role_arn):
+        opt_ins = await _list_items(lakeformation, 'list_lake_formation_opt_ins', 'LakeFormationOptInsInfoList',
+                                    Principal={'DataLakePrincipalIdentifier': role_arn})
+        return {'grants': grants[role_arn], 'opt_ins': len(opt_ins)}
+
+    results = await gather_in_order(scan_role(role_arn) for role_arn in roles)
+    return {'list_permissions_pages': pages, 'roles': dict(zip(roles, results))}
+
+
+async def _scan_source(name, coroutine):
+    try:
+        return await coroutine
+    except (ClientError, BotoCoreError) as e:
+        # A source the caller may not access, or a service not available in the region, does not stop the others
+        logger.warning("Could not scan %s: %s", name, e)
+        return {'error': str(e)}
+
+
+@phase('inventory scan')
+def scan_inventory(region, sources=SOURCES, workgroup_names=(), studio_ids=(), database_names=(), table_bucket_arns=(),
+                   role_arns=(), count_partitions=True):
+    """
+    Inventory the resources the migration scripts would read and write, scanning all sources concurrently.
+    Sources with no names given are scanned whole, e.g. all Athena workgroups of the region.
+    Nothing is modified.
+    """
+    engine = AsyncAwsEngine()
+    scanners = {
+        'athena': lambda: _scan_athena(engine, region, list(workgroup_names)),
+        'emr': lambda: _scan_emr(engine, region, list(studio_ids)),
+        'glue': lambda: _scan_glue(engine, region, list(database_names), count_partitions),
+        's3tables': lambda: _scan_s3tables(engine, region, list(table_bucket_arns)),
+        'lakeformation': lambda: _scan_lakeformation(engine, region, list(role_arns)),
+    }
+
+    async def scan():
+        return await asyncio.gather(*(_scan_source(name, scanners[name]()) for name in sources))
+
+    return dict(zip(sources, engine.run_until_complete(scan())))
+
+
+def _pages(count, page_size):
+    return max(1, math.ceil(count / page_size))
+
+
+def _project_repo_calls(operations):
+    # get_project_repo, then the commit through the CodeCommit API backend
+    operations.update({'datazone.ListEnvironments': 1, 'datazone.GetEnvironment': 1, 'codecommit.GetBranch': 1, 'codecommit.CreateCommit': 1})
+
+
+def estimate_api_calls(inventory):
+    """
+    Returns {script: (number of runs, Counter of `<service>.<Operation>` calls)} expected to migrate the scanned inventory,
+    one athena run per workgroup, emr per workspace, gdc per database, s3tables per table bucket and byor per role.
+    Counts of conditional calls, such as Lake Formation opt-ins and S3 location registrations, are upper bounds.
+    """
+    estimates = {}
+
+    def add(script, operations):
+        runs, total = estimates.setdefault(script, (0, Counter()))
+        total.update(operations)
+        estimates[script] = (runs + 1, total)
+
+    for workgroup in inventory.get('athena', {}).get('workgroups', {}).values():
+        operations = Counter({'athena.ListNamedQueries': workgroup['list_pages'], 'athena.GetNamedQuery': workgroup['named_queries'],
+                              'athena.TagResource': 1, 'datazone.ListConnections': 1, 'datazone.UpdateConnection': 1})
+        _project_repo_calls(operations)
+        add('athena', operations)
+
+    for studio in inventory.get('emr', {}).get('studios', {}).values():
+        for workspace in studio['workspaces'].values():
+            operations = Counter({'emr.DescribeEditorPrivate': 1, 's3.ListObjectsV2': workspace['list_pages'],
+                                  's3.HeadObject': workspace['files'], 's3.GetObject': workspace['download_parts'],
+                                  'codecommit.GetDifferences': _pages(workspace['files'], CODECOMMIT_DIFFERENCES_PAGE_SIZE)})
+            _project_repo_calls(operations)
+            add('emr', operations)
+
+    for database in inventory.get('glue', {}).get('databases', {}).values():
+        tables = database['tables']
+        operations = Counter({'glue.GetTables': database['table_pages'], 'glue.GetPartitions': database.get('partition_pages', database['partitioned_tables']),
+                              'lakeformation.ListPermissions': 1 + tables, 'lakeformation.ListLakeFormationOptIns': 1 + tables,
+                              'lakeformation.CreateLakeFormationOptIn': 1 + tables, 'lakeformation.ListResources': 1,
+                              'lakeformation.RegisterResource': tables, 'lakeformation.GrantPermissions': tables})
+        add('gdc', operations)
+
+    for table_bucket in inventory.get('s3tables', {}).get('table_buckets', {}).values():
+        operations = Counter({'lakeformation.GetDataLakeSettings': 1, 'lakeformation.PutDataLakeSettings': 1, 'lakeformation.RegisterResource': 1,
+                              'glue.CreateCatalog': 1, 's3tables.ListTables': table_bucket['table_pages'],
+                              'lakeformation.GrantPermissions': table_bucket['tables']})
+        add('s3tables', operations)
+
+    lakeformation = inventory.get('lakeformation', {})
+    for role in lakeformation.get('roles', {}).values():
+        operations = Counter({'lakeformation.ListPermissions': lakeformation['list_permissions_pages'], 'lakeformation.GrantPermissions': role['grants'],
+                              'lakeformation.ListLakeFormationOptIns': _pages(role['opt_ins'], LAKEFORMATION_OPT_IN_PAGE_SIZE),
+                              'lakeformation.CreateLakeFormationOptIn': role['opt_ins']})
+        add('byor', operations)
+    return estimates
+
+
+def estimate_seconds(operations, concurrency, latency_seconds, rate_limiter=None):
+    """
+    Estimated wall-clock seconds of the calls of one script: each operation takes its calls times the latency divided
+    by the number of concurrent calls, or at least its calls divided by its starting rate limit, operations run one after
+    the other, like the phases of the scripts.
+    """
+    seconds = 0.0
+    for operation, calls in operations.items():
+        service_name, operation_name = operation.split('.', 1)
+        operation_seconds = calls * latency_seconds / concurrency
+        rate = rate_limiter.operation_calls_per_second(service_name, operation_name) if rate_limiter else None
+        if rate:
+            operation_seconds = max(operation_seconds, calls / rate)
+        seconds += operation_seconds
+    return seconds
+
+
+def _observed_latency_ms():
+    recorder = get_recorder()
+    latencies = [] if recorder is None else [stats['p50_ms'] for phase_report in recorder.report()['phases'].values()
+                                             for stats in phase_report['operations'].values() if stats['p50_ms'] is not None]
+    return statistics.median(latencies) if latencies else None
+
+
+def scan_report(inventory, concurrency, latency_ms, rate_limiter):
+    estimates = {}
+    for script, (runs, operations) in estimate_api_calls(inventory).items():
+        estimates[script] = {
+            'runs': runs,
+            'api_calls': sum(operations.values()),
+            'estimated_seconds': round(estimate_seconds(operations, concurrency, latency_ms / 1000, rate_limiter), 1),
+            'operations': dict(operations.most_common()),
+        }
+    return {
+        'inventory': inventory,
+        'estimate': {
+            'concurrency': concurrency,
+            'api_latency_ms': latency_ms,
+            'api_calls': sum(script['api_calls'] for script in estimates.values()),
+            'estimated_seconds': round(sum(script['estimated_seconds'] for script in estimates.values()), 1),
+            'scripts': estimates,
+        },
+    }
+
+
+def _log_summary(report):
+    inventory = report['inventory']
+    for source, result in inventory.items():
+        if 'error' in result:
+            logger.info("%s: not scanned, %s", source, result['error'])
+    athena = inventory.get('athena', {}).get('workgroups', {})
+    if athena:
+        logger.info("Athena: %d workgroups, %d named queries", len(athena), sum(workgroup['named_queries'] for workgroup in athena.values()))
+    workspaces = [workspace for studio in inventory.get('emr', {}).get('studios', {}).values() for workspace in studio['workspaces'].values()]
+    if 'studios' in inventory.get('emr', {}):
+        logger.info("EMR Studio: %d studios, %d workspaces, %d files, %d bytes", len(inventory['emr']['studios']), len(workspaces),
+                    sum(workspace['files'] for workspace in workspaces), sum(workspace['bytes'] for workspace in workspaces))
+    databases = inventory.get('glue', {}).get('databases', {})
+    if databases:
+        logger.info("Glue: %d databases, %d tables, %d partitioned tables, %s partitions", len(databases),
+                    sum(database['tables'] for database in databases.values()),
+                    sum(database['partitioned_tables'] for database in databases.values()),
+                    sum(database.get('partitions', 0) for database in databases.values()) if all('partitions' in database for database in databases.values()) else 'uncounted')
+    table_buckets = inventory.get('s3tables', {}).get('table_buckets', {})
+    if table_buckets:
+        logger.info("S3 Tables: %d table buckets, %d namespaces, %d tables", len(table_buckets),
+                    sum(len(table_bucket['namespaces']) for table_bucket in table_buckets.values()),
+                    sum(table_bucket['tables'] for table_bucket in table_buckets.values()))
+    for role_arn, role in inventory.get('lakeformation', {}).get('roles', {}).items():
+        logger.info("Lake Formation: %s has %d grants and %d opt-ins", role_arn, role['grants'], role['opt_ins'])
+
+    estimate = report['estimate']
+    logger.info("Estimate at %d concurrent calls per API and %.1f ms per call, within the default or given rate limits:",
+                estimate['concurrency'], estimate['api_latency_ms'])
+    logger.info("%-10s %6s %12s %14s", 'script', 'runs', 'api calls', 'estimated s')
+    for script, script_estimate in estimate['scripts'].items():
+        logger.info("%-10s %6d %12d %14.1f", script, script_estimate['runs'], script_estimate['api_calls'], script_estimate['estimated_seconds'])
+    logger.info("%-10s %6s %12d %14.1f", 'total', '', estimate['api_calls'], estimate['estimated_seconds'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Inventory, without modifying anything, the resources the migration scripts would touch '
+                                                 'and estimate the AWS API calls and time needed to migrate them')
+    parser.add_argument('--region', type=str, required=True, help='AWS region')
+    parser.add_argument('--sources', nargs='+', choices=SOURCES, default=list(SOURCES), help='Sources to scan, defaults to all')
+    parser.add_argument('--workgroup-name', dest='workgroup_names', action='append', default=[], metavar='NAME',
+                        help='Athena workgroup to scan, can be repeated. Defaults to all workgroups')
+    parser.add_argument('--emr-studio-id', dest='studio_ids', action='append', default=[], metavar='ID',
+                        help='EMR Studio to scan the workspaces of, can be repeated. Defaults to all studios')
+    parser.add_argument('--database-name', dest='database_names', action='append', default=[], metavar='NAME',
+                        help='Glue database to scan, can be repeated. Defaults to all databases')
+    parser.add_argument('--table-bucket-arn', dest='table_bucket_arns', action='append', default=[], metavar='ARN',
+                        help='S3 table bucket to scan, can be repeated. Defaults to all table buckets')
+    parser.add_argument('--role-arn', dest='role_arns', action='append', default=[], metavar='ARN',
+                        help=f"Role to count Lake Formation grants and opt-ins of, can be repeated. Defaults to the project roles, "
+                             f"whose name contains {PROJECT_ROLE_NAME_MARKER}")
+    parser.add_argument('--skip-partitions', default=False, action='store_true',
+                        help='Do not count the partitions of partitioned Glue tables, the slowest part of the scan of large catalogs')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY_PER_SERVICE,
+                        help='Concurrent calls per API the time estimate assumes')
+    parser.add_argument('--api-latency-ms', type=float,
+                        help=f"Latency per AWS API call the time estimate assumes. Defaults to the median latency observed "
+                             f"during the scan, or {DEFAULT_API_LATENCY_MS} ms")
+    parser.add_argument('--report', type=str, default=DEFAULT_REPORT_PATH, help='File to write the inventory and the estimate to as JSON')
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def scan_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation()
+    enable_profiling_from_args(args, args.report)
+    rate_limiter = enable_rate_limiting_from_args(args)
+
+    logger.info("Scanning %s in %s...", ', '.join(args.sources), args.region)
+    inventory = scan_inventory(args.region, args.sources, args.workgroup_names, args.studio_ids, args.database_names,
+                               args.table_bucket_arns, args.role_arns, not args.skip_partitions)
+    latency_ms = args.api_latency_ms or _observed_latency_ms() or DEFAULT_API_LATENCY_MS
+    report = scan_report(inventory, args.concurrency, latency_ms, rate_limiter)
+
+    _log_summary(report)
+    with open(args.report, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    logger.info("Wrote scan report to %s", args.report)
+
+
+if __name__ == '__main__':
+    scan_main()
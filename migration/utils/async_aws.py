@@ -0,0 +1,106 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from migration.utils.instrumentation import in_current_phase
+
+# botocore keeps up to 10 connections per client by default, more concurrent calls to one service only queue for a connection
+DEFAULT_MAX_CONCURRENCY_PER_SERVICE = 10
+DEFAULT_MAX_WORKERS = 64
+
+
+class AsyncAwsEngine:
+    """
+    Runs AWS API calls of the shared boto3 clients concurrently from asyncio code.
+
+    boto3 clients are blocking, so every call is run in a thread pool owned by the engine, while the coroutines
+    waiting for them stay on a single event loop. Calls to each service are bounded by a semaphore of their own,
+    so a burst of calls to one service neither exhausts its connection pool nor starves calls to other services.
+
+    Args:
+        max_concurrency_per_service: Maximum number of in-flight calls per service
+        service_concurrency: Per service overrides of max_concurrency_per_service, e.g. {'lakeformation': 4}
+        max_workers: Size of the thread pool running the calls
+    """
+    def __init__(self, max_concurrency_per_service=DEFAULT_MAX_CONCURRENCY_PER_SERVICE, service_concurrency=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        self.max_concurrency_per_service = max_concurrency_per_service
+        self.service_concurrency = service_concurrency or {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='async-aws')
+        self._semaphores = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(wait=True)
+        return False
+
+    def _semaphore(self, service_name):
+        # Semaphores are created lazily so they belong to the running event loop
+        if service_name not in self._semaphores:
+            limit = self.service_concurrency.get(service_name, self.max_concurrency_per_service)
+            self._semaphores[service_name] = asyncio.Semaphore(limit)
+        return self._semaphores[service_name]
+
+    async def run(self, service_name, function, *args, **kwargs):
+        """
+        Run a blocking function making calls to `service_name` in the thread pool, bounded by the service's semaphore,
+        in the migration phase of the calling coroutine
+        """
+        async with self._semaphore(service_name):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, in_current_phase(functools.partial(function, *args, **kwargs)))
+
+    def wrap(self, client):
+        return AsyncClient(client, self)
+
+    def run_until_complete(self, coroutine):
+        """
+        Run a coroutine to completion from synchronous code and shut the thread pool down
+        """
+        with self:
+            return asyncio.run(coroutine)
+
+
+class AsyncClient:
+    """
+    Async view of a boto3 client, `await client.get_table(...)` runs the call through the engine
+    """
+    def __init__(self, client, engine):
+        self.client = client
+        self.service_name = client.meta.service_model.service_name
+        self._engine = engine
+
+    def __getattr__(self, name):
+        operation = getattr(self.client, name)
+
+        async def call(**kwargs):
+            return await self._engine.run(self.service_name, operation, **kwargs)
+        return call
+
+    async def paginate(self, operation_name, result_key, input_token='NextToken', output_token='NextToken', **kwargs):
+        """
+        Async iterator over the items of every page of a paginated call, see migration.utils.pagination.paginate
+        """
+        operation = getattr(self, operation_name)
+        params = dict(kwargs)
+        while True:
+            response = await operation(**params)
+            for item in response.get(result_key, []):
+                yield item
+            if not response.get(output_token):
+                return
+            params[input_token] = response[output_token]
+
+
+async def gather_in_order(coroutines):
+    """
+    Await all coroutines concurrently and return their results in order, raising the first failure
+    once every coroutine has finished so no call is left running in the background
+    """
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
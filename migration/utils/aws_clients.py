@@ -0,0 +1,60 @@
+import threading
+
+import boto3
+from botocore.config import Config
+
+from migration.utils.instrumentation import instrument_client
+from migration.utils.rate_limiter import rate_limit_client, retry_config
+
+_client_pool = None
+_client_pool_max_connections = None
+_client_pool_lock = threading.Lock()
+
+
+def _new_client(service_name, session=None, region_name=None, max_pool_connections=None):
+    config = retry_config()
+    if max_pool_connections:
+        config = config.merge(Config(max_pool_connections=max_pool_connections))
+    if session is None:
+        client = boto3.client(service_name, region_name=region_name, config=config)
+    else:
+        client = session.client(service_name, region_name=region_name, config=config)
+    return rate_limit_client(instrument_client(client))
+
+
+def create_client(service_name, session=None, region_name=None, max_pool_connections=None):
+    """
+    Create a boto3 client with the hooks enabled for this run, such as AWS API call instrumentation and rate limiting,
+    and throttle-aware retries. All migration scripts create their clients through this function.
+
+    Once enable_client_pool is called, one client per service, region and session is shared by every caller instead.
+
+    Args:
+        max_pool_connections: Number of HTTP connections the client keeps, botocore keeps 10 by default, more concurrent
+            calls wait for a connection or open connections which are discarded after the call
+    """
+    if _client_pool is None:
+        return _new_client(service_name, session, region_name, max_pool_connections)
+    # Clients of different sessions may hold different credentials
+    key = (service_name, region_name or (session.region_name if session else None), session, max_pool_connections)
+    # Creating clients is not thread safe, the lock also covers the creation itself
+    with _client_pool_lock:
+        if key not in _client_pool:
+            _client_pool[key] = _new_client(service_name, session, region_name,
+                                            max(max_pool_connections or 0, _client_pool_max_connections))
+        return _client_pool[key]
+
+
+def enable_client_pool(max_pool_connections):
+    """
+    Share clients between the migration steps of a run, boto3 clients are thread safe.
+
+    Args:
+        max_pool_connections: Number of HTTP connections of the shared clients, enough for the concurrent calls of all
+            steps running at once
+    """
+    global _client_pool, _client_pool_max_connections
+    with _client_pool_lock:
+        if _client_pool is None:
+            _client_pool = {}
+            _client_pool_max_connections = max_pool_connections
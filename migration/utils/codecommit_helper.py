@@ -0,0 +1,84 @@
+import hashlib
+
+from migration.utils.instrumentation import phase
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+def git_blob_id(content):
+    """
+    Returns the git object id of a file content, which is the blob id CodeCommit reports for files with that content.
+    The content may be any bytes-like object, memory-mapped files are hashed without being copied.
+    """
+    blob_hash = hashlib.sha1(b'blob %d\0' % len(content))
+    blob_hash.update(content)
+    return blob_hash.hexdigest()
+
+
+@phase('repository content index')
+def list_repo_files(code_commit, repo, commit_id, folder_path=None):
+    """
+    Returns {path: blob id} of the files of a repository at a commit, only the files under `folder_path` if given.
+    The files are listed as the differences of the commit to an empty repository, a few paginated calls
+    instead of one get_folder call per folder.
+    """
+    params = {'repositoryName': repo, 'afterCommitSpecifier': commit_id}
+    if folder_path:
+        params['afterPath'] = folder_path
+    repo_files = {}
+    for page in code_commit.get_paginator('get_differences').paginate(**params):
+        for difference in page.get('differences', []):
+            after_blob = difference.get('afterBlob')
+            if after_blob:
+                repo_files[after_blob['path']] = after_blob['blobId']
+    return repo_files
+
+
+class DeduplicatedPutFiles:
+    """
+    Turns files to commit into CodeCommit putFiles entries, sending the content of each distinct file only once.
+
+    A file whose content already is in the repository is committed as a `sourceFile` copy of it, which CodeCommit
+    makes on the server side. A copy can only refer to a file of the parent commit, so files repeating the content of
+    another file of the same upload are returned separately in `copies`, to commit on top of the commit of `put_files`.
+    Files already in the repository with the same content are left out, CodeCommit rejects them as unchanged.
+
+    Args:
+        repo_files: {path: blob id} of the files of the parent commit, see list_repo_files
+    """
+    def __init__(self, repo_files=None):
+        repo_files = repo_files or {}
+        self._repo_files = repo_files
+        self._repo_paths = {blob_id: path for path, blob_id in sorted(repo_files.items())}
+        self._upload_paths = {}
+        self.put_files = []
+        self.copies = []
+        self.sent_bytes = 0
+        self.copied_bytes = 0
+        self.unchanged_files = 0
+
+    def add(self, file_path, content):
+        blob_id = git_blob_id(content)
+        if self._repo_files.get(file_path) == blob_id:
+            self.unchanged_files += 1
+        elif blob_id in self._repo_paths:
+            self.put_files.append(self._copy_entry(file_path, self._repo_paths[blob_id]))
+            self.copied_bytes += len(content)
+        elif blob_id in self._upload_paths:
+            self.copies.append(self._copy_entry(file_path, self._upload_paths[blob_id]))
+            self.copied_bytes += len(content)
+        else:
+            self._upload_paths[blob_id] = file_path
+            self.put_files.append({'filePath': file_path, 'fileContent': content})
+            self.sent_bytes += len(content)
+
+    @staticmethod
+    def _copy_entry(file_path, source_path):
+        logger.debug("Committing %s as a copy of %s", file_path, source_path)
+        return {'filePath': file_path, 'sourceFile': {'filePath': source_path, 'isMove': False}}
+
+    def log(self):
+        logger.info("Sending %d bytes of file content, %d bytes are committed as copies of identical files and %d files are unchanged",
+                    self.sent_bytes, self.copied_bytes, self.unchanged_files,
+                    extra={'fields': {'sent_bytes': self.sent_bytes, 'copied_bytes': self.copied_bytes, 'unchanged_files': self.unchanged_files}})
@@ -1,7 +1,17 @@
-import boto3
+import threading
 
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import phase
+from migration.utils.metadata_cache import cached_lookup
+
+_repo_locks = {}
+_repo_locks_lock = threading.Lock()
+
+
+@cached_lookup
+@phase('project repository lookup')
 def get_project_repo(domain_id, project_id, region):
-    datazone = boto3.client('datazone', region_name=region)
+    datazone = create_client('datazone', region_name=region)
 
     project_envs = datazone.list_environments(domainIdentifier=domain_id, projectIdentifier=project_id)
     tooling_env_info = next((env for env in project_envs['items'] if env['name'] == 'Tooling'), None)
@@ -13,4 +23,13 @@ def get_project_repo(domain_id, project_id, region):
         if repo_info:
             return repo_info['value']
 
-    raise Exception(f"Code repository not found for project {project_id} in domain {domain_id}")
\ No newline at end of file
+    raise Exception(f"Code repository not found for project {project_id} in domain {domain_id}")
+
+
+def project_repo_lock(repo):
+    """
+    Returns the lock to hold while committing to a project repository. A commit is based on the branch head read
+    before it, so migrations committing to the same repository concurrently must take turns.
+    """
+    with _repo_locks_lock:
+        return _repo_locks.setdefault(repo, threading.Lock())
@@ -7,6 +7,11 @@ import requests
 import os
 from urllib.parse import quote, urlencode
 
+from migration.utils.aws_clients import create_client
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
 
 def obtain_credential():
     # Use boto session to get back the credentials
@@ -76,7 +81,7 @@ def sign_request(method, service, host, region, canonical_uri, target, raw_data)
     if session_token is not None:
         headers['X-Amz-Security-Token'] = session_token
     else:
-        print("Session token is None")
+        logger.debug("Session token is None")
 
     return headers
 
@@ -97,10 +102,21 @@ def get_emr_workspace_storage_location(workspace_id, region):
     request_url = 'https://' + host + canonical_uri
     headers = sign_request(method, service, host, region, canonical_uri, target, raw_data)
 
-    print(f"Getting workspace storage location for workspace {workspace_id} in region {region}...")
+    logger.info("Getting workspace storage location for workspace %s in region %s...", workspace_id, region)
     response = requests.request(method, request_url, headers=headers, timeout=5, data=raw_data)
     response.raise_for_status()
-    print(f"Got workspace storage location for workspace {workspace_id} in region {region}.")
+    logger.info("Got workspace storage location for workspace %s in region %s.", workspace_id, region)
 
     response_json = response.json()
     return f"{response_json['Editor']['LocationUri']}/{workspace_id}/"
+
+
+def get_emr_studio_storage_location(studio_id, region):
+    """
+    Returns the S3 location of an EMR Studio, holding the files of each of its workspaces in a folder named after the workspace id
+    """
+    logger.info("Getting storage location of EMR Studio %s in region %s...", studio_id, region)
+    emr = create_client('emr', region_name=region)
+    location = emr.describe_studio(StudioId=studio_id)['Studio']['DefaultS3Location']
+    logger.info("Got storage location %s of EMR Studio %s.", location, studio_id)
+    return f"{location.rstrip('/')}/"
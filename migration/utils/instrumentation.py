@@ -0,0 +1,287 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import sys
+import threading
+import time
+
+from migration.utils.log import flush_logs, get_logger
+
+logger = get_logger(__name__)
+
+# Error codes AWS services use to signal throttling
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'SlowDown',
+    'RequestThrottled',
+    'PriorRequestNotComplete',
+}
+NO_PHASE = 'other'
+
+_recorder = None
+# Stack of the phases the running code is in. Work handed to another thread keeps the phases of the code handing it
+# over through in_current_phase, threads started without it are in no phase
+_phases = contextvars.ContextVar('migration_phases', default=())
+# Thread ident -> the phases of the thread's running code, mirrored from _phases on every run since the sampling
+# profiler reads it from another thread
+_thread_phases = {}
+
+
+class _OperationStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.latencies = []
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'throttles': self.throttles,
+            'total_seconds': round(sum(latencies), 3),
+            'p50_ms': _percentile_ms(latencies, 50),
+            'p90_ms': _percentile_ms(latencies, 90),
+            'p99_ms': _percentile_ms(latencies, 99),
+            'max_ms': _percentile_ms(latencies, 100),
+        }
+
+
+def _percentile_ms(sorted_latencies, percentile):
+    if not sorted_latencies:
+        return None
+    index = min(len(sorted_latencies) - 1, int(len(sorted_latencies) * percentile / 100))
+    return round(sorted_latencies[index] * 1000, 2)
+
+
+class ApiCallRecorder:
+    """
+    Records count, latency, retries and throttles of every AWS API call made by instrumented clients,
+    grouped by the migration phase the call was made in.
+    """
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self._stats = {}
+        self._phase_seconds = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, client):
+        events = client.meta.events
+        # Registered first so the start time is taken before any handler answering the call, e.g. a stub
+        events.register_first('before-call', self._before_call)
+        events.register('after-call', self._after_call)
+        events.register('after-call-error', self._after_call_error)
+        events.register('needs-retry', self._needs_retry)
+        return client
+
+    @property
+    def current_phase(self):
+        return current_phase()
+
+    def add_phase_time(self, name, start_time):
+        with self._lock:
+            self._phase_seconds[name] = self._phase_seconds.get(name, 0.0) + time.perf_counter() - start_time
+
+    def _before_call(self, model, context, **kwargs):
+        context['instrumentation_start_time'] = time.perf_counter()
+        context['instrumentation_phase'] = self.current_phase
+
+    def _after_call(self, model, parsed, context, **kwargs):
+        self._record(model, context, parsed)
+
+    def _after_call_error(self, model, context, **kwargs):
+        self._record(model, context, None)
+
+    def _record(self, model, context, parsed):
+        start_time = context.get('instrumentation_start_time')
+        latency = time.perf_counter() - start_time if start_time else 0.0
+        metadata = (parsed or {}).get('ResponseMetadata', {})
+        error_code = (parsed or {}).get('Error', {}).get('Code')
+        key = (context.get('instrumentation_phase', self.current_phase), f"{model.service_model.service_name}.{model.name}")
+        with self._lock:
+            stats = self._stats.setdefault(key, _OperationStats())
+            stats.calls += 1
+            stats.latencies.append(latency)
+            stats.retries += metadata.get('RetryAttempts', 0)
+            if parsed is None or error_code:
+                stats.errors += 1
+
+    def _needs_retry(self, response, operation, **kwargs):
+        # Called for every attempt, count the attempts which failed with a throttling error
+        if response is None:
+            return None
+        error_code = response[1].get('Error', {}).get('Code')
+        if error_code in THROTTLING_ERROR_CODES:
+            key = (self.current_phase, f"{operation.service_model.service_name}.{operation.name}")
+            with self._lock:
+                self._stats.setdefault(key, _OperationStats()).throttles += 1
+        return None
+
+    def report(self):
+        with self._lock:
+            phases = {}
+            for (phase_name, operation), stats in self._stats.items():
+                phase_report = phases.setdefault(phase_name, {'seconds': None, 'operations': {}})
+                phase_report['operations'][operation] = stats.to_dict()
+            for phase_name, seconds in self._phase_seconds.items():
+                phases.setdefault(phase_name, {'seconds': None, 'operations': {}})['seconds'] = round(seconds, 3)
+            total = _OperationStats()
+            for stats in self._stats.values():
+                total.calls += stats.calls
+                total.errors += stats.errors
+                total.retries += stats.retries
+                total.throttles += stats.throttles
+                total.latencies.extend(stats.latencies)
+        return {
+            'wall_seconds': round(time.perf_counter() - self.start_time, 3),
+            'total': total.to_dict(),
+            'phases': phases,
+        }
+
+    def print_summary(self, file=None):
+        file = file or sys.stdout
+        report = self.report()
+        total = report['total']
+        print(f"\nAWS API calls: {total['calls']} calls, {total['retries']} retries, {total['throttles']} throttles, "
+              f"{total['errors']} errors in {report['wall_seconds']}s", file=file)
+        print(f"{'phase / operation':<60} {'calls':>7} {'retries':>7} {'throttles':>9} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8}", file=file)
+        for phase_name, phase_report in report['phases'].items():
+            seconds = f" ({phase_report['seconds']}s)" if phase_report['seconds'] is not None else ''
+            print(f"{phase_name}{seconds}", file=file)
+            for operation, stats in phase_report['operations'].items():
+                print(f"  {operation:<58} {stats['calls']:>7} {stats['retries']:>7} {stats['throttles']:>9} "
+                      f"{stats['p50_ms']:>8} {stats['p99_ms']:>8} {stats['total_seconds']:>8}", file=file)
+
+    def write_report(self, path):
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        logger.info("Wrote AWS API call report to %s", path)
+
+
+def current_phase():
+    """
+    Returns the migration phase the running code is in
+    """
+    phases = _phases.get()
+    return phases[-1] if phases else NO_PHASE
+
+
+def phase_of_thread(thread_ident):
+    """
+    Returns the migration phase the thread with the given ident is currently in
+    """
+    phases = _thread_phases.get(thread_ident)
+    return phases[-1] if phases else NO_PHASE
+
+
+def _set_thread_phases(phases):
+    if phases:
+        _thread_phases[threading.get_ident()] = phases
+    else:
+        _thread_phases.pop(threading.get_ident(), None)
+
+
+def _run_in_phases(function, args, kwargs):
+    previous_phases = _thread_phases.get(threading.get_ident())
+    _set_thread_phases(_phases.get())
+    try:
+        return function(*args, **kwargs)
+    finally:
+        _set_thread_phases(previous_phases)
+
+
+def in_current_phase(function):
+    """
+    Returns `function` bound to the migration phase of the caller, to hand work over to a thread pool: the AWS API
+    calls it makes in the pool's threads are attributed to the phase it was handed over from
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, every call runs in its own copy
+        return context.copy().run(_run_in_phases, function, args, kwargs)
+    return run
+
+
+class phase(contextlib.ContextDecorator):
+    """
+    Attribute the AWS API calls made inside the block, or the decorated function, to a named migration phase
+    """
+    def __init__(self, name):
+        self.name = name
+        self._recorder = None
+        self._start_time = None
+        self._token = None
+
+    def _recreate_cm(self):
+        # A decorated function may run in several threads at once, give every call its own instance
+        return phase(self.name)
+
+    def __enter__(self):
+        phases = _phases.get() + (self.name,)
+        self._token = _phases.set(phases)
+        _set_thread_phases(phases)
+        self._recorder = _recorder
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _phases.reset(self._token)
+        _set_thread_phases(_phases.get())
+        if self._recorder:
+            self._recorder.add_phase_time(self.name, self._start_time)
+        return False
+
+
+def enable_instrumentation(report_path=None):
+    """
+    Start recording AWS API calls of clients created through migration.utils.aws_clients.create_client,
+    and print a summary, plus a JSON report if `report_path` is set, when the process exits.
+    """
+    global _recorder
+    if _recorder is None:
+        _recorder = ApiCallRecorder()
+
+        def report_at_exit():
+            # The summary is printed directly, write buffered log messages out first so they come before it
+            flush_logs()
+            _recorder.print_summary()
+            if report_path:
+                _recorder.write_report(report_path)
+
+        atexit.register(report_at_exit)
+    return _recorder
+
+
+def get_recorder():
+    return _recorder
+
+
+def instrument_client(client):
+    if _recorder:
+        _recorder.instrument(client)
+    return client
+
+
+def add_instrumentation_arguments(parser):
+    parser.add_argument('--api-report',
+                        nargs='?',
+                        const='',
+                        default=None,
+                        help='Print AWS API call counts, latencies, retries and throttles per migration phase at exit. '
+                             'If a file is given, also write the report to it as JSON')
+
+
+def enable_instrumentation_from_args(args):
+    if getattr(args, 'api_report', None) is not None:
+        enable_instrumentation(args.api_report or None)
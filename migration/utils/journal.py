@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class JournalInputsMismatchError(Exception):
+    """
+    Raised when a resumed run would skip a step the journal records as completed with other inputs
+    """
+
+
+class MigrationJournal:
+    """
+    Append-only JSON lines journal of the completed steps of a migration.
+
+    Every completed step is written as one line with its name, a key identifying what it was applied to,
+    the inputs it acted on and the data needed to redo or undo it. With `resume` the existing journal is loaded so
+    completed steps can be skipped, as long as they were completed with the same inputs; otherwise an existing journal
+    is moved aside and a new one is started.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._entries = {}
+        self._inputs = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            if resume:
+                self._load()
+                logger.info(f"Resuming from journal {path} with {len(self._entries)} completed steps")
+            else:
+                backup_path = f"{path}.{time.strftime('%Y%m%d%H%M%S')}"
+                os.replace(path, backup_path)
+                logger.info(f"Moved existing journal {path} to {backup_path}, pass --resume to continue a previous run instead")
+        elif resume:
+            logger.info(f"No journal found at {path}, starting from the beginning")
+        journal_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(journal_dir, exist_ok=True)
+
+    def _load(self):
+        complete_size = 0
+        last_line_valid = True
+        with open(self.path, 'rb') as journal_file:
+            for line in journal_file:
+                if line.endswith(b'\n'):
+                    complete_size = journal_file.tell()
+                try:
+                    entry = json.loads(line)
+                    last_line_valid = True
+                except ValueError:
+                    # The last line may be incomplete if the previous run was killed while writing it
+                    last_line_valid = False
+                    continue
+                self._entries[(entry['step'], entry['key'])] = entry.get('data', {})
+                self._inputs[(entry['step'], entry['key'])] = entry.get('inputs')
+        if os.path.getsize(self.path) > complete_size:
+            # The next entry would be appended to the unterminated last line and be unreadable
+            with open(self.path, 'r+b') as journal_file:
+                if last_line_valid:
+                    journal_file.seek(0, os.SEEK_END)
+                    journal_file.write(b'\n')
+                else:
+                    journal_file.truncate(complete_size)
+                    logger.info(f"Dropped the incomplete last entry of journal {self.path}")
+
+    def _check_inputs(self, step, key, inputs):
+        recorded_inputs = self._inputs.get((step, key))
+        # Inputs are compared as they are read back from the journal
+        if inputs is not None and recorded_inputs is not None and recorded_inputs != _as_json(inputs):
+            raise JournalInputsMismatchError(
+                f"Step `{step}` for `{key}` was completed with {recorded_inputs} according to journal {self.path}, "
+                f"not with {_as_json(inputs)}. Resume with the arguments of the run which wrote the journal, "
+                f"or start over without --resume")
+
+    def is_done(self, step, key, inputs=None):
+        """
+        Returns whether the step has been completed, raises JournalInputsMismatchError if it was completed with
+        other `inputs`
+        """
+        with self._lock:
+            if (step, key) not in self._entries:
+                return False
+            self._check_inputs(step, key, inputs)
+            return True
+
+    def get(self, step, key, inputs=None):
+        """
+        Returns the data recorded with a completed step, or None if the step has not been completed.
+        Raises JournalInputsMismatchError if it was completed with other `inputs`
+        """
+        with self._lock:
+            if (step, key) not in self._entries:
+                return None
+            self._check_inputs(step, key, inputs)
+            return self._entries[(step, key)]
+
+    def record(self, step, key, inputs=None, **data):
+        entry = {'step': step, 'key': key, 'time': time.time(), 'data': data}
+        if inputs is not None:
+            entry['inputs'] = inputs
+        with self._lock:
+            with open(self.path, 'a') as journal_file:
+                journal_file.write(json.dumps(entry, default=str) + '\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            self._entries[(step, key)] = data
+            self._inputs[(step, key)] = _as_json(inputs) if inputs is not None else None
+
+
+def _as_json(value):
+    return json.loads(json.dumps(value, default=str))
@@ -0,0 +1,242 @@
+import json
+import logging
+import sys
+import threading
+import time
+from pprint import pformat
+
+ROOT_LOGGER_NAME = 'migration'
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+LOG_FORMATS = ['text', 'json']
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_BUFFER_CAPACITY = 1000
+DEFAULT_PROGRESS_INTERVAL_SECONDS = 5.0
+
+
+def get_logger(name):
+    """
+    Returns the logger of a migration module, all of them are children of the `migration` logger
+    configured by configure_logging
+    """
+    if name == '__main__' or not name.startswith(ROOT_LOGGER_NAME):
+        name = f"{ROOT_LOGGER_NAME}.{name}"
+    return logging.getLogger(name)
+
+
+class lazy_pformat:
+    """
+    Pretty prints an object only when the log record is formatted, i.e. `logger.debug("%s", lazy_pformat(response))`
+    costs nothing while DEBUG is disabled
+    """
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return pformat(self.obj)
+
+
+class TextFormatter(logging.Formatter):
+    # Informational output reads like the plain script output, other levels are prefixed with their level name
+    def format(self, record):
+        message = super().format(record)
+        if record.levelno == logging.INFO:
+            return message
+        return f"{record.levelname}: {message}"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        # Structured fields passed with `extra={'fields': {...}}`, e.g. by ProgressReporter
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    Stream handler writing records in batches instead of flushing the stream after every record.
+
+    The buffer is written when it holds `capacity` records, for any record of level WARNING or above, when logging
+    shuts down at exit, and every `flush_interval` seconds by a daemon thread, so the last records before a long wait
+    are not held back until the next record.
+    """
+    def __init__(self, stream=None, capacity=DEFAULT_BUFFER_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS):
+        super().__init__(stream)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffer_start = None
+        self._closed = threading.Event()
+        self._flush_thread = threading.Thread(target=self._flush_periodically, name='log-flush', daemon=True)
+        self._flush_thread.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            if self._buffer:
+                self.flush()
+
+    def emit(self, record):
+        try:
+            self._buffer.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if self._buffer_start is None:
+            self._buffer_start = time.monotonic()
+        if (len(self._buffer) >= self.capacity or record.levelno >= logging.WARNING
+                or time.monotonic() - self._buffer_start >= self.flush_interval):
+            self._write_buffer()
+
+    def _write_buffer(self):
+        if self._buffer:
+            self.stream.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffer_start = None
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write_buffer()
+        finally:
+            self.release()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        super().close()
+
+
+class _StdoutProxy:
+    # Resolves sys.stdout on every write so redirections made after logging is configured are honoured
+    def write(self, data):
+        return sys.stdout.write(data)
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+def configure_logging(level='INFO', log_format='text', log_file=None):
+    """
+    Send the records of all migration loggers to stdout, or to `log_file`, through a buffered handler.
+
+    Args:
+        level: Minimum level of the records written, one of LOG_LEVELS
+        log_format: `text` for plain messages or `json` for one JSON object per line
+        log_file: File to append the records to instead of stdout
+    """
+    root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+    stream = open(log_file, 'a') if log_file else _StdoutProxy()
+    handler = BufferedStreamHandler(stream)
+    handler.setFormatter(JsonLinesFormatter() if log_format == 'json' else TextFormatter('%(message)s'))
+    root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+    root_logger.propagate = False
+    return root_logger
+
+
+def flush_logs():
+    """
+    Write the buffered records out, before output which does not go through logging such as a final report
+    """
+    for handler in logging.getLogger(ROOT_LOGGER_NAME).handlers:
+        handler.flush()
+
+
+def add_logging_arguments(parser):
+    parser.add_argument('--log-level',
+                        choices=LOG_LEVELS,
+                        default='INFO',
+                        help='Minimum level of the messages written. DEBUG adds the details of every processed item')
+    parser.add_argument('--log-format',
+                        choices=LOG_FORMATS,
+                        default='text',
+                        help='Write plain text messages, or one JSON object per line for log processing tools')
+    parser.add_argument('--log-file',
+                        required=False,
+                        help='Append the messages to this file instead of printing them')
+
+
+def configure_logging_from_args(args):
+    return configure_logging(getattr(args, 'log_level', 'INFO'), getattr(args, 'log_format', 'text'), getattr(args, 'log_file', None))
+
+
+# Configured with the defaults on import so messages of helpers used outside of a script's main are still shown
+if not logging.getLogger(ROOT_LOGGER_NAME).handlers:
+    configure_logging()
+
+
+class ProgressReporter:
+    """
+    Periodically logs the progress of a loop over many items as items done, items/sec and ETA.
+
+    Thread safe, `update` may be called from worker threads. A progress line is logged at most once every
+    `interval_seconds`, and a final line when the reporter is closed.
+
+    Args:
+        logger: Logger the progress lines are written to
+        description: What is being processed, e.g. 'Downloaded files'
+        total: Number of items if known in advance, enables the ETA
+        interval_seconds: Minimum time between two progress lines
+    """
+    def __init__(self, logger, description, total=None, interval_seconds=DEFAULT_PROGRESS_INTERVAL_SECONDS):
+        self.logger = logger
+        self.description = description
+        self.total = total
+        self.interval_seconds = interval_seconds
+        self.done = 0
+        self._start_time = time.monotonic()
+        self._last_report_time = self._start_time
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        return False
+
+    def update(self, count=1):
+        with self._lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self._last_report_time < self.interval_seconds:
+                return
+            self._last_report_time = now
+        self._report(now)
+
+    def close(self):
+        self._report(time.monotonic(), final=True)
+
+    def _report(self, now, final=False):
+        elapsed = max(now - self._start_time, 1e-9)
+        done = self.done
+        rate = done / elapsed
+        fields = {'progress': self.description, 'done': done, 'total': self.total,
+                  'items_per_second': round(rate, 2), 'elapsed_seconds': round(elapsed, 1)}
+        if final:
+            self.logger.info("%s: %d in %.1fs (%.1f/s)", self.description, done, elapsed, rate, extra={'fields': fields})
+        elif self.total:
+            eta = (self.total - done) / rate if rate else None
+            fields['eta_seconds'] = round(eta, 1) if eta is not None else None
+            self.logger.info("%s: %d/%d (%.1f/s, ETA %s)", self.description, done, self.total, rate,
+                             f"{eta:.0f}s" if eta is not None else 'unknown', extra={'fields': fields})
+        else:
+            self.logger.info("%s: %d (%.1f/s)", self.description, done, rate, extra={'fields': fields})
@@ -0,0 +1,54 @@
+import functools
+import threading
+
+
+class MetadataCache:
+    """
+    Thread safe cache of metadata lookups, such as the repository of a project.
+
+    Concurrent callers asking for the same key wait for the first lookup instead of repeating it. Failed lookups
+    are not cached.
+    """
+    def __init__(self):
+        self._values = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, lookup):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._values:
+                    return self._values[key]
+            value = lookup()
+            with self._lock:
+                self._values[key] = value
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._key_locks.clear()
+
+
+_metadata_cache = MetadataCache()
+
+
+def get_metadata_cache():
+    return _metadata_cache
+
+
+def cached_lookup(function):
+    """
+    Cache the results of a metadata lookup in the process-wide cache, keyed by the function and its arguments,
+    so the migration steps of a run resolve the same metadata only once. Only lookups of metadata the migration does not
+    change should be cached, such as the repository of a project, and not Lake Formation grants or IAM roles a step modifies.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (function.__module__, function.__qualname__, args, tuple(sorted(kwargs.items())))
+        return _metadata_cache.get(key, lambda: function(*args, **kwargs))
+    return wrapper
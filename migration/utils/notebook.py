@@ -0,0 +1,117 @@
+import json
+import os
+
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_OUTPUT_BYTES = 64 * 1024
+CHECKPOINTS_FOLDER = '.ipynb_checkpoints'
+# Kept for outputs over the limit when small enough, it is what a reader of the notebook sees without running it
+PLAIN_TEXT_MIME_TYPE = 'text/plain'
+
+
+def _text_size(value):
+    # Multiline notebook strings are stored either as one string or as a list of lines
+    if isinstance(value, list):
+        return sum(len(line) for line in value)
+    return len(value) if isinstance(value, str) else len(json.dumps(value))
+
+
+def _output_size(output):
+    size = _text_size(output.get('text', ''))
+    for value in output.get('data', {}).values():
+        size += _text_size(value)
+    return size
+
+
+def _removed_output(size):
+    return {'output_type': 'stream', 'name': 'stdout', 'text': [f"[Output of {size} bytes removed during migration]\n"]}
+
+
+def _slim_output(output, max_output_bytes):
+    size = _output_size(output)
+    if size <= max_output_bytes:
+        return output
+    if output.get('output_type') == 'stream':
+        text = output.get('text', '')
+        text = ''.join(text) if isinstance(text, list) else text
+        return dict(output, text=[text[:max_output_bytes], f"\n[Output truncated from {size} bytes during migration]\n"])
+    plain_text = output.get('data', {}).get(PLAIN_TEXT_MIME_TYPE)
+    if plain_text is not None and _text_size(plain_text) <= max_output_bytes:
+        # Drop the rich representations, e.g. base64 encoded plots or HTML tables, and keep the plain text one
+        return dict(output, data={PLAIN_TEXT_MIME_TYPE: plain_text})
+    return _removed_output(size)
+
+
+def slim_notebook(file_obj, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+    """
+    Truncate stream outputs and drop rich outputs of the cells of a notebook which are larger than `max_output_bytes`.
+
+    The notebook is parsed straight from the file object and every oversized output is replaced while walking the cells,
+    so the large output strings are released as soon as they are replaced.
+
+    Returns the slimmed notebook as bytes, formatted like nbformat writes notebooks, or None if no output exceeds
+    the limit, or if the file is not a JSON notebook, so the original content can be kept as is.
+    """
+    try:
+        notebook = json.load(file_obj)
+    except ValueError as e:
+        logger.warning("Not slimming %s, it is not a valid notebook: %s", getattr(file_obj, 'name', 'notebook'), e)
+        return None
+    changed = False
+    for cell in notebook.get('cells', []) if isinstance(notebook, dict) else []:
+        outputs = cell.get('outputs')
+        if not outputs:
+            continue
+        for index, output in enumerate(outputs):
+            slimmed_output = _slim_output(output, max_output_bytes)
+            if slimmed_output is not output:
+                outputs[index] = slimmed_output
+                changed = True
+    if not changed:
+        return None
+    return (json.dumps(notebook, sort_keys=True, indent=1, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class SlimmingStats:
+    """
+    Slims the notebooks of an upload and counts the bytes saved
+    """
+    def __init__(self):
+        self.original_bytes = 0
+        self.slimmed_bytes = 0
+        self.slimmed_notebooks = 0
+        self.dropped_files = 0
+
+    def read_notebook(self, path, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        """
+        Returns the content of a notebook file to commit, slimmed if any of its outputs is too large
+        """
+        with open(path, mode='rb') as file_obj:
+            content = slim_notebook(file_obj, max_output_bytes)
+            original_size = os.fstat(file_obj.fileno()).st_size
+            if content is None:
+                file_obj.seek(0)
+                content = file_obj.read()
+            else:
+                self.slimmed_notebooks += 1
+                logger.debug("Slimmed %s from %d to %d bytes", path, original_size, len(content))
+        self.original_bytes += original_size
+        self.slimmed_bytes += len(content)
+        return content
+
+    def drop_folder(self, path):
+        for (root, _, files) in os.walk(path):
+            for file in files:
+                self.original_bytes += os.path.getsize(os.path.join(root, file))
+                self.dropped_files += 1
+        logger.debug("Dropped folder %s", path)
+
+    def log(self):
+        saved = self.original_bytes - self.slimmed_bytes
+        percent = 100.0 * saved / self.original_bytes if self.original_bytes else 0.0
+        logger.info("Slimmed %d notebooks and dropped %d checkpoint files, saving %d of %d bytes (%.1f%%)",
+                    self.slimmed_notebooks, self.dropped_files, saved, self.original_bytes, percent,
+                    extra={'fields': {'slimmed_notebooks': self.slimmed_notebooks, 'dropped_files': self.dropped_files,
+                                      'original_bytes': self.original_bytes, 'saved_bytes': saved}})
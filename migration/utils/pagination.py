@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from migration.utils.instrumentation import in_current_phase
+
+
+def paginate(operation, result_key, input_token='NextToken', output_token='NextToken', prefetch=True, **kwargs):
+    """
+    Iterate over the items of every page of a paginated AWS API call, for APIs which have no boto3 paginator
+    such as most Lake Formation list calls.
+
+    The same request parameters are sent with every page. With `prefetch` enabled the next page is requested
+    in the background while the items of the current page are being consumed.
+
+    Args:
+        operation: Client method to call, e.g. lakeformation.list_resources
+        result_key: Response key holding the items of a page
+        input_token: Request parameter carrying the pagination token
+        output_token: Response key carrying the pagination token
+        prefetch: Fetch the next page while the current one is consumed
+        **kwargs: Request parameters of the call
+    """
+    def fetch(token):
+        params = dict(kwargs)
+        if token:
+            params[input_token] = token
+        return operation(**params)
+
+    if not prefetch:
+        response = fetch(None)
+        while True:
+            yield from response.get(result_key, [])
+            if not response.get(output_token):
+                return
+            response = fetch(response[output_token])
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        response = fetch(None)
+        while True:
+            # The next page is fetched in the phase the current one is consumed in
+            next_page = executor.submit(in_current_phase(fetch), response[output_token]) if response.get(output_token) else None
+            yield from response.get(result_key, [])
+            if next_page is None:
+                return
+            response = next_page.result()
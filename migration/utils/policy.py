@@ -0,0 +1,87 @@
+import copy
+import json
+
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# IAM quotas on policy sizes, in characters not counting whitespace.
+# See https://docs.aws.amazon.com/IAM/latest/UserGuide/reference_iam-quotas.html
+TRUST_POLICY_MAX_CHARACTERS = 2048  # Default quota, can be raised up to 4096
+MANAGED_POLICY_MAX_CHARACTERS = 6144
+INLINE_ROLE_POLICIES_MAX_CHARACTERS = 10240  # All inline policies of a role together
+# Statement elements whose values are matched case-insensitively by IAM
+CASE_INSENSITIVE_VALUE_ELEMENTS = {'action', 'notaction'}
+
+
+def _canonical_item(item, lowercase=False):
+    if isinstance(item, dict):
+        return frozenset((key.lower(), _canonical_value(value)) for key, value in item.items())
+    if isinstance(item, str) and lowercase:
+        return item.lower()
+    return item
+
+
+def _canonical_value(value, lowercase=False):
+    # A single value and a list holding only that value mean the same, both become a frozenset of canonical items
+    items = value if isinstance(value, list) else [value]
+    return frozenset(_canonical_item(item, lowercase) for item in items)
+
+
+def statement_key(statement):
+    """
+    Returns a hashable canonical form of a policy statement. Statements meaning the same have the same key
+    regardless of element order, element name case, scalar-vs-list values, duplicate values, the case of actions,
+    and `"Principal": "*"` vs `"Principal": {"AWS": "*"}`.
+    """
+    elements = []
+    for name, value in statement.items():
+        name = name.lower()
+        if name in ('principal', 'notprincipal') and value == '*':
+            value = {'AWS': '*'}
+        elements.append((name, _canonical_value(value, lowercase=name in CASE_INSENSITIVE_VALUE_ELEMENTS)))
+    return frozenset(elements)
+
+
+def policy_statements(policy_document):
+    """
+    Returns the statements of a policy document as a list, `Statement` may also hold a single statement
+    """
+    statements = policy_document.get('Statement', [])
+    return [statements] if isinstance(statements, dict) else list(statements)
+
+
+def merge_policy_documents(base_document, *other_documents):
+    """
+    Returns a new policy document with the statements of `base_document` followed by the statements of the other
+    documents which are not already in it. The given documents are left unchanged.
+    """
+    merged_document = copy.deepcopy(base_document)
+    statements = []
+    seen = set()
+    for document in (merged_document,) + other_documents:
+        for statement in policy_statements(document):
+            key = statement_key(statement)
+            if key not in seen:
+                seen.add(key)
+                statements.append(statement if document is merged_document else copy.deepcopy(statement))
+    merged_document['Statement'] = statements
+    return merged_document
+
+
+def policy_size(policy_document):
+    """
+    Returns the size of a policy document as IAM counts it against its quotas, i.e. without whitespace
+    """
+    return len(json.dumps(policy_document, separators=(',', ':')))
+
+
+def check_policy_size(size, max_characters, description):
+    """
+    Log a warning if a policy, or the policies of a role together, exceed an IAM size quota. Returns whether it fits.
+    """
+    if size > max_characters:
+        logger.warning("%s is %d characters, more than the IAM quota of %d. IAM will reject it, "
+                       "reduce its statements or request a quota increase if the quota is adjustable.", description, size, max_characters)
+        return False
+    return True
@@ -0,0 +1,185 @@
+import atexit
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from migration.utils.instrumentation import phase_of_thread
+from migration.utils.log import flush_logs, get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005
+
+_profiler = None
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler. Every `interval_seconds` the stacks of all threads are sampled, whether they run,
+    wait for a lock or wait for an AWS API call, and counted under the migration phase each thread is in.
+
+    The samples are written in the collapsed stack format read by flamegraph.pl, speedscope and similar tools:
+    one `phase;outermost frame;...;innermost frame count` line per distinct stack.
+    """
+    def __init__(self, interval_seconds=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.samples = 0
+        self._stacks = Counter()
+        # Frame names are cached per code object, formatting them on every sample would dominate the sampling cost
+        self._frame_names = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            for thread_ident, frame in sys._current_frames().items():
+                if thread_ident != own_ident:
+                    self._stacks[(phase_of_thread(thread_ident),) + self._stack(frame)] += 1
+            self.samples += 1
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            name = self._frame_names.get(code)
+            if name is None:
+                name = self._frame_names[code] = _frame_name(code)
+            stack.append(name)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as collapsed_file:
+            for stack, count in sorted(self._stacks.items()):
+                collapsed_file.write(f"{';'.join(name.replace(';', ':') for name in stack)} {count}\n")
+
+
+class RunProfiler:
+    """
+    Profiles a whole migration run with cProfile, for exact call counts and CPU time, and a StackSampler, for where
+    the wall-clock time of every thread goes per migration phase.
+
+    cProfile only profiles the thread enabling it, so every thread started during the run, like the worker threads of
+    the AWS calls, enables its own profile when it starts. The profiles are merged into one file at the end of the run.
+    Threads already running when profiling starts are only covered by the stack samples.
+
+    Args:
+        output_prefix: Path prefix of the files written, `<prefix>.pstats` and `<prefix>.collapsed`
+        interval_seconds: Time between two stack samples
+    """
+    def __init__(self, output_prefix, interval_seconds=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        self.output_prefix = output_prefix
+        self._profile = cProfile.Profile()
+        self._thread_profiles = []
+        self._thread_profiles_lock = threading.Lock()
+        self._sampler = StackSampler(interval_seconds)
+        self._start_time = None
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        self._sampler.start()
+        threading.setprofile(self._profile_thread)
+        self._profile.enable()
+        return self
+
+    def _profile_thread(self, frame, event, arg):
+        # Called on the first event of every new thread, enabling the thread's profile replaces this hook in the thread
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profilers use sys.monitoring, which allows a single active profiler per process
+            sys.setprofile(None)
+            return
+        with self._thread_profiles_lock:
+            self._thread_profiles.append(profile)
+
+    def _merged_stats(self):
+        stats = pstats.Stats(self._profile)
+        with self._thread_profiles_lock:
+            thread_profiles = list(self._thread_profiles)
+        for profile in thread_profiles:
+            # Threads still running at exit are merged with the calls they made so far
+            profile.disable()
+            profile.create_stats()
+            if profile.stats:
+                stats.add(profile)
+        return stats, len(thread_profiles)
+
+    def stop(self):
+        self._profile.disable()
+        threading.setprofile(None)
+        self._sampler.stop()
+        wall_seconds = time.perf_counter() - self._start_time
+        directory = os.path.dirname(self.output_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats, thread_count = self._merged_stats()
+        stats.dump_stats(f"{self.output_prefix}.pstats")
+        self._sampler.write_collapsed(f"{self.output_prefix}.collapsed")
+        logger.info("Wrote profile of %.1fs run to %s.pstats (cProfile, main thread and %d threads started during the run) "
+                    "and %s.collapsed (%d stack samples, all threads)",
+                    wall_seconds, self.output_prefix, thread_count, self.output_prefix, self._sampler.samples)
+
+
+def _default_output_prefix(api_report_path):
+    # Profiles are written next to the API call report of the run, if any
+    if api_report_path:
+        return os.path.splitext(api_report_path)[0] + '_profile'
+    return f"migration_profile_{time.strftime('%Y%m%d-%H%M%S')}"
+
+
+def enable_profiling(output_prefix, interval_seconds=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+    """
+    Profile the rest of the run and write the profiles when the process exits
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = RunProfiler(output_prefix, interval_seconds).start()
+
+        def write_at_exit():
+            _profiler.stop()
+            flush_logs()
+
+        atexit.register(write_at_exit)
+    return _profiler
+
+
+def add_profiling_arguments(parser):
+    parser.add_argument('--profile',
+                        nargs='?',
+                        const='',
+                        default=None,
+                        metavar='PREFIX',
+                        help='Profile the run and write <PREFIX>.pstats, cProfile stats of the main thread and of the threads '
+                             'started during the run readable with pstats or snakeviz, and '
+                             '<PREFIX>.collapsed, wall-clock stack samples per migration phase for flame graph tools. '
+                             'PREFIX defaults to the name of the report file of the run, or to migration_profile_<time>')
+    parser.add_argument('--profile-interval-ms',
+                        type=float,
+                        default=DEFAULT_SAMPLE_INTERVAL_SECONDS * 1000,
+                        help='Time between two stack samples of --profile')
+
+
+def enable_profiling_from_args(args, report_path=None):
+    if getattr(args, 'profile', None) is not None:
+        output_prefix = args.profile or _default_output_prefix(report_path or getattr(args, 'api_report', None))
+        enable_profiling(output_prefix, getattr(args, 'profile_interval_ms', DEFAULT_SAMPLE_INTERVAL_SECONDS * 1000) / 1000)
@@ -0,0 +1,232 @@
+import threading
+import time
+
+from botocore.config import Config
+
+from migration.utils.instrumentation import THROTTLING_ERROR_CODES
+
+# Default calls per second of read and write operations, per operation. IAM and Lake Formation writes have low quotas.
+DEFAULT_READ_CALLS_PER_SECOND = 50.0
+DEFAULT_WRITE_CALLS_PER_SECOND = 20.0
+SERVICE_CALLS_PER_SECOND = {
+    'iam': (20.0, 10.0),
+    'lakeformation': (50.0, 20.0),
+    'datazone': (50.0, 20.0),
+    'sagemaker': (20.0, 10.0),
+    'athena': (20.0, 10.0),
+    'codecommit': (20.0, 5.0),
+}
+# S3 scales per prefix far beyond what the scripts can send, it is not limited by default
+UNLIMITED_SERVICES = {'s3'}
+WRITE_OPERATION_PREFIXES = ('Create', 'Update', 'Delete', 'Put', 'Attach', 'Detach', 'Grant', 'Revoke', 'Tag', 'Untag',
+                            'Associate', 'Disassociate', 'Register', 'Deregister')
+# Adaptive rate adjustment: until the first throttle the rate doubles about every second, like TCP slow start.
+# Afterwards it is halved on a throttle and grows by about one call per second every second.
+THROTTLE_DECREASE_FACTOR = 0.5
+THROTTLE_COOLDOWN_SECONDS = 1.0
+MIN_CALLS_PER_SECOND = 0.5
+MAX_RATE_MULTIPLIER = 4.0
+DEFAULT_MAX_ATTEMPTS = 10
+
+_rate_limiter = None
+_max_attempts = DEFAULT_MAX_ATTEMPTS
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket allowing `rate` calls per second with bursts up to `capacity` calls.
+
+    The rate adapts AIMD style between `min_rate` and `max_rate`: `on_throttle` cuts it multiplicatively, at most once
+    per cooldown so a burst of throttles from concurrent calls counts once, and `on_success` raises it additively.
+    Until the first throttle every success raises the rate by one call per second, to find the limit quickly.
+    """
+    def __init__(self, rate, capacity=None, min_rate=None, max_rate=None):
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self.min_rate = min_rate if min_rate else min(rate, MIN_CALLS_PER_SECOND)
+        self.max_rate = max_rate if max_rate else rate
+        self.throttles = 0
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._last_throttle = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            self.throttles += 1
+            if self._last_throttle is not None and now - self._last_throttle < THROTTLE_COOLDOWN_SECONDS:
+                return
+            self._last_throttle = now
+            self.rate = max(self.min_rate, self.rate * THROTTLE_DECREASE_FACTOR)
+            # Drop the accumulated burst as well, it is what got throttled
+            self._tokens = min(self._tokens, 1.0)
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                increase = 1.0 if self._last_throttle is None else 1.0 / self.rate
+                self.rate = min(self.max_rate, self.rate + increase)
+
+
+def _default_calls_per_second(service_name, operation_name):
+    if service_name in UNLIMITED_SERVICES:
+        return None
+    read_rate, write_rate = SERVICE_CALLS_PER_SECOND.get(service_name, (DEFAULT_READ_CALLS_PER_SECOND, DEFAULT_WRITE_CALLS_PER_SECOND))
+    return write_rate if operation_name.startswith(WRITE_OPERATION_PREFIXES) else read_rate
+
+
+class RateLimiter:
+    """
+    Per API rate limiter for boto3 clients. Every operation of every attached client gets its own token bucket,
+    so concurrent workers can share clients without exceeding the rate of any single API.
+
+    The rate of an operation is the first of
+        1. `overrides['<service>.<Operation>']`, e.g. {'lakeformation.GrantPermissions': 2}
+        2. `overrides['<service>']`
+        3. `calls_per_second`, if set
+        4. the read or write default of the service, see SERVICE_CALLS_PER_SECOND
+    A rate of 0 or None leaves the operation unlimited. Starting from that rate, each bucket backs off when its calls
+    are throttled and speeds up again, up to MAX_RATE_MULTIPLIER times the configured rate, while calls succeed.
+    """
+    def __init__(self, calls_per_second=None, overrides=None, adaptive=True):
+        self.calls_per_second = calls_per_second
+        self.overrides = overrides or {}
+        self.adaptive = adaptive
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def operation_calls_per_second(self, service_name, operation_name):
+        """
+        Returns the configured starting calls per second of an operation, None if it is not limited
+        """
+        for key in (f"{service_name}.{operation_name}", service_name):
+            if key in self.overrides:
+                return self.overrides[key]
+        if self.calls_per_second:
+            return self.calls_per_second
+        return _default_calls_per_second(service_name, operation_name)
+
+    def bucket(self, service_name, operation_name):
+        key = (service_name, operation_name)
+        with self._lock:
+            if key not in self._buckets:
+                rate = self.operation_calls_per_second(service_name, operation_name)
+                max_rate = rate * MAX_RATE_MULTIPLIER if self.adaptive and rate else rate
+                self._buckets[key] = TokenBucket(rate, max_rate=max_rate) if rate else None
+            return self._buckets[key]
+
+    def acquire(self, service_name, operation_name):
+        bucket = self.bucket(service_name, operation_name)
+        if bucket:
+            bucket.acquire()
+
+    def attach(self, client):
+        events = client.meta.events
+        events.register('before-parameter-build', self._before_parameter_build)
+        if self.adaptive:
+            events.register('needs-retry', self._needs_retry)
+            events.register('after-call', self._after_call)
+        return client
+
+    def current_rates(self):
+        """
+        Returns the current calls per second of every limited operation used so far, keyed by `<service>.<Operation>`
+        """
+        with self._lock:
+            return {f"{service}.{operation}": round(bucket.rate, 2) for (service, operation), bucket in self._buckets.items() if bucket}
+
+    def _before_parameter_build(self, model, **kwargs):
+        self.acquire(model.service_model.service_name, model.name)
+
+    def _needs_retry(self, response, operation, **kwargs):
+        # Called for every attempt, back off on attempts which failed with a throttling error
+        if response is None:
+            return None
+        if response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+            bucket = self.bucket(operation.service_model.service_name, operation.name)
+            if bucket:
+                bucket.on_throttle()
+        return None
+
+    def _after_call(self, model, http_response, **kwargs):
+        if http_response is not None and http_response.status_code < 400:
+            bucket = self.bucket(model.service_model.service_name, model.name)
+            if bucket:
+                bucket.on_success()
+
+
+def enable_rate_limiting(calls_per_second=None, overrides=None, adaptive=True, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Rate limit every client created afterwards through migration.utils.aws_clients.create_client with one process-wide limiter,
+    and retry their calls up to `max_attempts` times
+    """
+    global _rate_limiter, _max_attempts
+    _rate_limiter = RateLimiter(calls_per_second, overrides, adaptive)
+    _max_attempts = max_attempts
+    return _rate_limiter
+
+
+def get_rate_limiter():
+    return _rate_limiter
+
+
+def retry_config():
+    # Standard retry mode backs off exponentially with jitter on throttling and transient errors
+    return Config(retries={'mode': 'standard', 'max_attempts': _max_attempts})
+
+
+def rate_limit_client(client):
+    if _rate_limiter:
+        _rate_limiter.attach(client)
+    return client
+
+
+def _parse_rate_override(value):
+    key, separator, rate = value.partition('=')
+    if not separator:
+        raise ValueError(f"Expected <service>[.<Operation>]=<calls per second>, got {value}")
+    return key, float(rate)
+
+
+def add_rate_limit_arguments(parser, default_calls_per_second=None):
+    parser.add_argument('--max-api-calls-per-second',
+                        type=float,
+                        default=default_calls_per_second,
+                        help='Starting calls per second of every AWS API. Defaults to per service read and write rates, '
+                             'lower for IAM and Lake Formation writes')
+    parser.add_argument('--rate-limit',
+                        type=_parse_rate_override,
+                        action='append',
+                        default=[],
+                        metavar='SERVICE[.Operation]=RATE',
+                        help='Starting calls per second of one service or operation, e.g. lakeformation.GrantPermissions=2. '
+                             'A rate of 0 disables limiting. Can be repeated')
+    parser.add_argument('--no-adaptive-rate-limit',
+                        dest='adaptive_rate_limit',
+                        action='store_false',
+                        default=True,
+                        help='Keep the configured rates instead of backing off on throttles and speeding up while calls succeed')
+    parser.add_argument('--max-api-attempts',
+                        type=int,
+                        default=DEFAULT_MAX_ATTEMPTS,
+                        help='Attempts per AWS API call, throttled and transient failures are retried with exponential backoff')
+
+
+def enable_rate_limiting_from_args(args):
+    return enable_rate_limiting(getattr(args, 'max_api_calls_per_second', None),
+                                dict(getattr(args, 'rate_limit', [])),
+                                getattr(args, 'adaptive_rate_limit', True),
+                                getattr(args, 'max_api_attempts', DEFAULT_MAX_ATTEMPTS))
@@ -0,0 +1,307 @@
+import abc
+import mmap
+import os
+import subprocess
+import tempfile
+import time
+
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.codecommit_helper import DeduplicatedPutFiles, list_repo_files
+from migration.utils.datazone_helper import get_project_repo, project_repo_lock
+from migration.utils.instrumentation import phase
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+API_BACKEND = 'api'
+GIT_BACKEND = 'git'
+REPOSITORY_BACKENDS = (API_BACKEND, GIT_BACKEND)
+DEFAULT_BRANCH = 'main'
+COMMIT_AUTHOR_NAME = 'SageMaker Unified Studio migration'
+COMMIT_AUTHOR_EMAIL = 'migration@localhost'
+# Files from this size are memory-mapped by read_file
+MMAP_MIN_BYTES = 1024 * 1024
+
+
+def read_file(path):
+    """
+    Returns the content of a local file to commit: bytes, or a read-only memory map for files of at least MMAP_MIN_BYTES,
+    which the backends hash, base64 encode or write to git from the page cache instead of a copy of the file in memory.
+    Every memory map holds a file descriptor until it is closed, see close_file_contents.
+    """
+    with open(path, mode='rb') as file_obj:
+        if os.fstat(file_obj.fileno()).st_size < MMAP_MIN_BYTES:
+            return file_obj.read()
+        return mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def close_file_contents(files):
+    """
+    Close the memory maps of (path, content) files read by read_file
+    """
+    for _, content in files:
+        if isinstance(content, mmap.mmap):
+            content.close()
+
+
+class RepositoryBackend(abc.ABC):
+    """
+    Writes migrated files to a project repository, as one commit on top of the head of `branch`, and reads them back.
+
+    Args:
+        repo: Name of the repository, commits to the same repository are serialized within the process
+        branch: Branch to commit to
+    """
+    def __init__(self, repo, branch=DEFAULT_BRANCH):
+        self.repo = repo
+        self.branch = branch
+
+    @abc.abstractmethod
+    def commit_files(self, files, message, index_folder=None):
+        """
+        Commit files to the branch.
+
+        Args:
+            files: Iterable of (path in the repository, content bytes or bytes-like object, see read_file)
+            message: Commit message
+            index_folder: Folder of the repository holding earlier migrated files which new files may be identical to
+
+        Returns the id of the last commit made, or None if all files are already in the repository with the same content.
+        """
+
+    @abc.abstractmethod
+    def list_files(self, folder_path):
+        """
+        Returns {path: git blob id} of the files under `folder_path` at the head of the branch, see codecommit_helper.git_blob_id
+        """
+
+    @abc.abstractmethod
+    def read_files(self, folder_path):
+        """
+        Returns {path: content bytes} of the files under `folder_path` at the head of the branch
+        """
+
+
+class CodeCommitApiBackend(RepositoryBackend):
+    """
+    Commits through the CodeCommit CreateCommit API, sending the content of each distinct file only once,
+    see DeduplicatedPutFiles
+    """
+    def __init__(self, repo, region, branch=DEFAULT_BRANCH):
+        super().__init__(repo, branch)
+        self.region = region
+
+    def commit_files(self, files, message, index_folder=None):
+        code_commit = create_client('codecommit', region_name=self.region)
+        with project_repo_lock(self.repo):
+            parent_commit_id = code_commit.get_branch(repositoryName=self.repo, branchName=self.branch).get("branch").get("commitId")
+            repo_files = list_repo_files(code_commit, self.repo, parent_commit_id, index_folder) if index_folder else {}
+            put_files = DeduplicatedPutFiles(repo_files)
+            for file_path, content in files:
+                put_files.add(file_path, content)
+            put_files.log()
+            commit_id = None
+            # Copies of files of this commit can only be made once they are in a parent commit
+            for put_files_list in (put_files.put_files, put_files.copies):
+                if not put_files_list:
+                    continue
+                commit_id = code_commit.create_commit(
+                    repositoryName=self.repo,
+                    branchName=self.branch,
+                    parentCommitId=parent_commit_id,
+                    commitMessage=message,
+                    putFiles=put_files_list
+                )['commitId']
+                parent_commit_id = commit_id
+        return commit_id
+
+    def _head_files(self, code_commit, folder_path):
+        branch = code_commit.get_branch(repositoryName=self.repo, branchName=self.branch).get("branch")
+        return list_repo_files(code_commit, self.repo, branch.get("commitId"), folder_path)
+
+    def list_files(self, folder_path):
+        return self._head_files(create_client('codecommit', region_name=self.region), folder_path)
+
+    @phase('repository read')
+    def read_files(self, folder_path):
+        code_commit = create_client('codecommit', region_name=self.region)
+        repo_files = self._head_files(code_commit, folder_path)
+        engine = AsyncAwsEngine()
+
+        async def read_blobs():
+            async_code_commit = engine.wrap(code_commit)
+            # Identical files are read once
+            blob_ids = sorted(set(repo_files.values()))
+            responses = await gather_in_order(async_code_commit.get_blob(repositoryName=self.repo, blobId=blob_id) for blob_id in blob_ids)
+            return {blob_id: response['content'] for blob_id, response in zip(blob_ids, responses)}
+
+        contents = engine.run_until_complete(read_blobs())
+        return {path: contents[blob_id] for path, blob_id in repo_files.items()}
+
+
+def _quote_path(path):
+    # fast-import reads a path up to the end of the line, paths with a newline or a leading quote must be C-style quoted
+    if '\n' in path or path.startswith('"'):
+        return '"' + path.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return path
+
+
+class GitBackend(RepositoryBackend):
+    """
+    Commits with git: the head of the branch is fetched without file contents into a temporary bare repository,
+    the files are written as one commit by a single `git fast-import`, and the commit is pushed as one packfile.
+    There is no limit on the number or size of the files of the commit other than the limits of the remote.
+
+    Works with any git remote the local git can push to, a local bare repository included. CodeCommit repositories
+    are reached through git-remote-codecommit (`pip install git-remote-codecommit`), see codecommit_remote_url.
+
+    Args:
+        remote_url: URL or path of the remote repository
+        repo: Name used to serialize commits to the repository within the process, defaults to `remote_url`
+        branch: Branch to commit to
+    """
+    def __init__(self, remote_url, repo=None, branch=DEFAULT_BRANCH):
+        super().__init__(repo or remote_url, branch)
+        self.remote_url = remote_url
+
+    def commit_files(self, files, message, index_folder=None):
+        # Git stores identical contents once, `index_folder` is not needed to deduplicate them
+        with project_repo_lock(self.repo), tempfile.TemporaryDirectory(prefix='migration-git-') as git_dir:
+            self._git(git_dir, 'init', '--quiet', '--bare')
+            parent_commit_id = self._fetch_branch(git_dir)
+            commit_id = self._fast_import(git_dir, files, message, parent_commit_id)
+            if parent_commit_id and self._tree(git_dir, commit_id) == self._tree(git_dir, parent_commit_id):
+                logger.info("All files are already in %s with the same content, nothing to push", self.repo)
+                return None
+            self._push(git_dir, commit_id)
+        return commit_id
+
+    def _git(self, git_dir, *args, stdin=None, binary=False):
+        result = subprocess.run(['git', '--git-dir', git_dir, *args], input=stdin, capture_output=True,
+                                env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+        if result.returncode != 0:
+            raise Exception(f"git {args[0]} failed for {self.repo}: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout if binary else result.stdout.decode().strip()
+
+    @phase('git fetch')
+    def _fetch_branch(self, git_dir, with_blobs=False):
+        ref = f'refs/heads/{self.branch}'
+        heads = self._git(git_dir, 'ls-remote', self.remote_url, ref)
+        if not heads:
+            logger.info("Branch %s does not exist in %s yet, it will be created", self.branch, self.repo)
+            return None
+        # Only the trees of the head commit are needed to add files to it, remotes without partial clone support send it all
+        blob_filter = [] if with_blobs else ['--filter=blob:none']
+        self._git(git_dir, 'fetch', '--quiet', '--depth=1', *blob_filter, self.remote_url, ref)
+        return heads.split()[0]
+
+    def _head_files(self, git_dir, folder_path, with_blobs=False):
+        self._git(git_dir, 'init', '--quiet', '--bare')
+        commit_id = self._fetch_branch(git_dir, with_blobs)
+        if not commit_id:
+            return {}
+        repo_files = {}
+        # `<mode> <type> <object id>\t<path>` lines, -z keeps paths unquoted
+        for entry in self._git(git_dir, 'ls-tree', '-r', '-z', commit_id, '--', folder_path).split('\0'):
+            if entry:
+                info, path = entry.split('\t', 1)
+                _, object_type, object_id = info.split()
+                if object_type == 'blob':
+                    repo_files[path] = object_id
+        return repo_files
+
+    def list_files(self, folder_path):
+        with tempfile.TemporaryDirectory(prefix='migration-git-') as git_dir:
+            return self._head_files(git_dir, folder_path)
+
+    @phase('repository read')
+    def read_files(self, folder_path):
+        with tempfile.TemporaryDirectory(prefix='migration-git-') as git_dir:
+            repo_files = self._head_files(git_dir, folder_path, with_blobs=True)
+            blob_ids = sorted(set(repo_files.values()))
+            # One `git cat-file` reads all blobs, each answered as `<id> blob <size>\n<content>\n`
+            output = self._git(git_dir, 'cat-file', '--batch', stdin=''.join(f"{blob_id}\n" for blob_id in blob_ids).encode(), binary=True)
+        contents = {}
+        position = 0
+        for blob_id in blob_ids:
+            header_end = output.index(b'\n', position)
+            size = int(output[position:header_end].split()[2])
+            contents[blob_id] = output[header_end + 1:header_end + 1 + size]
+            position = header_end + 1 + size + 1
+        return {path: contents[blob_id] for path, blob_id in repo_files.items()}
+
+    @phase('git commit')
+    def _fast_import(self, git_dir, files, message, parent_commit_id):
+        process = subprocess.Popen(['git', '--git-dir', git_dir, 'fast-import', '--quiet', '--done'],
+                                   stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            identity = f"{COMMIT_AUTHOR_NAME} <{COMMIT_AUTHOR_EMAIL}> {int(time.time())} +0000"
+            message = message.encode()
+            process.stdin.write(f"commit refs/heads/{self.branch}\nauthor {identity}\ncommitter {identity}\n"
+                                f"data {len(message)}\n".encode() + message + b"\n")
+            if parent_commit_id:
+                process.stdin.write(f"from {parent_commit_id}\n".encode())
+            file_count = 0
+            for file_path, content in files:
+                process.stdin.write(f"M 100644 inline {_quote_path(file_path)}\ndata {len(content)}\n".encode())
+                # Written on its own, not concatenated, large contents are not copied
+                process.stdin.write(content)
+                process.stdin.write(b"\n")
+                file_count += 1
+            process.stdin.write(b"done\n")
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise Exception(f"git fast-import failed for {self.repo}: {stderr.decode(errors='replace').strip()}")
+        commit_id = self._git(git_dir, 'rev-parse', f'refs/heads/{self.branch}')
+        logger.info("Committed %d files as %s", file_count, commit_id)
+        return commit_id
+
+    def _tree(self, git_dir, commit_id):
+        return self._git(git_dir, 'rev-parse', f'{commit_id}^{{tree}}')
+
+    @phase('git push')
+    def _push(self, git_dir, commit_id):
+        self._git(git_dir, 'push', '--quiet', self.remote_url, f'{commit_id}:refs/heads/{self.branch}')
+        logger.info("Pushed commit %s to branch %s of %s", commit_id, self.branch, self.repo)
+
+
+def codecommit_remote_url(repo, region):
+    """
+    Returns the git-remote-codecommit URL of a CodeCommit repository, which authenticates with the AWS credentials in use
+    """
+    return f'codecommit::{region}://{repo}'
+
+
+def get_repository_backend(domain_id, project_id, region, backend=API_BACKEND, repo_url=None, branch=DEFAULT_BRANCH):
+    """
+    Returns the backend committing to the repository of a project, or to `repo_url` with the git backend
+    """
+    if backend == GIT_BACKEND:
+        if repo_url:
+            return GitBackend(repo_url, branch=branch)
+        repo = get_project_repo(domain_id, project_id, region)
+        return GitBackend(codecommit_remote_url(repo, region), repo, branch)
+    if backend != API_BACKEND:
+        raise ValueError(f"Invalid repository backend `{backend}`. Expecting one of {', '.join(REPOSITORY_BACKENDS)}.")
+    return CodeCommitApiBackend(get_project_repo(domain_id, project_id, region), region, branch)
+
+
+def add_repository_arguments(parser):
+    parser.add_argument('--repo-backend',
+                        choices=REPOSITORY_BACKENDS,
+                        default=API_BACKEND,
+                        help='How files are committed to the project repository: `api` through the CodeCommit CreateCommit API, '
+                             '`git` as one commit pushed in a single packfile by the local git, for large migrations')
+    parser.add_argument('--repo-url',
+                        type=str,
+                        help='Git remote to commit to with --repo-backend git instead of the CodeCommit repository of the project, '
+                             'which is reached through git-remote-codecommit')
+
+
+def get_repository_backend_from_args(args):
+    return get_repository_backend(args.domain_id, args.project_id, args.region,
+                                  getattr(args, 'repo_backend', API_BACKEND), getattr(args, 'repo_url', None))
@@ -1,20 +1,229 @@
-import boto3
+import asyncio
 import os
 
+from boto3.s3.transfer import TransferConfig
 
-def download_s3_directory_recursive(s3_uri, local_dir):
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.instrumentation import phase
+from migration.utils.log import ProgressReporter, get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+DEFAULT_MULTIPART_CHUNK_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_PART_CONCURRENCY = 8
+# Levels of sub-prefixes discovered with `/` delimited listings before the prefixes are listed in full
+DEFAULT_PARTITION_DEPTH = 2
+S3_DELIMITER = '/'
+# Marks the end of the listing of one partition in the queue of list_s3_objects
+_PARTITION_LISTED = object()
+
+
+def parse_s3_uri(s3_uri):
+    # s3://bucket/some/prefix -> ('bucket', 'some/prefix')
+    bucket, _, key = s3_uri.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+async def list_s3_objects(engine, s3, bucket, prefix, partition_depth=DEFAULT_PARTITION_DEPTH):
+    """
+    Async iterator over the objects under an S3 prefix, listed in partitions concurrently.
+
+    The prefix is listed with a `/` delimiter, and each sub-prefix found is listed in a partition of its own as soon as
+    it is found, down to `partition_depth` levels, where the sub-prefixes are listed in full without a delimiter.
+    A prefix holding millions of keys across many folders is listed by as many concurrent paginations as folders,
+    within the S3 concurrency of the engine, instead of a single sequential one.
+
+    Objects are yielded as their pages arrive, grouped by partition but in no overall order.
+    """
+    async_s3 = engine.wrap(s3)
+    # Pages of objects, _PARTITION_LISTED markers, and the error failing a partition
+    queue = asyncio.Queue()
+    partitions = []
+
+    async def list_partition(partition_prefix, depth):
+        try:
+            params = {'Bucket': bucket, 'Prefix': partition_prefix}
+            if depth < partition_depth:
+                params['Delimiter'] = S3_DELIMITER
+            while True:
+                response = await async_s3.list_objects_v2(**params)
+                for common_prefix in response.get('CommonPrefixes', []):
+                    start_partition(common_prefix['Prefix'], depth + 1)
+                if response.get('Contents'):
+                    queue.put_nowait(response['Contents'])
+                if not response.get('NextContinuationToken'):
+                    break
+                params['ContinuationToken'] = response['NextContinuationToken']
+            queue.put_nowait(_PARTITION_LISTED)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    def start_partition(partition_prefix, depth):
+        partitions.append(asyncio.ensure_future(list_partition(partition_prefix, depth)))
+
+    start_partition(prefix, 0)
+    listed_partitions = 0
+    try:
+        # A partition starts the partitions of its sub-prefixes before it is marked as listed, so all are counted here
+        while listed_partitions < len(partitions):
+            item = await queue.get()
+            if item is _PARTITION_LISTED:
+                listed_partitions += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                for obj in item:
+                    yield obj
+    finally:
+        for partition in partitions:
+            partition.cancel()
+    logger.debug("Listed s3://%s/%s in %d partitions", bucket, prefix, len(partitions))
+
+
+class TransferSettings:
+    """
+    How the objects of a prefix are transferred, depending on their size.
+
+    Args:
+        multipart_threshold: Size from which an object is downloaded with ranged GetObject calls, smaller objects are
+            downloaded with one call in the calling thread
+        multipart_chunk_bytes: Size of the ranges of the objects downloaded in parts
+        max_part_concurrency: Number of ranges of one object downloaded at a time
+        max_file_bytes: Size above which objects are not downloaded, so they are not committed to the repository
+        large_files_s3_uri: S3 location the objects over `max_file_bytes` are copied to, with their path under the
+            downloaded prefix, they are only reported if not given
+        partition_depth: Levels of sub-prefixes listed concurrently, see list_s3_objects
+    """
+    def __init__(self, multipart_threshold=DEFAULT_MULTIPART_THRESHOLD, multipart_chunk_bytes=DEFAULT_MULTIPART_CHUNK_BYTES,
+                 max_part_concurrency=DEFAULT_MAX_PART_CONCURRENCY, max_file_bytes=None, large_files_s3_uri=None,
+                 partition_depth=DEFAULT_PARTITION_DEPTH):
+        self.multipart_threshold = multipart_threshold
+        self.max_part_concurrency = max_part_concurrency
+        self.partition_depth = partition_depth
+        self.max_file_bytes = max_file_bytes
+        self.large_files_s3_uri = large_files_s3_uri
+        # The default config starts a pool of 10 threads for every object, even those downloaded with a single call
+        self._single_part_config = TransferConfig(multipart_threshold=multipart_threshold, use_threads=False)
+        self._multipart_config = TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunk_bytes,
+                                                max_concurrency=max_part_concurrency)
+
+    def config(self, size):
+        return self._multipart_config if size >= self.multipart_threshold else self._single_part_config
+
+    def max_pool_connections(self, object_concurrency):
+        # Every object transferred at once may have all its parts in flight
+        return object_concurrency * self.max_part_concurrency
+
+    def is_oversized(self, size):
+        return self.max_file_bytes is not None and size > self.max_file_bytes
+
+
+def _download_file(s3, bucket, object_key, local_file_path, config):
+    os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+    s3.download_file(bucket, object_key, local_file_path, Config=config)
+    logger.debug("Downloaded %s to %s", object_key, local_file_path)
+
+
+def _copy_object(s3, bucket, object_key, destination_bucket, destination_key, config):
+    # Copied within S3, in parts for large objects
+    s3.copy({'Bucket': bucket, 'Key': object_key}, destination_bucket, destination_key, Config=config)
+    logger.debug("Copied %s to s3://%s/%s", object_key, destination_bucket, destination_key)
+
+
+async def _download_s3_prefix(engine, s3, bucket, key, local_dir, settings):
+    downloads = []
+    oversized_objects = []
+    with ProgressReporter(logger, 'Downloaded files') as progress:
+        # Start downloading the objects of a page while the other pages are listed
+        async for obj in list_s3_objects(engine, s3, bucket, key, settings.partition_depth):
+            if obj['Key'].endswith('/'):
+                continue
+            relative_path = obj['Key'][len(key):]
+            config = settings.config(obj['Size'])
+            if settings.is_oversized(obj['Size']):
+                oversized = {'key': obj['Key'], 'size': obj['Size'], 'copied_to': None}
+                oversized_objects.append(oversized)
+                if not settings.large_files_s3_uri:
+                    continue
+                destination_bucket, destination_prefix = parse_s3_uri(settings.large_files_s3_uri)
+                destination_key = destination_prefix.rstrip('/') + '/' + relative_path
+                oversized['copied_to'] = f"s3://{destination_bucket}/{destination_key}"
+                download = asyncio.ensure_future(engine.run('s3', _copy_object, s3, bucket, obj['Key'], destination_bucket, destination_key, config))
+            else:
+                local_file_path = os.path.join(local_dir, relative_path)
+                download = asyncio.ensure_future(engine.run('s3', _download_file, s3, bucket, obj['Key'], local_file_path, config))
+            download.add_done_callback(lambda _: progress.update())
+            downloads.append(download)
+        await gather_in_order(downloads)
+    return oversized_objects
+
+
+def _log_oversized_objects(oversized_objects, settings):
+    for oversized in oversized_objects:
+        if oversized['copied_to']:
+            logger.warning("Not migrating %s of %d bytes to the repository, it is larger than %d bytes. Copied it to %s",
+                           oversized['key'], oversized['size'], settings.max_file_bytes, oversized['copied_to'])
+        else:
+            logger.warning("Not migrating %s of %d bytes to the repository, it is larger than %d bytes",
+                           oversized['key'], oversized['size'], settings.max_file_bytes)
+    if oversized_objects:
+        total_bytes = sum(oversized['size'] for oversized in oversized_objects)
+        logger.info("Left %d objects of %d bytes out of the download", len(oversized_objects), total_bytes,
+                    extra={'fields': {'oversized_objects': len(oversized_objects), 'oversized_bytes': total_bytes}})
+
+
+@phase('workspace download')
+def download_s3_directory_recursive(s3_uri, local_dir, settings=None):
+    """
+    Download the objects under an S3 prefix to a local directory, with their path under the prefix, e.g. the storage
+    location of a workspace, or of a whole studio, to a folder per workspace.
+
+    Returns the objects left out for being larger than the `max_file_bytes` of `settings`, as
+    {'key', 'size', 'copied_to'} dictionaries, `copied_to` is the S3 URI of their copy if they were copied
+    """
+    settings = settings or TransferSettings()
     # Create the local directory if it doesn't exist
     os.makedirs(local_dir, exist_ok=True)
     # For the given S3 URI, recursively download all files to the local directory
-    s3 = boto3.client('s3')
-    bucket, key = s3_uri.replace("s3://", "").split("/", 1)
-    paginator = s3.get_paginator('list_objects_v2')
-    for result in paginator.paginate(Bucket=bucket, Prefix=key):
-        if 'Contents' in result:
-            for obj in result['Contents']:
-                if obj['Key'].endswith('/'):
-                    continue
-                local_file_path = os.path.join(local_dir, obj['Key'].replace(key, ""))
-                os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-                s3.download_file(bucket, obj['Key'], local_file_path)
-                print(f"Downloaded {obj['Key']} to {local_file_path}")
+    bucket, key = parse_s3_uri(s3_uri)
+    # Objects are downloaded to their path under the folder of the prefix
+    key = key.rstrip('/') + '/' if key else ''
+    engine = AsyncAwsEngine()
+    object_concurrency = engine.service_concurrency.get('s3', engine.max_concurrency_per_service)
+    s3 = create_client('s3', max_pool_connections=settings.max_pool_connections(object_concurrency))
+    oversized_objects = engine.run_until_complete(_download_s3_prefix(engine, s3, bucket, key, local_dir, settings))
+    _log_oversized_objects(oversized_objects, settings)
+    return oversized_objects
+
+
+def add_transfer_arguments(parser):
+    parser.add_argument('--multipart-threshold',
+                        type=int,
+                        default=DEFAULT_MULTIPART_THRESHOLD,
+                        help='Size in bytes from which an S3 object is downloaded in parts with ranged requests')
+    parser.add_argument('--multipart-chunk-bytes',
+                        type=int,
+                        default=DEFAULT_MULTIPART_CHUNK_BYTES,
+                        help='Size in bytes of the parts of the S3 objects downloaded in parts')
+    parser.add_argument('--max-part-concurrency',
+                        type=int,
+                        default=DEFAULT_MAX_PART_CONCURRENCY,
+                        help='Number of parts of one S3 object downloaded at a time')
+    parser.add_argument('--max-file-bytes',
+                        type=int,
+                        help='Size in bytes above which S3 objects are reported and not committed to the repository. '
+                             'The CodeCommit API backend rejects files over 6 MB')
+    parser.add_argument('--large-files-s3-uri',
+                        type=str,
+                        help='S3 location the objects over --max-file-bytes are copied to instead of only being reported')
+    parser.add_argument('--list-partition-depth',
+                        type=int,
+                        default=DEFAULT_PARTITION_DEPTH,
+                        help='Levels of S3 folders whose contents are listed concurrently, 0 lists the whole location in one pagination')
+
+
+def transfer_settings_from_args(args):
+    return TransferSettings(args.multipart_threshold, args.multipart_chunk_bytes, args.max_part_concurrency,
+                            args.max_file_bytes, args.large_files_s3_uri, args.list_partition_depth)
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+
+from migration.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+SAGEMAKER_UNIFIED_STUDIO_DOMAIN_PREFIX = 'SageMakerUnifiedStudio-'
+DEFAULT_DOMAIN_CACHE_TTL_SECONDS = 3600
+
+
+def get_domain_id_from_provisioned_resources(provisioned_resources):
+    # Some DataZone environments expose the SageMaker domain they created as a provisioned resource,
+    # which saves scanning all SageMaker domains of the account
+    for resource in provisioned_resources:
+        if resource.get('name', '').lower() == 'sagemakerdomainid' and resource.get('value'):
+            return resource['value']
+    return None
+
+
+class SageMakerDomainIndex:
+    """
+    Maps SageMaker Unified Studio project IDs to the SageMaker domains created for them.
+
+    The index is built from a single ListDomains scan and reused for every lookup. If `cache_path` is set,
+    the scan result is also written to that file and reused by later runs until it is older than `ttl_seconds`.
+    """
+    def __init__(self, sagemaker_client, cache_path=None, ttl_seconds=DEFAULT_DOMAIN_CACHE_TTL_SECONDS):
+        self._sagemaker_client = sagemaker_client
+        self._cache_path = cache_path
+        self._ttl_seconds = ttl_seconds
+        self._domains = None
+        self._loaded_from_cache = False
+        self._lock = threading.Lock()
+
+    def get_domain(self, project_id):
+        """
+        Returns the ListDomains entry of the project's SageMaker domain, or None if the project has none
+        """
+        with self._lock:
+            if self._domains is None:
+                self._domains = self._read_cache()
+                self._loaded_from_cache = self._domains is not None
+                if self._domains is None:
+                    self._refresh()
+            domain = self._lookup(project_id)
+            # A cached index may predate the project's domain, rescan once before giving up
+            if domain is None and self._loaded_from_cache:
+                self._refresh()
+                domain = self._lookup(project_id)
+            return domain
+
+    def get_domain_id(self, project_id):
+        domain = self.get_domain(project_id)
+        return domain['DomainId'] if domain else None
+
+    def _lookup(self, project_id):
+        domain = self._domains.get(project_id)
+        if domain is None:
+            # Domain names may carry a suffix after the project ID
+            domain = next((domain for key, domain in self._domains.items() if key.startswith(project_id)), None)
+        return domain
+
+    def _refresh(self):
+        domains = {}
+        paginator = self._sagemaker_client.get_paginator('list_domains')
+        for page in paginator.paginate():
+            for domain in page['Domains']:
+                name = domain['DomainName']
+                if SAGEMAKER_UNIFIED_STUDIO_DOMAIN_PREFIX in name:
+                    key = name.split(SAGEMAKER_UNIFIED_STUDIO_DOMAIN_PREFIX, 1)[1]
+                    domains[key] = {'DomainId': domain['DomainId'], 'DomainName': name}
+        self._domains = domains
+        self._loaded_from_cache = False
+        self._write_cache()
+
+    def _read_cache(self):
+        if not self._cache_path or not os.path.exists(self._cache_path):
+            return None
+        try:
+            with open(self._cache_path) as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable SageMaker domain cache {self._cache_path}: {e}")
+            return None
+        if time.time() - cache.get('created_at', 0) > self._ttl_seconds:
+            return None
+        return cache['domains']
+
+    def _write_cache(self):
+        if not self._cache_path:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self._cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent runs never read a partially written cache
+        tmp_path = f"{self._cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as cache_file:
+            json.dump({'created_at': time.time(), 'domains': self._domains}, cache_file)
+        os.replace(tmp_path, self._cache_path)
@@ -0,0 +1,332 @@
+import argparse
+import copy
+import hashlib
+import io
+import json
+
+from botocore.exceptions import ClientError
+
+from migration.athena.athena_workgroup_migration import REPO_QUERIES_FOLDER
+from migration.cli import load_script
+from migration.emr.emr_migration import REPO_NOTEBOOKS_FOLDER
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.aws_clients import create_client
+from migration.utils.codecommit_helper import git_blob_id
+from migration.utils.emr_helper import get_emr_workspace_storage_location
+from migration.utils.instrumentation import add_instrumentation_arguments, enable_instrumentation_from_args, phase
+from migration.utils.log import add_logging_arguments, configure_logging_from_args, get_logger
+from migration.utils.notebook import CHECKPOINTS_FOLDER, DEFAULT_MAX_OUTPUT_BYTES, slim_notebook
+from migration.utils.profiling import add_profiling_arguments, enable_profiling_from_args
+from migration.utils.rate_limiter import add_rate_limit_arguments, enable_rate_limiting_from_args
+from migration.utils.repository import GIT_BACKEND, add_repository_arguments, get_repository_backend_from_args
+from migration.utils.s3_helper import list_s3_objects
+
+logger = get_logger('migration.verify')
+
+DEFAULT_REPORT_PATH = 'verify_report.json'
+# BatchGetNamedQuery accepts up to 50 query ids per call
+NAMED_QUERY_BATCH_SIZE = 50
+# Missing and mismatched items logged per check, the report holds all of them
+MAX_LOGGED_ITEMS = 20
+
+
+class CheckResult:
+    """
+    Outcome of comparing one source, e.g. the named queries of a workgroup, with its migrated copy
+    """
+    def __init__(self, name, source_items=0, target_items=0):
+        self.name = name
+        self.source_items = source_items
+        self.target_items = target_items
+        self.missing = []
+        self.mismatched = []
+        # Source items which could not be read, so could not be compared with the target
+        self.unverified = []
+
+    @property
+    def ok(self):
+        return not self.missing and not self.mismatched and not self.unverified
+
+    def to_dict(self):
+        return {
+            'ok': self.ok,
+            'source_items': self.source_items,
+            'target_items': self.target_items,
+            'missing': self.missing,
+            'mismatched': self.mismatched,
+            'unverified': self.unverified,
+        }
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _query_of_sqlnb(content):
+    # The migrated query is the source of the last code cell, nbformat stores multiline sources as lists of lines
+    notebook = json.loads(content)
+    code_cells = [cell for cell in notebook.get('cells', []) if cell.get('cell_type') == 'code']
+    if not code_cells:
+        return None
+    source = code_cells[-1].get('source', '')
+    return ''.join(source) if isinstance(source, list) else source
+
+
+async def _get_named_queries(engine, athena, workgroup_name):
+    """
+    Returns the named queries of the workgroup, and the ids of those which could not be read
+    """
+    async_athena = engine.wrap(athena)
+    query_ids = [query_id async for query_id in async_athena.paginate('list_named_queries', 'NamedQueryIds', WorkGroup=workgroup_name)]
+    batches = [query_ids[start:start + NAMED_QUERY_BATCH_SIZE] for start in range(0, len(query_ids), NAMED_QUERY_BATCH_SIZE)]
+    responses = await gather_in_order(async_athena.batch_get_named_query(NamedQueryIds=batch) for batch in batches)
+    named_queries = []
+    unprocessed_ids = []
+    for response in responses:
+        named_queries.extend(response.get('NamedQueries', []))
+        unprocessed_ids.extend(unprocessed['NamedQueryId'] for unprocessed in response.get('UnprocessedNamedQueryIds', []))
+
+    async def get_named_query(query_id):
+        # Queries left out of a batch, e.g. when it was throttled, are read one at a time
+        try:
+            return (await async_athena.get_named_query(NamedQueryId=query_id))['NamedQuery']
+        except ClientError as e:
+            logger.warning("Could not read named query %s: %s", query_id, e)
+            return None
+
+    unverified_ids = []
+    for query_id, named_query in zip(unprocessed_ids, await gather_in_order(get_named_query(query_id) for query_id in unprocessed_ids)):
+        if named_query is None:
+            unverified_ids.append(query_id)
+        else:
+            named_queries.append(named_query)
+    return named_queries, unverified_ids
+
+
+@phase('athena verification')
+def verify_athena_queries(workgroup_name, region, repository):
+    """
+    Check that every named query of the workgroup is in the repository as a .sqlnb file holding the same query
+    """
+    athena = create_client('athena', region_name=region)
+    engine = AsyncAwsEngine()
+    named_queries, unverified_ids = engine.run_until_complete(_get_named_queries(engine, athena, workgroup_name))
+    repo_files = repository.read_files(f'{REPO_QUERIES_FOLDER}/{workgroup_name}')
+
+    # Queries with the same name are migrated to the same file, which must hold one of them
+    expected = {}
+    for named_query in named_queries:
+        path = f"{REPO_QUERIES_FOLDER}/{workgroup_name}/{named_query['Name']}.sqlnb"
+        expected.setdefault(path, set()).add(_content_hash(named_query['QueryString']))
+
+    result = CheckResult(f"athena:{workgroup_name}", len(named_queries) + len(unverified_ids), len(repo_files))
+    result.unverified.extend(f"named query {query_id}" for query_id in sorted(unverified_ids))
+    for path in sorted(expected.keys() - repo_files.keys()):
+        result.missing.append(path)
+    for path in sorted(expected.keys() & repo_files.keys()):
+        try:
+            query = _query_of_sqlnb(repo_files[path])
+        except ValueError:
+            query = None
+        if query is None or _content_hash(query) not in expected[path]:
+            result.mismatched.append(path)
+    return result
+
+
+def _read_object(s3, bucket, key):
+    return s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+async def _source_blob_ids(engine, s3, bucket, objects, slim_notebooks, max_output_bytes):
+    async def blob_id(key):
+        content = await engine.run('s3', _read_object, s3, bucket, key)
+        if slim_notebooks and key.endswith('.ipynb'):
+            # Compare with what the migration committed, the slimmed notebook if any output was too large
+            content = slim_notebook(io.BytesIO(content), max_output_bytes) or content
+        return git_blob_id(content)
+
+    keys = sorted(objects)
+    return dict(zip(keys, await gather_in_order(blob_id(key) for key in keys)))
+
+
+@phase('emr verification')
+def verify_emr_workspace(emr_studio_id, emr_workspace_id, region, repository, check_content=True,
+                         slim_notebooks=False, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES, max_file_bytes=None):
+    """
+    Check that every file of the workspace is in the repository under emr_notebooks/<studio>/<workspace>, and with
+    `check_content` that it has the same content, comparing the git blob ids of the S3 objects with those of the repository.
+    Objects over `max_file_bytes` were left out of the migration and are not expected in the repository.
+    """
+    s3_uri = get_emr_workspace_storage_location(emr_workspace_id, region)
+    bucket, prefix = s3_uri.replace("s3://", "").split("/", 1)
+    s3 = create_client('s3', region_name=region)
+    repo_folder = f'{REPO_NOTEBOOKS_FOLDER}/{emr_studio_id}/{emr_workspace_id}'
+
+    # Expected repository path -> S3 key, skipping what the migration does not commit
+    expected = {}
+    listing_engine = AsyncAwsEngine()
+
+    async def list_objects():
+        return [obj async for obj in list_s3_objects(listing_engine, s3, bucket, prefix)]
+
+    for obj in listing_engine.run_until_complete(list_objects()):
+        relative_path = obj['Key'][len(prefix):]
+        if not relative_path or relative_path.endswith('/') or '.git' in relative_path:
+            continue
+        if slim_notebooks and CHECKPOINTS_FOLDER in relative_path.split('/'):
+            continue
+        if max_file_bytes is not None and obj['Size'] > max_file_bytes:
+            continue
+        expected[f'{repo_folder}/{relative_path}'] = obj['Key']
+    repo_files = repository.list_files(repo_folder)
+
+    result = CheckResult(f"emr:{emr_studio_id}/{emr_workspace_id}", len(expected), len(repo_files))
+    result.missing.extend(sorted(expected.keys() - repo_files.keys()))
+    if check_content:
+        present = {path: expected[path] for path in expected.keys() & repo_files.keys()}
+        engine = AsyncAwsEngine()
+        source_blob_ids = engine.run_until_complete(_source_blob_ids(engine, s3, bucket, present.values(), slim_notebooks, max_output_bytes))
+        result.mismatched.extend(sorted(path for path, key in present.items() if source_blob_ids[key] != repo_files[path]))
+    return result
+
+
+def _grant_key(resource, filter_resource):
+    # Resources are compared in the form byor copies them in, listings may return the same resource in another form
+    return json.dumps(filter_resource(copy.deepcopy(resource)), sort_keys=True)
+
+
+@phase('lakeformation verification')
+def verify_lakeformation(source_role_arn, destination_role_arn, region):
+    """
+    Check that every Lake Formation grant and opt-in of the source role was copied to the destination role.
+    A destination grant may hold more permissions than the source grant.
+    """
+    filter_resource = load_script('migration/bring-your-own-role/byor.py', 'byor')._filter_lakeformationsource
+    lakeformation = create_client('lakeformation', region_name=region)
+    engine = AsyncAwsEngine()
+
+    async def list_role_items():
+        async_lakeformation = engine.wrap(lakeformation)
+        grants = {source_role_arn: {}, destination_role_arn: {}}
+        # Grants can only be listed for the whole account, like byor does, then grouped per role
+        async for grant in async_lakeformation.paginate('list_permissions', 'PrincipalResourcePermissions'):
+            role_grants = grants.get(grant['Principal']['DataLakePrincipalIdentifier'])
+            if role_grants is not None:
+                permissions = role_grants.setdefault(_grant_key(grant['Resource'], filter_resource), (set(), set()))
+                permissions[0].update(grant.get('Permissions', []))
+                permissions[1].update(grant.get('PermissionsWithGrantOption', []))
+
+        async def opt_ins(role_arn):
+            return {_grant_key(opt_in['Resource'], filter_resource)
+                    async for opt_in in async_lakeformation.paginate('list_lake_formation_opt_ins', 'LakeFormationOptInsInfoList',
+                                                                      Principal={'DataLakePrincipalIdentifier': role_arn})}
+        source_opt_ins, destination_opt_ins = await gather_in_order([opt_ins(source_role_arn), opt_ins(destination_role_arn)])
+        return grants, source_opt_ins, destination_opt_ins
+
+    grants, source_opt_ins, destination_opt_ins = engine.run_until_complete(list_role_items())
+    source_grants, destination_grants = grants[source_role_arn], grants[destination_role_arn]
+
+    grant_result = CheckResult(f"lakeformation grants:{destination_role_arn}", len(source_grants), len(destination_grants))
+    for resource, (permissions, grantable_permissions) in sorted(source_grants.items()):
+        if resource not in destination_grants:
+            grant_result.missing.append(resource)
+            continue
+        destination_permissions, destination_grantable_permissions = destination_grants[resource]
+        if not (permissions <= destination_permissions and grantable_permissions <= destination_grantable_permissions):
+            grant_result.mismatched.append(resource)
+
+    opt_in_result = CheckResult(f"lakeformation opt-ins:{destination_role_arn}", len(source_opt_ins), len(destination_opt_ins))
+    opt_in_result.missing.extend(sorted(source_opt_ins - destination_opt_ins))
+    return [grant_result, opt_in_result]
+
+
+def _log_result(result):
+    if result.ok:
+        logger.info("%s: OK, %d source items found in the target", result.name, result.source_items)
+        return
+    logger.error("%s: %d of %d source items missing, %d mismatched, %d unverified", result.name, len(result.missing),
+                 result.source_items, len(result.mismatched), len(result.unverified))
+    for kind, items in (('Missing', result.missing), ('Mismatched', result.mismatched), ('Unverified', result.unverified)):
+        for item in items[:MAX_LOGGED_ITEMS]:
+            logger.error("  %s: %s", kind, item)
+        if len(items) > MAX_LOGGED_ITEMS:
+            logger.error("  ... and %d more, see the report", len(items) - MAX_LOGGED_ITEMS)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Verify that migrated Athena queries, EMR workspace files and Lake Formation grants '
+                                                 'match their source')
+    parser.add_argument('--domain-id', type=str, help='ID of the SageMaker Unified Studio Domain, to find the project repository')
+    parser.add_argument('--project-id', type=str, help='Project ID in the SageMaker Unified Studio Domain, to find the project repository')
+    parser.add_argument('--region', type=str, required=True, help='AWS region')
+    parser.add_argument('--workgroup-name', dest='workgroup_names', action='append', default=[], metavar='NAME',
+                        help='Athena workgroup whose named queries were migrated, can be repeated')
+    parser.add_argument('--emr-studio-id', type=str, help='EMR Studio of the migrated workspaces. Format es-XXXX')
+    parser.add_argument('--emr-workspace-id', dest='emr_workspace_ids', action='append', default=[], metavar='ID',
+                        help='Migrated EMR Studio workspace, can be repeated. Format e-YYYY')
+    parser.add_argument('--slim-notebooks', action='store_true', default=False,
+                        help='The workspaces were migrated with --slim-notebooks, compare with the slimmed notebooks')
+    parser.add_argument('--max-output-bytes', type=int, default=DEFAULT_MAX_OUTPUT_BYTES, help='--max-output-bytes the workspaces were migrated with')
+    parser.add_argument('--max-file-bytes', type=int,
+                        help='--max-file-bytes the workspaces were migrated with, larger objects are not expected in the repository')
+    parser.add_argument('--skip-content', action='store_true', default=False,
+                        help='Only check that the workspace files exist in the repository, without reading them from S3 to compare their content')
+    parser.add_argument('--source-role-arn', type=str, help='Role whose Lake Formation grants and opt-ins were copied')
+    parser.add_argument('--destination-role-arn', type=str, help='Role the Lake Formation grants and opt-ins were copied to')
+    parser.add_argument('--report', type=str, default=DEFAULT_REPORT_PATH, help='File to write the results of the checks to as JSON')
+    add_repository_arguments(parser)
+    add_instrumentation_arguments(parser)
+    add_profiling_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    external_repo = args.repo_backend == GIT_BACKEND and args.repo_url
+    if (args.workgroup_names or args.emr_workspace_ids) and not external_repo and not (args.domain_id and args.project_id):
+        parser.error('--domain-id and --project-id, or --repo-backend git with --repo-url, are required to verify Athena queries or EMR workspaces')
+    if args.emr_workspace_ids and not args.emr_studio_id:
+        parser.error('--emr-studio-id is required with --emr-workspace-id')
+    if bool(args.source_role_arn) != bool(args.destination_role_arn):
+        parser.error('--source-role-arn and --destination-role-arn must be given together')
+    return args
+
+
+def run_migration(args):
+    """
+    Run the checks the arguments ask for, write the report and raise if any migrated item is missing or mismatched,
+    or any source item could not be read
+    """
+    results = []
+    if args.workgroup_names or args.emr_workspace_ids:
+        repository = get_repository_backend_from_args(args)
+        for workgroup_name in args.workgroup_names:
+            results.append(verify_athena_queries(workgroup_name, args.region, repository))
+        for emr_workspace_id in args.emr_workspace_ids:
+            results.append(verify_emr_workspace(args.emr_studio_id, emr_workspace_id, args.region, repository, not args.skip_content,
+                                                args.slim_notebooks, args.max_output_bytes, args.max_file_bytes))
+    if args.source_role_arn:
+        results.extend(verify_lakeformation(args.source_role_arn, args.destination_role_arn, args.region))
+    if not results:
+        logger.warning("Nothing to verify, pass --workgroup-name, --emr-workspace-id or --source-role-arn")
+
+    for result in results:
+        _log_result(result)
+    with open(args.report, 'w') as report_file:
+        json.dump({result.name: result.to_dict() for result in results}, report_file, indent=2)
+    logger.info("Wrote verification report to %s", args.report)
+
+    failed_checks = [result.name for result in results if not result.ok]
+    if failed_checks:
+        raise Exception(f"Verification failed: {', '.join(failed_checks)}")
+
+
+def verify_main(argv=None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
+    enable_instrumentation_from_args(args)
+    enable_profiling_from_args(args)
+    enable_rate_limiting_from_args(args)
+    run_migration(args)
+
+
+if __name__ == '__main__':
+    verify_main()
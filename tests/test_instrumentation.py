@@ -0,0 +1,64 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from migration.utils.async_aws import AsyncAwsEngine, gather_in_order
+from migration.utils.instrumentation import NO_PHASE, current_phase, in_current_phase, phase, phase_of_thread
+from migration.utils.pagination import paginate
+
+
+def _phase_and_thread():
+    return current_phase(), phase_of_thread(threading.get_ident())
+
+
+class PhaseTest(unittest.TestCase):
+    def test_nested_phases(self):
+        self.assertEqual(current_phase(), NO_PHASE)
+        with phase('outer'):
+            with phase('inner'):
+                self.assertEqual(_phase_and_thread(), ('inner', 'inner'))
+            self.assertEqual(_phase_and_thread(), ('outer', 'outer'))
+        self.assertEqual(_phase_and_thread(), (NO_PHASE, NO_PHASE))
+
+    def test_worker_threads_are_not_in_the_phase_of_other_threads(self):
+        with phase('policy copy'), ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(executor.submit(_phase_and_thread).result(), (NO_PHASE, NO_PHASE))
+
+    def test_work_handed_over_keeps_the_phase_of_its_caller(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            def submit_in(phase_name):
+                with phase(phase_name):
+                    return executor.submit(in_current_phase(_phase_and_thread))
+            futures = [submit_in('LF grant copy'), submit_in('SageMaker domain update')]
+            self.assertEqual([future.result() for future in futures],
+                             [('LF grant copy', 'LF grant copy'), ('SageMaker domain update', 'SageMaker domain update')])
+            # The worker threads leave the phase once the work is done
+            self.assertEqual(executor.submit(_phase_and_thread).result(), (NO_PHASE, NO_PHASE))
+
+    def test_engine_runs_calls_in_the_phase_of_their_coroutine(self):
+        engine = AsyncAwsEngine()
+
+        async def run_in(phase_name):
+            with phase(phase_name):
+                return await engine.run('glue', _phase_and_thread)
+
+        async def run_all():
+            return await gather_in_order([run_in('partition location scan'), run_in('S3 location registration')])
+        self.assertEqual(engine.run_until_complete(run_all()),
+                         [('partition location scan', 'partition location scan'),
+                          ('S3 location registration', 'S3 location registration')])
+
+    def test_prefetched_pages_are_fetched_in_the_phase_of_the_consumer(self):
+        pages = {None: {'Items': [1], 'NextToken': 'page-2'}, 'page-2': {'Items': [2]}}
+        fetched_in = []
+
+        def list_items(NextToken=None):
+            fetched_in.append(current_phase())
+            return pages[NextToken]
+        with phase('LF opt-in copy'):
+            self.assertEqual(list(paginate(list_items, 'Items')), [1, 2])
+        self.assertEqual(fetched_in, ['LF opt-in copy', 'LF opt-in copy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
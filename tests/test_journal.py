@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from botocore.exceptions import ClientError
+
+from migration.cli import load_script
+from migration.utils.journal import JournalInputsMismatchError, MigrationJournal
+
+byor = load_script('migration/bring-your-own-role/byor.py', 'byor')
+
+DOMAIN_ID = 'dzd_test'
+ENVIRONMENT_ID = 'env-1'
+TARGET_ID = 'target-1'
+BYOR_ROLE = {'Role': {'Arn': 'arn:aws:iam::123456789012:role/byor-role', 'RoleName': 'byor-role'}}
+OTHER_ROLE = {'Role': {'Arn': 'arn:aws:iam::123456789012:role/other-role', 'RoleName': 'other-role'}}
+PROJECT_ROLE_ARN = 'arn:aws:iam::123456789012:role/datazone_usr_role_project'
+
+
+def _grant(grant_id, listing_id):
+    return {'id': grant_id, 'grantedEntity': {'listing': {'id': listing_id, 'revision': '1'}}}
+
+
+def _write_journal(path, entries, truncated_line=None):
+    with open(path, 'w') as journal_file:
+        for step, key, data in entries:
+            journal_file.write(json.dumps({'step': step, 'key': key, 'time': 0, 'data': data}) + '\n')
+        if truncated_line:
+            # A run killed while writing its last entry
+            journal_file.write(truncated_line)
+
+
+class FakeDataZone:
+    """
+    DataZone client as wrapped by an AsyncAwsEngine, recording the calls made to it
+    """
+    def __init__(self, grants=(), deleted_grant_ids=()):
+        self.grants = list(grants)
+        self.deleted_grant_ids = set(deleted_grant_ids)
+        self.calls = []
+
+    async def paginate(self, operation_name, result_key, *tokens, **kwargs):
+        self.calls.append((operation_name, kwargs))
+        for grant in self.grants:
+            yield grant
+
+    async def delete_subscription_grant(self, domainIdentifier, identifier):
+        self.calls.append(('delete_subscription_grant', identifier))
+        if identifier in self.deleted_grant_ids:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Not found'}}, 'DeleteSubscriptionGrant')
+        self.deleted_grant_ids.add(identifier)
+
+    async def get_subscription_grant(self, domainIdentifier, identifier):
+        raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'Not found'}}, 'GetSubscriptionGrant')
+
+    async def update_subscription_target(self, **kwargs):
+        self.calls.append(('update_subscription_target', kwargs['identifier']))
+
+    async def create_subscription_grant(self, grantedEntity, **kwargs):
+        listing_id = grantedEntity['listing']['identifier']
+        self.calls.append(('create_subscription_grant', listing_id))
+        return {'id': f'new-{listing_id}'}
+
+    def operations(self, name):
+        return [call[1] for call in self.calls if call[0] == name]
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.path = os.path.join(self._directory.name, 'byor_journal_project.jsonl')
+
+
+class MigrationJournalTest(JournalTestCase):
+    def test_resume_loads_completed_steps(self):
+        journal = MigrationJournal(self.path)
+        journal.record('policy copy', 'byor-role')
+        journal.record(byor.SUBSCRIPTION_GRANT_CREATED, 'target-1/listing-1/1', grant_id='new-1')
+
+        resumed = MigrationJournal(self.path, resume=True)
+        self.assertTrue(resumed.is_done('policy copy', 'byor-role'))
+        self.assertFalse(resumed.is_done('policy copy', 'other-role'))
+        self.assertFalse(resumed.is_done('LF grant copy', 'byor-role'))
+        self.assertEqual(resumed.get(byor.SUBSCRIPTION_GRANT_CREATED, 'target-1/listing-1/1'), {'grant_id': 'new-1'})
+
+    def test_resume_ignores_truncated_last_line(self):
+        _write_journal(self.path, [('trust policy update', 'byor-role', {}), ('policy copy', 'byor-role', {})],
+                       truncated_line='{"step": "SageMaker domain update", "key": "proj')
+        journal = MigrationJournal(self.path, resume=True)
+        self.assertTrue(journal.is_done('trust policy update', 'byor-role'))
+        self.assertTrue(journal.is_done('policy copy', 'byor-role'))
+        self.assertFalse(journal.is_done('SageMaker domain update', 'project'))
+
+    def test_entries_recorded_after_a_truncated_line_are_readable(self):
+        _write_journal(self.path, [('policy copy', 'byor-role', {})],
+                       truncated_line='{"step": "LF grant copy", "key": "en')
+        MigrationJournal(self.path, resume=True).record('LF grant copy', 'env-1')
+        journal = MigrationJournal(self.path, resume=True)
+        self.assertTrue(journal.is_done('policy copy', 'byor-role'))
+        self.assertTrue(journal.is_done('LF grant copy', 'env-1'))
+
+    def test_entries_recorded_after_an_unterminated_line_are_readable(self):
+        _write_journal(self.path, [], truncated_line=json.dumps({'step': 'policy copy', 'key': 'byor-role', 'data': {}}))
+        MigrationJournal(self.path, resume=True).record('LF grant copy', 'env-1')
+        journal = MigrationJournal(self.path, resume=True)
+        self.assertTrue(journal.is_done('policy copy', 'byor-role'))
+        self.assertTrue(journal.is_done('LF grant copy', 'env-1'))
+
+    def test_existing_journal_is_moved_aside_without_resume(self):
+        _write_journal(self.path, [('policy copy', 'byor-role', {})])
+        journal = MigrationJournal(self.path)
+        self.assertFalse(journal.is_done('policy copy', 'byor-role'))
+        self.assertFalse(os.path.exists(self.path))
+        backups = [name for name in os.listdir(self._directory.name) if name.startswith('byor_journal_project.jsonl.')]
+        self.assertEqual(len(backups), 1)
+        with open(os.path.join(self._directory.name, backups[0])) as backup_file:
+            self.assertEqual(json.loads(backup_file.readline())['step'], 'policy copy')
+
+        journal.record('trust policy update', 'byor-role')
+        with open(self.path) as journal_file:
+            self.assertEqual([json.loads(line)['step'] for line in journal_file], ['trust policy update'])
+
+    def test_resume_without_journal_starts_from_the_beginning(self):
+        journal = MigrationJournal(self.path, resume=True)
+        self.assertFalse(journal.is_done('policy copy', 'byor-role'))
+
+
+class RunStepTest(JournalTestCase):
+    def test_skips_completed_steps_and_records_new_ones(self):
+        _write_journal(self.path, [('policy copy', 'byor-role', {})])
+        journal = MigrationJournal(self.path, resume=True)
+        ran = []
+        byor._run_step(journal, 'policy copy', 'byor-role', lambda: ran.append('policy copy'))
+        byor._run_step(journal, 'LF grant copy', 'env-1', lambda: ran.append('LF grant copy'))
+        self.assertEqual(ran, ['LF grant copy'])
+        self.assertTrue(MigrationJournal(self.path, resume=True).is_done('LF grant copy', 'env-1'))
+
+    def test_failed_step_is_not_recorded(self):
+        journal = MigrationJournal(self.path)
+
+        def fail():
+            raise RuntimeError('throttled')
+        with self.assertRaises(RuntimeError):
+            byor._run_step(journal, 'LF grant copy', 'env-1', fail)
+        self.assertFalse(MigrationJournal(self.path, resume=True).is_done('LF grant copy', 'env-1'))
+
+    def test_resume_with_other_inputs_stops(self):
+        args = argparse.Namespace(execute=True, force_update=False)
+        journal = MigrationJournal(self.path)
+        byor._run_step(journal, 'SageMaker domain update', 'project', lambda: None,
+                       byor._step_inputs(args, PROJECT_ROLE_ARN, BYOR_ROLE['Role']['Arn'], force_update=False))
+
+        resumed = MigrationJournal(self.path, resume=True)
+        ran = []
+        with self.assertRaisesRegex(JournalInputsMismatchError, 'other-role'):
+            byor._run_step(resumed, 'SageMaker domain update', 'project', lambda: ran.append('SageMaker domain update'),
+                           byor._step_inputs(args, PROJECT_ROLE_ARN, OTHER_ROLE['Role']['Arn'], force_update=False))
+        self.assertEqual(ran, [])
+
+        # The same inputs, as read back from the journal, skip the step
+        byor._run_step(resumed, 'SageMaker domain update', 'project', lambda: ran.append('SageMaker domain update'),
+                       byor._step_inputs(args, PROJECT_ROLE_ARN, BYOR_ROLE['Role']['Arn'], force_update=False))
+        self.assertEqual(ran, [])
+
+    def test_runs_every_step_without_journal(self):
+        ran = []
+        byor._run_step(None, 'policy copy', 'byor-role', lambda: ran.append('policy copy'))
+        self.assertEqual(ran, ['policy copy'])
+
+
+class SubscriptionCopyResumeTest(JournalTestCase):
+    GRANTS = [_grant('grant-1', 'listing-1'), _grant('grant-2', 'listing-2'), _grant('grant-3', 'listing-3')]
+
+    def _copy(self, datazone, journal):
+        asyncio.run(byor._copy_subscription_target(datazone, DOMAIN_ID, ENVIRONMENT_ID, {'id': TARGET_ID}, BYOR_ROLE, True, journal))
+
+    def test_crash_while_recreating_grants(self):
+        # The grants were deleted and the target updated, one grant was recreated before the crash,
+        # the record of the second one was cut short
+        _write_journal(self.path, [
+            (byor.SUBSCRIPTION_GRANTS_RECORDED, TARGET_ID, {'environment_id': ENVIRONMENT_ID, 'grants': self.GRANTS}),
+            (byor.SUBSCRIPTION_GRANTS_DELETED, TARGET_ID, {}),
+            (byor.SUBSCRIPTION_TARGET_UPDATED, TARGET_ID, {}),
+            (byor.SUBSCRIPTION_GRANT_CREATED, f'{TARGET_ID}/listing-1/1', {'grant_id': 'new-listing-1'}),
+        ], truncated_line='{"step": "subscription grant created", "key": "target-1/listing-2')
+        # The deleted grants are no longer listed by DataZone
+        datazone = FakeDataZone(grants=[])
+        journal = MigrationJournal(self.path, resume=True)
+        self._copy(datazone, journal)
+
+        self.assertEqual(datazone.operations('list_subscription_grants'), [])
+        self.assertEqual(datazone.operations('delete_subscription_grant'), [])
+        self.assertEqual(datazone.operations('update_subscription_target'), [])
+        self.assertEqual(sorted(datazone.operations('create_subscription_grant')), ['listing-2', 'listing-3'])
+        resumed = MigrationJournal(self.path, resume=True)
+        for listing_id in ('listing-1', 'listing-2', 'listing-3'):
+            self.assertTrue(resumed.is_done(byor.SUBSCRIPTION_GRANT_CREATED, f'{TARGET_ID}/{listing_id}/1'))
+
+    def test_crash_while_deleting_grants(self):
+        # The grants were recorded and partly deleted before the crash
+        _write_journal(self.path, [
+            (byor.SUBSCRIPTION_GRANTS_RECORDED, TARGET_ID, {'environment_id': ENVIRONMENT_ID, 'grants': self.GRANTS}),
+        ])
+        datazone = FakeDataZone(grants=[self.GRANTS[2]], deleted_grant_ids={'grant-1', 'grant-2'})
+        journal = MigrationJournal(self.path, resume=True)
+        self._copy(datazone, journal)
+
+        # The recorded grants are used, not the ones still listed
+        self.assertEqual(datazone.operations('list_subscription_grants'), [])
+        self.assertEqual(sorted(datazone.operations('delete_subscription_grant')), ['grant-1', 'grant-2', 'grant-3'])
+        self.assertEqual(datazone.operations('update_subscription_target'), [TARGET_ID])
+        self.assertEqual(sorted(datazone.operations('create_subscription_grant')), ['listing-1', 'listing-2', 'listing-3'])
+
+    def test_completed_target_is_not_copied_again(self):
+        _write_journal(self.path, [
+            (byor.SUBSCRIPTION_GRANTS_RECORDED, TARGET_ID, {'environment_id': ENVIRONMENT_ID, 'grants': self.GRANTS[:1]}),
+            (byor.SUBSCRIPTION_GRANTS_DELETED, TARGET_ID, {}),
+            (byor.SUBSCRIPTION_TARGET_UPDATED, TARGET_ID, {}),
+            (byor.SUBSCRIPTION_GRANT_CREATED, f'{TARGET_ID}/listing-1/1', {'grant_id': 'new-listing-1'}),
+        ])
+        datazone = FakeDataZone(grants=[_grant('new-listing-1', 'listing-1')])
+        self._copy(datazone, MigrationJournal(self.path, resume=True))
+        self.assertEqual(datazone.calls, [])
+
+    def test_resume_with_other_role_does_not_touch_the_target(self):
+        datazone = FakeDataZone(grants=self.GRANTS[:1])
+        self._copy(datazone, MigrationJournal(self.path))
+        datazone = FakeDataZone(grants=self.GRANTS[:1])
+        with self.assertRaises(JournalInputsMismatchError):
+            asyncio.run(byor._copy_subscription_target(datazone, DOMAIN_ID, ENVIRONMENT_ID, {'id': TARGET_ID}, OTHER_ROLE,
+                                                       True, MigrationJournal(self.path, resume=True)))
+        self.assertEqual(datazone.calls, [])
+
+    def test_first_run_records_grants_before_deleting_them(self):
+        datazone = FakeDataZone(grants=self.GRANTS[:2])
+        self._copy(datazone, MigrationJournal(self.path))
+        with open(self.path) as journal_file:
+            steps = [json.loads(line)['step'] for line in journal_file]
+        self.assertEqual(steps[0], byor.SUBSCRIPTION_GRANTS_RECORDED)
+        self.assertEqual(steps[1:3], [byor.SUBSCRIPTION_GRANTS_DELETED, byor.SUBSCRIPTION_TARGET_UPDATED])
+        self.assertEqual(steps[3:], [byor.SUBSCRIPTION_GRANT_CREATED] * 2)
+        self.assertEqual(sorted(datazone.operations('delete_subscription_grant')), ['grant-1', 'grant-2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import copy
+import unittest
+
+from migration.cli import load_script
+from migration.utils.policy import merge_policy_documents, statement_key
+
+ROLE_ARN = 'arn:aws:iam::123456789012:role/datazone_usr_role_abc'
+BYOR_ROLE_ARN = 'arn:aws:iam::123456789012:role/byor-role'
+
+
+def _statement(**elements):
+    statement = {
+        'Effect': 'Allow',
+        'Principal': {'Service': 'glue.amazonaws.com'},
+        'Action': 'sts:AssumeRole',
+    }
+    statement.update(elements)
+    return statement
+
+
+class StatementKeyTest(unittest.TestCase):
+    def assertSameKey(self, first, second):
+        self.assertEqual(statement_key(first), statement_key(second))
+
+    def assertDifferentKey(self, first, second):
+        self.assertNotEqual(statement_key(first), statement_key(second))
+
+    def test_element_order_and_name_case(self):
+        self.assertSameKey(
+            {'Effect': 'Allow', 'Action': 'sts:AssumeRole', 'Principal': {'AWS': ROLE_ARN}},
+            {'principal': {'aws': ROLE_ARN}, 'action': 'sts:AssumeRole', 'effect': 'Allow'})
+
+    def test_action_case(self):
+        self.assertSameKey(_statement(Action='sts:AssumeRole'), _statement(Action='STS:assumerole'))
+        self.assertSameKey(_statement(NotAction='s3:GetObject'), _statement(NotAction=['S3:GETOBJECT']))
+
+    def test_different_actions(self):
+        self.assertDifferentKey(_statement(Action='sts:AssumeRole'), _statement(Action='sts:TagSession'))
+        self.assertDifferentKey(_statement(Action='sts:AssumeRole'), _statement(Action=['sts:AssumeRole', 'sts:TagSession']))
+
+    def test_action_list_order_and_duplicates(self):
+        self.assertSameKey(_statement(Action=['sts:AssumeRole', 'sts:TagSession']),
+                           _statement(Action=['sts:TagSession', 'sts:AssumeRole', 'sts:assumerole']))
+
+    def test_values_of_other_elements_keep_their_case(self):
+        self.assertDifferentKey(_statement(Resource='arn:aws:s3:::Bucket/*'), _statement(Resource='arn:aws:s3:::bucket/*'))
+        self.assertDifferentKey(_statement(Principal={'AWS': ROLE_ARN}), _statement(Principal={'AWS': ROLE_ARN.upper()}))
+
+    def test_condition_operator_and_key_case(self):
+        self.assertSameKey(
+            _statement(Condition={'StringEquals': {'aws:SourceAccount': '123456789012'}}),
+            _statement(Condition={'stringequals': {'AWS:sourceaccount': '123456789012'}}))
+
+    def test_condition_values_and_operators_differ(self):
+        self.assertDifferentKey(
+            _statement(Condition={'StringEquals': {'aws:SourceArn': 'arn:aws:glue:*:123456789012:Job'}}),
+            _statement(Condition={'StringEquals': {'aws:SourceArn': 'arn:aws:glue:*:123456789012:job'}}))
+        self.assertDifferentKey(
+            _statement(Condition={'StringEquals': {'aws:SourceAccount': '123456789012'}}),
+            _statement(Condition={'StringLike': {'aws:SourceAccount': '123456789012'}}))
+        self.assertDifferentKey(_statement(Condition={'StringEquals': {'aws:SourceAccount': '123456789012'}}), _statement())
+
+    def test_principal_scalar_and_list(self):
+        self.assertSameKey(_statement(Principal={'AWS': ROLE_ARN}), _statement(Principal={'AWS': [ROLE_ARN]}))
+        self.assertSameKey(_statement(Principal={'Service': ['glue.amazonaws.com', 'lakeformation.amazonaws.com']}),
+                           _statement(Principal={'Service': ['lakeformation.amazonaws.com', 'glue.amazonaws.com']}))
+
+    def test_principal_lists_differ(self):
+        self.assertDifferentKey(_statement(Principal={'AWS': [ROLE_ARN, BYOR_ROLE_ARN]}), _statement(Principal={'AWS': ROLE_ARN}))
+        self.assertDifferentKey(_statement(Principal={'AWS': ROLE_ARN}), _statement(Principal={'Service': ROLE_ARN}))
+
+    def test_principal_wildcard(self):
+        self.assertSameKey(_statement(Principal='*'), _statement(Principal={'AWS': '*'}))
+        self.assertSameKey(_statement(NotPrincipal='*'), _statement(NotPrincipal={'AWS': ['*']}))
+        self.assertDifferentKey(_statement(Principal='*'), _statement(Principal={'Service': '*'}))
+
+    def test_sid(self):
+        self.assertSameKey(_statement(Sid='GlueAssume'), _statement(Sid='GlueAssume'))
+        # Statements are only merged when identical, a different Sid keeps both
+        self.assertDifferentKey(_statement(Sid='GlueAssume'), _statement(Sid='glueassume'))
+        self.assertDifferentKey(_statement(Sid='GlueAssume'), _statement())
+
+    def test_effect(self):
+        self.assertDifferentKey(_statement(Effect='Allow'), _statement(Effect='Deny'))
+
+
+class MergePolicyDocumentsTest(unittest.TestCase):
+    def test_keeps_base_statements_and_adds_new_ones_in_order(self):
+        base = {'Version': '2012-10-17', 'Statement': [_statement(), _statement(Principal={'AWS': ROLE_ARN})]}
+        other = {'Version': '2012-10-17', 'Statement': [
+            _statement(Action=['STS:AssumeRole']),
+            _statement(Principal={'Service': 'lakeformation.amazonaws.com'}),
+            _statement(Principal={'Service': 'lakeformation.amazonaws.com'}),
+        ]}
+        merged = merge_policy_documents(base, other)
+        self.assertEqual(merged['Version'], '2012-10-17')
+        self.assertEqual(merged['Statement'], base['Statement'] + [_statement(Principal={'Service': 'lakeformation.amazonaws.com'})])
+
+    def test_single_statement_documents(self):
+        merged = merge_policy_documents({'Statement': _statement()}, {'Statement': _statement(Sid='Other')})
+        self.assertEqual(merged['Statement'], [_statement(), _statement(Sid='Other')])
+
+    def test_does_not_modify_the_given_documents(self):
+        base = {'Statement': [_statement()]}
+        other = {'Statement': [_statement(Principal={'AWS': ROLE_ARN})]}
+        base_copy, other_copy = copy.deepcopy(base), copy.deepcopy(other)
+        merged = merge_policy_documents(base, other)
+        merged['Statement'][1]['Principal']['AWS'] = BYOR_ROLE_ARN
+        self.assertEqual(base, base_copy)
+        self.assertEqual(other, other_copy)
+
+
+class ReplaceInPolicyDocumentTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.replace = staticmethod(load_script('migration/bring-your-own-role/byor.py', 'byor')._replace_in_policy_document)
+
+    def test_replaces_in_nested_values(self):
+        document = {'Version': '2012-10-17', 'Statement': [{
+            'Effect': 'Allow',
+            'Action': 'iam:PassRole',
+            'Resource': [ROLE_ARN, f'{ROLE_ARN}/*', 'arn:aws:iam::123456789012:role/other'],
+            'Condition': {'StringEquals': {'aws:PrincipalArn': ROLE_ARN}},
+        }]}
+        replaced, changed = self.replace(document, ROLE_ARN, BYOR_ROLE_ARN)
+        self.assertTrue(changed)
+        statement = replaced['Statement'][0]
+        self.assertEqual(statement['Resource'], [BYOR_ROLE_ARN, f'{BYOR_ROLE_ARN}/*', 'arn:aws:iam::123456789012:role/other'])
+        self.assertEqual(statement['Condition'], {'StringEquals': {'aws:PrincipalArn': BYOR_ROLE_ARN}})
+        self.assertEqual(statement['Action'], 'iam:PassRole')
+
+    def test_replaces_in_keys(self):
+        replaced, changed = self.replace({'Statement': [{'Condition': {ROLE_ARN: 'x'}}]}, ROLE_ARN, BYOR_ROLE_ARN)
+        self.assertTrue(changed)
+        self.assertEqual(replaced, {'Statement': [{'Condition': {BYOR_ROLE_ARN: 'x'}}]})
+
+    def test_unchanged_document(self):
+        document = {'Statement': [{'Effect': 'Allow', 'Action': ['s3:GetObject'], 'Resource': '*', 'Condition': {'Bool': {'aws:SecureTransport': True}}}]}
+        replaced, changed = self.replace(document, ROLE_ARN, BYOR_ROLE_ARN)
+        self.assertFalse(changed)
+        self.assertEqual(replaced, document)
+
+    def test_does_not_modify_the_given_document(self):
+        document = {'Statement': [{'Resource': [ROLE_ARN]}]}
+        document_copy = copy.deepcopy(document)
+        self.replace(document, ROLE_ARN, BYOR_ROLE_ARN)
+        self.assertEqual(document, document_copy)
+
+    def test_keeps_non_string_values(self):
+        document = {'Statement': [{'Resource': ROLE_ARN, 'Condition': {'NumericLessThan': {'aws:MultiFactorAuthAge': 3600}}}]}
+        replaced, _ = self.replace(document, ROLE_ARN, BYOR_ROLE_ARN)
+        self.assertEqual(replaced['Statement'][0]['Condition'], {'NumericLessThan': {'aws:MultiFactorAuthAge': 3600}})
+
+
+if __name__ == '__main__':
+    unittest.main()
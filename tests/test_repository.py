@@ -0,0 +1,81 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from migration.utils.codecommit_helper import git_blob_id
+from migration.utils.repository import GitBackend, _quote_path
+
+FILES = [
+    ('athena_saved_queries/primary/daily.sqlnb', b'{"cells": []}\n'),
+    ('emr_notebooks/es-1/e-1/notebook.ipynb', b'{"cells": [], "nbformat": 4}\n'),
+    ('emr_notebooks/es-1/e-1/data/empty.csv', b''),
+]
+
+
+class QuotePathTest(unittest.TestCase):
+    def test_plain_paths_are_not_quoted(self):
+        self.assertEqual(_quote_path('emr_notebooks/es-1/e-1/a b.ipynb'), 'emr_notebooks/es-1/e-1/a b.ipynb')
+        self.assertEqual(_quote_path('folder/"quoted".sql'), 'folder/"quoted".sql')
+
+    def test_path_with_a_newline(self):
+        self.assertEqual(_quote_path('folder/two\nlines.sql'), '"folder/two\\nlines.sql"')
+
+    def test_path_with_a_leading_quote(self):
+        self.assertEqual(_quote_path('"quoted\\name.sql'), '"\\"quoted\\\\name.sql"')
+
+
+@unittest.skipUnless(shutil.which('git'), 'git is not installed')
+class GitBackendTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+        self.remote = os.path.join(self._directory.name, 'remote.git')
+        subprocess.run(['git', 'init', '--quiet', '--bare', self.remote], check=True)
+        self.backend = GitBackend(self.remote)
+
+    def _head(self):
+        result = subprocess.run(['git', '--git-dir', self.remote, 'rev-parse', '--verify', '--quiet', 'refs/heads/main'],
+                                capture_output=True)
+        return result.stdout.decode().strip() or None
+
+    def test_commit_creates_the_branch(self):
+        self.assertEqual(self.backend.list_files('emr_notebooks'), {})
+        commit_id = self.backend.commit_files(FILES, 'Migrate files')
+        self.assertEqual(commit_id, self._head())
+        self.assertEqual(self.backend.list_files('emr_notebooks'),
+                         {path: git_blob_id(content) for path, content in FILES if path.startswith('emr_notebooks/')})
+        self.assertEqual(self.backend.read_files('athena_saved_queries/primary'), dict(FILES[:1]))
+
+    def test_recommit_of_the_same_files_pushes_nothing(self):
+        commit_id = self.backend.commit_files(FILES, 'Migrate files')
+        self.assertIsNone(self.backend.commit_files(list(reversed(FILES)), 'Migrate files again'))
+        self.assertEqual(self._head(), commit_id)
+
+    def test_commit_adds_to_the_head_of_the_branch(self):
+        first_commit_id = self.backend.commit_files(FILES[:1], 'Migrate queries')
+        changed = ('athena_saved_queries/primary/daily.sqlnb', b'{"cells": [1]}\n')
+        commit_id = self.backend.commit_files(FILES[1:] + [changed], 'Migrate notebooks')
+        self.assertNotEqual(commit_id, first_commit_id)
+        self.assertEqual(self.backend.read_files('athena_saved_queries'), dict([changed]))
+        self.assertEqual(self.backend.read_files('emr_notebooks'), dict(FILES[1:]))
+        parent = subprocess.run(['git', '--git-dir', self.remote, 'rev-parse', f'{commit_id}^'],
+                                capture_output=True, check=True).stdout.decode().strip()
+        self.assertEqual(parent, first_commit_id)
+
+    def test_paths_quoted_for_fast_import(self):
+        files = [('queries/two\nlines.sql', b'SELECT 1\n'), ('queries/"quoted\\name.sql', b'SELECT 2\n')]
+        self.backend.commit_files(files, 'Migrate queries')
+        self.assertEqual(self.backend.read_files('queries'), dict(files))
+
+    def test_file_url(self):
+        backend = GitBackend(f'file://{self.remote}')
+        commit_id = backend.commit_files(FILES, 'Migrate files')
+        self.assertEqual(commit_id, self._head())
+        self.assertEqual(backend.read_files('emr_notebooks'), dict(FILES[1:]))
+        self.assertIsNone(backend.commit_files(FILES, 'Migrate files again'))
+
+
+if __name__ == '__main__':
+    unittest.main()
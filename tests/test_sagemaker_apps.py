@@ -0,0 +1,63 @@
+import unittest
+
+from migration.cli import load_script
+
+byor = load_script('migration/bring-your-own-role/byor.py', 'byor')
+
+DOMAIN_ID = 'd-test'
+
+
+def _app(app_name, status, creation_time, user_profile_name='user-1'):
+    return {'AppType': 'JupyterServer', 'AppName': app_name, 'UserProfileName': user_profile_name,
+            'Status': status, 'CreationTime': creation_time}
+
+
+class FakeSageMaker:
+    """
+    SageMaker client returning one ListApps snapshot per attempt, the last one for any further attempt
+    """
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.list_calls = 0
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, DomainIdEquals):
+        snapshot = self.snapshots[min(self.list_calls, len(self.snapshots) - 1)]
+        self.list_calls += 1
+        return [{'Apps': snapshot}]
+
+
+class WaitForSageMakerAppsDeletionTest(unittest.TestCase):
+    def _wait(self, sagemaker, pending_apps, max_attempts=5):
+        byor._wait_for_sagemaker_apps_deletion(sagemaker, DOMAIN_ID, pending_apps, max_attempts=max_attempts, delay_seconds=0)
+
+    def test_stale_deleted_record_does_not_end_the_wait(self):
+        live = _app('default', 'InService', 2)
+        # ListApps lists the newest record first, an earlier app with the same key was deleted before
+        stale = _app('default', 'Deleted', 1)
+        sagemaker = FakeSageMaker([
+            [live, stale],
+            [_app('default', 'Deleting', 2), stale],
+            [_app('default', 'Deleted', 2), stale],
+        ])
+        self._wait(sagemaker, [live])
+        self.assertEqual(sagemaker.list_calls, 3)
+
+    def test_app_still_active_times_out(self):
+        live = _app('default', 'InService', 2)
+        sagemaker = FakeSageMaker([[live, _app('default', 'Deleted', 1)]])
+        with self.assertRaises(TimeoutError):
+            self._wait(sagemaker, [live], max_attempts=2)
+
+    def test_failed_and_unlisted_apps_are_gone(self):
+        failed = _app('default', 'InService', 1)
+        unlisted = _app('default', 'InService', 1, user_profile_name='user-2')
+        sagemaker = FakeSageMaker([[_app('default', 'Failed', 1)]])
+        self._wait(sagemaker, [failed, unlisted])
+        self.assertEqual(sagemaker.list_calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import types
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from migration import verify
+
+WORKGROUP = 'primary'
+
+
+def _named_query(query_id):
+    return {'NamedQueryId': query_id, 'Name': f'query-{query_id}', 'QueryString': f'SELECT {query_id}'}
+
+
+def _sqlnb(query_string):
+    return json.dumps({'cells': [{'cell_type': 'code', 'source': query_string}]}).encode('utf-8')
+
+
+class FakeAthena:
+    """
+    Athena client whose BatchGetNamedQuery leaves `unprocessed_ids` out, of which GetNamedQuery reads `readable_ids`
+    """
+    meta = types.SimpleNamespace(service_model=types.SimpleNamespace(service_name='athena'))
+
+    def __init__(self, query_ids, unprocessed_ids=(), readable_ids=()):
+        self.query_ids = list(query_ids)
+        self.unprocessed_ids = set(unprocessed_ids)
+        self.readable_ids = set(readable_ids)
+
+    def list_named_queries(self, WorkGroup):
+        return {'NamedQueryIds': self.query_ids}
+
+    def batch_get_named_query(self, NamedQueryIds):
+        return {'NamedQueries': [_named_query(query_id) for query_id in NamedQueryIds if query_id not in self.unprocessed_ids],
+                'UnprocessedNamedQueryIds': [{'NamedQueryId': query_id, 'ErrorCode': 'ThrottlingException'}
+                                             for query_id in NamedQueryIds if query_id in self.unprocessed_ids]}
+
+    def get_named_query(self, NamedQueryId):
+        if NamedQueryId not in self.readable_ids:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'GetNamedQuery')
+        return {'NamedQuery': _named_query(NamedQueryId)}
+
+
+class FakeRepository:
+    def __init__(self, files):
+        self.files = files
+
+    def read_files(self, folder_path):
+        return dict(self.files)
+
+
+def _migrated(query_ids):
+    return FakeRepository({f"{verify.REPO_QUERIES_FOLDER}/{WORKGROUP}/query-{query_id}.sqlnb": _sqlnb(f'SELECT {query_id}')
+                           for query_id in query_ids})
+
+
+class VerifyAthenaQueriesTest(unittest.TestCase):
+    def _verify(self, athena, repository):
+        with mock.patch.object(verify, 'create_client', return_value=athena):
+            return verify.verify_athena_queries(WORKGROUP, 'us-east-1', repository)
+
+    def test_unprocessed_queries_are_read_one_at_a_time(self):
+        athena = FakeAthena(['1', '2', '3'], unprocessed_ids={'2'}, readable_ids={'2'})
+        result = self._verify(athena, _migrated(['1', '3']))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.source_items, 3)
+        self.assertEqual(result.missing, [f"{verify.REPO_QUERIES_FOLDER}/{WORKGROUP}/query-2.sqlnb"])
+        self.assertEqual(result.unverified, [])
+
+    def test_unreadable_queries_fail_the_check(self):
+        athena = FakeAthena(['1', '2'], unprocessed_ids={'2'})
+        result = self._verify(athena, _migrated(['1', '2']))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.source_items, 2)
+        self.assertEqual(result.missing, [])
+        self.assertEqual(result.mismatched, [])
+        self.assertEqual(result.unverified, ['named query 2'])
+        self.assertEqual(result.to_dict()['unverified'], ['named query 2'])
+
+    def test_all_queries_migrated(self):
+        athena = FakeAthena(['1', '2'], unprocessed_ids={'2'}, readable_ids={'2'})
+        self.assertTrue(self._verify(athena, _migrated(['1', '2'])).ok)
+
+
+if __name__ == '__main__':
+    unittest.main()